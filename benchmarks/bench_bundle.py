@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+BrainDriveWhyDetector Bundle Size Benchmark
+
+Records the raw, gzip and brotli size of every dist asset together with the
+module federation chunk graph: which chunks remoteEntry.js loads for each
+exposed module, and what loading an exposed module costs in bytes and in
+estimated transfer time. Compression uses the same settings as the
+precompressed variants the lifecycle manager writes, so the numbers match
+the 'chunks' reported in plugin health details. Brotli sizes are reported
+when the optional brotli package is installed.
+
+Save a baseline with a release, then check later builds against it and
+against an optional budget file; the exit status is 1 when any check fails:
+
+    python benchmarks/bench_bundle.py --save-baseline bundle-1.0.3.json
+    python benchmarks/bench_bundle.py --baseline bundle-1.0.3.json --max-growth 0.10 \\
+        --budget bundle-budget.json
+
+A budget file caps sizes per asset, per exposed module and in total, for
+any of the encodings raw, gzip and br:
+
+    {"assets": {"main.js": {"gzip": 80000}},
+     "load": {"./BrainDriveWhyDetector": {"gzip": 70000}},
+     "total": {"gzip": 150000}}
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import re
+import sys
+from pathlib import Path
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+if str(PLUGIN_DIR) not in sys.path:
+    sys.path.insert(0, str(PLUGIN_DIR))
+
+from lifecycle_manager import brotli_compress  # noqa: E402
+
+ENTRY_FILENAME = 'remoteEntry.js'
+ENCODINGS = ('raw', 'gzip', 'br')
+
+# webpack's JSONP chunk registration: (self.webpackChunkX=...).push([[417],{...
+_CHUNK_PUSH = re.compile(r'\.push\(\[\[([\d,]+)\]')
+# Chunk loads through the runtime's ensure-chunk helper, e.g. t.e(573)
+_CHUNK_LOAD = re.compile(r'(?<![\w$])[A-Za-z_$][\w$]*\.e\((\d+)\)')
+# Container exposes: "./BrainDriveWhyDetector":()=>Promise.all([t.e(573),t.e(417)])
+_EXPOSE = re.compile(r'"(\./[^"]+)":\(\)=>(Promise\.all\(\[[^\]]*\]\)|[A-Za-z_$][\w$]*\.e\(\d+\))')
+
+
+def _is_variant(path: Path) -> bool:
+    return path.suffix in ('.gz', '.br', '.tmp')
+
+
+def measure_asset(path: Path) -> dict:
+    data = path.read_bytes()
+    sizes = {
+        'raw': len(data),
+        'gzip': len(gzip.compress(data, compresslevel=9, mtime=0)),
+    }
+    compressed = brotli_compress(data)
+    if compressed is not None:
+        sizes['br'] = len(compressed)
+    sizes['sha256'] = hashlib.sha256(data).hexdigest()
+    return sizes
+
+
+def parse_chunk_graph(dist_dir: Path) -> dict:
+    """Chunk ids, chunk loads and container exposes found in the dist scripts."""
+    scripts = {path.name: path.read_text('utf-8', errors='replace')
+               for path in sorted(dist_dir.glob('*.js'))}
+
+    chunk_files = {}
+    files = {}
+    for name, source in scripts.items():
+        ids = []
+        for match in _CHUNK_PUSH.finditer(source):
+            ids.extend(int(part) for part in match.group(1).split(',') if part)
+        for chunk_id in ids:
+            chunk_files.setdefault(chunk_id, name)
+        files[name] = {
+            'chunk_ids': sorted(set(ids)),
+            'loads': sorted({int(chunk_id) for chunk_id in _CHUNK_LOAD.findall(source)}),
+        }
+
+    def file_of(chunk_id):
+        return chunk_files.get(chunk_id, f'{chunk_id}.js')
+
+    for info in files.values():
+        info['loads'] = [file_of(chunk_id) for chunk_id in info['loads']]
+
+    exposes = {}
+    entry_source = scripts.get(ENTRY_FILENAME, '')
+    for module, loader in _EXPOSE.findall(entry_source):
+        exposes[module] = [file_of(int(chunk_id)) for chunk_id in _CHUNK_LOAD.findall(loader)]
+
+    return {'entry': ENTRY_FILENAME, 'files': files, 'exposes': exposes}
+
+
+def _closure(graph: dict, roots) -> list:
+    seen = []
+    pending = list(roots)
+    while pending:
+        name = pending.pop(0)
+        if name in seen:
+            continue
+        seen.append(name)
+        pending.extend(graph['files'].get(name, {}).get('loads', []))
+    return seen
+
+
+def _sum_sizes(assets: dict, names) -> dict:
+    totals = {}
+    for encoding in ENCODINGS:
+        values = [assets[name][encoding] for name in names if name in assets and encoding in assets[name]]
+        if values and len(values) == len([name for name in names if name in assets]):
+            totals[encoding] = sum(values)
+    return totals
+
+
+def load_cost(assets: dict, graph: dict, bandwidth_kbps: float, rtt_ms: float) -> dict:
+    """Bytes and estimated transfer time to load each exposed module.
+
+    remoteEntry.js is fetched first and the exposed module's chunks then in
+    parallel, so the estimate is two round trips plus the transfer of all
+    files at the smallest available encoding.
+    """
+    costs = {}
+    for module, chunks in graph['exposes'].items():
+        names = _closure(graph, [graph['entry']] + chunks)
+        sizes = _sum_sizes(assets, names)
+        transfer = sizes.get('br', sizes.get('gzip', sizes.get('raw', 0)))
+        costs[module] = {
+            'files': names,
+            **sizes,
+            'estimated_ms': round(2 * rtt_ms + transfer * 8 / bandwidth_kbps, 1),
+        }
+    return costs
+
+
+def run(dist_dir: Path, bandwidth_kbps: float, rtt_ms: float) -> dict:
+    assets = {
+        str(path.relative_to(dist_dir)): measure_asset(path)
+        for path in sorted(dist_dir.rglob('*'))
+        if path.is_file() and not _is_variant(path)
+    }
+    graph = parse_chunk_graph(dist_dir)
+    return {
+        'benchmark': 'bundle',
+        'dist': str(dist_dir),
+        'brotli': any('br' in sizes for sizes in assets.values()),
+        'network': {'bandwidth_kbps': bandwidth_kbps, 'rtt_ms': rtt_ms},
+        'assets': assets,
+        'total': _sum_sizes(assets, list(assets)),
+        'chunk_graph': graph,
+        'load': load_cost(assets, graph, bandwidth_kbps, rtt_ms),
+    }
+
+
+def _check_limits(kind: str, name: str, actual: dict, limits: dict, failures: list) -> None:
+    for encoding, limit in limits.items():
+        if encoding in actual and actual[encoding] > limit:
+            failures.append(f"{kind} {name}: {encoding} {actual[encoding]} B exceeds budget {limit} B")
+
+
+def check_budget(results: dict, budget: dict) -> list:
+    failures = []
+    for name, limits in budget.get('assets', {}).items():
+        if name not in results['assets']:
+            failures.append(f"asset {name}: listed in budget but missing from dist")
+            continue
+        _check_limits('asset', name, results['assets'][name], limits, failures)
+    for module, limits in budget.get('load', {}).items():
+        if module not in results['load']:
+            failures.append(f"load {module}: listed in budget but not exposed")
+            continue
+        _check_limits('load', module, results['load'][module], limits, failures)
+    _check_limits('total', 'bundle', results['total'], budget.get('total', {}), failures)
+    return failures
+
+
+def check_growth(results: dict, baseline: dict, max_growth: float) -> list:
+    failures = []
+    pairs = [('asset', name, sizes, baseline.get('assets', {}).get(name))
+             for name, sizes in results['assets'].items()]
+    pairs += [('load', module, cost, baseline.get('load', {}).get(module))
+              for module, cost in results['load'].items()]
+    pairs.append(('total', 'bundle', results['total'], baseline.get('total')))
+    for kind, name, sizes, previous in pairs:
+        if not previous:
+            continue
+        for encoding in ENCODINGS:
+            if encoding not in sizes or not previous.get(encoding):
+                continue
+            growth = sizes[encoding] / previous[encoding] - 1
+            if growth > max_growth:
+                failures.append(f"{kind} {name}: {encoding} grew {growth * 100:.1f}% "
+                                f"({previous[encoding]} -> {sizes[encoding]} B), limit {max_growth * 100:.1f}%")
+    return failures
+
+
+def _format_sizes(sizes: dict) -> str:
+    return '  '.join(f"{encoding} {sizes[encoding]:>8}" for encoding in ENCODINGS if encoding in sizes)
+
+
+def print_results(results: dict, baseline=None) -> None:
+    previous_assets = (baseline or {}).get('assets', {})
+    for name, sizes in results['assets'].items():
+        line = f"{name:<28} {_format_sizes(sizes)}"
+        previous = previous_assets.get(name)
+        if previous and previous.get('gzip'):
+            line += f"  ({(sizes['gzip'] / previous['gzip'] - 1) * 100:+.1f}% gzip)"
+        elif baseline is not None:
+            line += '  (new)'
+        print(line)
+    print(f"{'total':<28} {_format_sizes(results['total'])}")
+    for module, cost in results['load'].items():
+        print(f"load {module}: {', '.join(cost['files'])} -> {_format_sizes(cost)}, "
+              f"~{cost['estimated_ms']:.0f} ms")
+    if not results['brotli']:
+        print('brotli sizes skipped: brotli package not installed')
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dist', type=Path, default=PLUGIN_DIR / 'dist',
+                        help='dist directory to measure (default: the plugin build output)')
+    parser.add_argument('--baseline', help='baseline JSON from an earlier run to compare against')
+    parser.add_argument('--max-growth', type=float, default=0.10,
+                        help='largest allowed growth over the baseline as a fraction (default: 0.10)')
+    parser.add_argument('--budget', help='JSON file of size budgets per asset, exposed module and total')
+    parser.add_argument('--save-baseline', help='write results as a baseline to this path')
+    parser.add_argument('--bandwidth-kbps', type=float, default=1600.0,
+                        help='bandwidth for load time estimates (default: 1600)')
+    parser.add_argument('--rtt-ms', type=float, default=150.0, help='round trip time for load time estimates (default: 150)')
+    parser.add_argument('--output', help='write results as JSON to this path')
+    args = parser.parse_args(argv)
+
+    if not (args.dist / ENTRY_FILENAME).is_file():
+        parser.error(f"{args.dist / ENTRY_FILENAME} not found; build the plugin first")
+
+    results = run(args.dist.resolve(), args.bandwidth_kbps, args.rtt_ms)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    failures = []
+    if baseline is not None:
+        failures += check_growth(results, baseline, args.max_growth)
+    if args.budget:
+        with open(args.budget) as f:
+            failures += check_budget(results, json.load(f))
+    results['failures'] = failures
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2)
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""
+BrainDriveWhyDetector Benchmark Helpers
+
+Definitions shared by the benchmarks and the test suite, so both run
+against the same backend schema and report percentiles the same way.
+"""
+
+# Column layout of the BrainDrive backend tables the lifecycle manager writes to.
+BACKEND_SCHEMA = [
+    """
+    CREATE TABLE plugin (
+        id VARCHAR PRIMARY KEY, name VARCHAR, description TEXT, version VARCHAR,
+        type VARCHAR, enabled BOOLEAN, icon VARCHAR, category VARCHAR, status VARCHAR,
+        official BOOLEAN, author VARCHAR, last_updated VARCHAR, compatibility VARCHAR,
+        downloads INTEGER, scope VARCHAR, bundle_method VARCHAR, bundle_location VARCHAR,
+        is_local BOOLEAN, long_description TEXT, config_fields TEXT, messages TEXT,
+        dependencies TEXT, created_at VARCHAR, updated_at VARCHAR, user_id VARCHAR,
+        plugin_slug VARCHAR, source_type VARCHAR, source_url VARCHAR,
+        update_check_url VARCHAR, last_update_check VARCHAR, update_available BOOLEAN,
+        latest_version VARCHAR, installation_type VARCHAR, permissions TEXT
+    )
+    """,
+    """
+    CREATE TABLE module (
+        id VARCHAR PRIMARY KEY, plugin_id VARCHAR, name VARCHAR, display_name VARCHAR,
+        description TEXT, icon VARCHAR, category VARCHAR, enabled BOOLEAN,
+        priority INTEGER, props TEXT, config_fields TEXT, messages TEXT,
+        required_services TEXT, dependencies TEXT, layout TEXT, tags TEXT,
+        created_at VARCHAR, updated_at VARCHAR, user_id VARCHAR
+    )
+    """,
+    "CREATE INDEX ix_module_plugin_id ON module (plugin_id)",
+]
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of values, fraction in [0, 1]."""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
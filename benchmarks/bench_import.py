@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+BrainDriveWhyDetector Import-Time Benchmark
+
+Measures how expensive it is for the plugin loader to import
+lifecycle_manager.py and to obtain a manager.
+
+Each import sample runs in a fresh interpreter so module caches do not hide
+the cost. Usage:
+
+    python benchmarks/bench_import.py --runs 20 --output import_bench.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from bench_common import percentile
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+
+# Printed by the child interpreter as a single JSON line.
+_CHILD_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import lifecycle_manager
+import_seconds = time.perf_counter() - start
+
+start = time.perf_counter()
+lifecycle_manager.BrainDriveWhyDetectorLifecycleManager()
+construct_seconds = time.perf_counter() - start
+
+lifecycle_manager.get_lifecycle_manager()
+start = time.perf_counter()
+for _ in range(1000):
+    lifecycle_manager.get_lifecycle_manager()
+registry_seconds = (time.perf_counter() - start) / 1000
+
+print(json.dumps({
+    'import_seconds': import_seconds,
+    'construct_seconds': construct_seconds,
+    'registry_lookup_seconds': registry_seconds,
+    'sqlalchemy_imported': 'sqlalchemy' in sys.modules,
+}))
+"""
+
+
+def _summarize(values):
+    return {
+        'min': min(values),
+        'median': statistics.median(values),
+        'p95': percentile(values, 0.95),
+        'max': max(values),
+    }
+
+
+def run_sample() -> dict:
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(PLUGIN_DIR), env.get('PYTHONPATH')]))
+    env['PYTHONDONTWRITEBYTECODE'] = '1'
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, '-c', _CHILD_SCRIPT],
+        cwd=str(PLUGIN_DIR), env=env, capture_output=True, text=True, check=True
+    )
+    wall_seconds = time.perf_counter() - start
+    sample = json.loads(completed.stdout.strip().splitlines()[-1])
+    sample['process_wall_seconds'] = wall_seconds
+    return sample
+
+
+def run(runs: int) -> dict:
+    samples = [run_sample() for _ in range(runs)]
+    return {
+        'benchmark': 'import',
+        'python': sys.version.split()[0],
+        'runs': runs,
+        'import_seconds': _summarize([s['import_seconds'] for s in samples]),
+        'construct_seconds': _summarize([s['construct_seconds'] for s in samples]),
+        'registry_lookup_seconds': _summarize([s['registry_lookup_seconds'] for s in samples]),
+        'process_wall_seconds': _summarize([s['process_wall_seconds'] for s in samples]),
+        'sqlalchemy_imported': any(s['sqlalchemy_imported'] for s in samples),
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10, help='fresh-interpreter samples to take')
+    parser.add_argument('--output', help='write results as JSON to this path')
+    args = parser.parse_args(argv)
+
+    results = run(args.runs)
+    print(f"import:   median {results['import_seconds']['median'] * 1000:.2f} ms, "
+          f"p95 {results['import_seconds']['p95'] * 1000:.2f} ms")
+    print(f"new manager:     median {results['construct_seconds']['median'] * 1e6:.1f} us")
+    print(f"registry lookup: median {results['registry_lookup_seconds']['median'] * 1e6:.3f} us")
+    print(f"sqlalchemy imported at load: {results['sqlalchemy_imported']}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+BrainDriveWhyDetector Lifecycle Benchmark
+
+Measures install, uninstall and status throughput and latency percentiles of
+BrainDriveWhyDetectorLifecycleManager against a local database stand-in
+(SQLite through aiosqlite by default), plus the cost of the shared file copy.
+
+Per-user operations run at each requested concurrency level, each worker
+with its own session; the bulk APIs run once per user count. Results are
+saved as JSON so releases can be compared:
+
+    python benchmarks/bench_lifecycle.py --users 1,10,100,1000 --concurrency 1,8,32 \\
+        --output lifecycle-1.0.3.json --compare lifecycle-1.0.2.json
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import platform
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+if str(PLUGIN_DIR) not in sys.path:
+    sys.path.insert(0, str(PLUGIN_DIR))
+
+import lifecycle_manager  # noqa: E402
+from lifecycle_manager import BrainDriveWhyDetectorLifecycleManager  # noqa: E402
+from bench_common import BACKEND_SCHEMA, percentile  # noqa: E402
+
+def _parse_ints(value: str):
+    return [int(part) for part in value.split(',') if part.strip()]
+
+
+def _latency_summary(latencies):
+    return {
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'max': max(latencies) * 1000,
+        'mean': statistics.fmean(latencies) * 1000,
+    }
+
+
+def _succeeded(operation: str, result: dict) -> bool:
+    if operation == 'status':
+        return result.get('exists', False)
+    return result.get('success', False)
+
+
+class LifecycleBenchmark:
+    def __init__(self, database_url: str, plugins_base_dir: Path):
+        from sqlalchemy import event
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        connect_args = {'timeout': 60} if database_url.startswith('sqlite') else {}
+        self.engine = create_async_engine(database_url, connect_args=connect_args, pool_size=64, max_overflow=0)
+        if database_url.startswith('sqlite'):
+            @event.listens_for(self.engine.sync_engine, 'connect')
+            def _sqlite_pragmas(dbapi_connection, _record):
+                cursor = dbapi_connection.cursor()
+                cursor.execute('PRAGMA journal_mode=WAL')
+                cursor.execute('PRAGMA synchronous=NORMAL')
+                cursor.close()
+        self.sessions = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.plugins_base_dir = plugins_base_dir
+
+    async def setup(self):
+        from sqlalchemy import text
+        async with self.engine.begin() as conn:
+            await conn.execute(text('DROP TABLE IF EXISTS module'))
+            await conn.execute(text('DROP TABLE IF EXISTS plugin'))
+            for statement in BACKEND_SCHEMA:
+                await conn.execute(text(statement))
+        async with self.sessions() as db:
+            await self.new_manager().ensure_status_index(db)
+
+    async def reset(self):
+        from sqlalchemy import text
+        async with self.engine.begin() as conn:
+            await conn.execute(text('DELETE FROM module'))
+            await conn.execute(text('DELETE FROM plugin'))
+
+    def new_manager(self) -> BrainDriveWhyDetectorLifecycleManager:
+        return BrainDriveWhyDetectorLifecycleManager(str(self.plugins_base_dir))
+
+    async def run_per_user(self, operation: str, call, user_ids, concurrency: int) -> dict:
+        """Run call(user_id, db) for every user with at most `concurrency` in flight."""
+        latencies = []
+        failures = 0
+        queue = iter(user_ids)
+
+        async def worker():
+            nonlocal failures
+            async with self.sessions() as db:
+                for user_id in queue:
+                    start = time.perf_counter()
+                    result = await call(user_id, db)
+                    latencies.append(time.perf_counter() - start)
+                    if not _succeeded(operation, result):
+                        failures += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, len(user_ids)))))
+        elapsed = time.perf_counter() - start
+        return {
+            'operation': operation,
+            'mode': 'per_user',
+            'users': len(user_ids),
+            'concurrency': concurrency,
+            'seconds': elapsed,
+            'ops_per_sec': len(user_ids) / elapsed if elapsed else None,
+            'failures': failures,
+            'latency_ms': _latency_summary(latencies),
+        }
+
+    async def run_bulk(self, operation: str, call, user_ids) -> dict:
+        async with self.sessions() as db:
+            start = time.perf_counter()
+            result = await call(user_ids, db)
+            elapsed = time.perf_counter() - start
+        return {
+            'operation': operation,
+            'mode': 'bulk',
+            'users': len(user_ids),
+            'concurrency': 1,
+            'seconds': elapsed,
+            'ops_per_sec': len(user_ids) / elapsed if elapsed else None,
+            'failures': 0 if result.get('success') else len(user_ids),
+        }
+
+    async def bench_users(self, user_count: int, concurrency_levels) -> list:
+        user_ids = [f"bench-user-{index:06d}" for index in range(user_count)]
+        results = []
+        for concurrency in concurrency_levels:
+            await self.reset()
+            manager = self.new_manager()
+            results.append(await self.run_per_user('install', manager.install_plugin, user_ids, concurrency))
+            results.append(await self.run_per_user('status', manager.get_plugin_status, user_ids, concurrency))
+            results.append(await self.run_per_user('uninstall', manager.delete_plugin, user_ids, concurrency))
+
+        await self.reset()
+        manager = self.new_manager()
+        results.append(await self.run_bulk('install', manager.install_plugin_for_users, user_ids))
+        results.append(await self.run_bulk('status', manager.get_plugin_status_many, user_ids))
+        results.append(await self.run_bulk('uninstall', manager.delete_plugin_for_users, user_ids))
+        return results
+
+    async def bench_copy(self, repeats: int) -> dict:
+        manager = self.new_manager()
+        cold, warm = [], []
+        files = total_bytes = 0
+        for _ in range(repeats):
+            target = Path(tempfile.mkdtemp(prefix='whydetector-copy-')) / 'v'
+            BrainDriveWhyDetectorLifecycleManager._source_hash_cache.clear()
+            start = time.perf_counter()
+            result = await manager._copy_plugin_files_impl('bench', target)
+            cold.append(time.perf_counter() - start)
+            files = len(result.get('copied_files', []))
+            total_bytes = sum((target / name).stat().st_size for name in result.get('copied_files', []))
+
+            start = time.perf_counter()
+            await manager._copy_plugin_files_impl('bench', target)
+            warm.append(time.perf_counter() - start)
+            shutil.rmtree(target.parent, ignore_errors=True)
+        return {
+            'files': files,
+            'bytes': total_bytes,
+            'cold_ms': _latency_summary(cold),
+            'unchanged_ms': _latency_summary(warm),
+        }
+
+    async def close(self):
+        await self.engine.dispose()
+
+
+def _result_key(result: dict) -> tuple:
+    return (result['operation'], result['mode'], result['users'], result['concurrency'])
+
+
+def print_results(report: dict, baseline: dict = None):
+    previous = {}
+    if baseline:
+        previous = {_result_key(result): result for result in baseline.get('results', [])}
+
+    print(f"{'operation':<10} {'mode':<9} {'users':>6} {'conc':>5} {'ops/s':>10} "
+          f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'fail':>5} {'vs base':>8}")
+    for result in report['results']:
+        latency = result.get('latency_ms')
+        ops = result['ops_per_sec'] or 0
+        delta = ''
+        before = previous.get(_result_key(result))
+        if before and before.get('ops_per_sec'):
+            delta = f"{ops / before['ops_per_sec']:.2f}x"
+        if latency:
+            percentiles = f"{latency['p50']:>8.2f} {latency['p95']:>8.2f} {latency['p99']:>8.2f}"
+        else:
+            percentiles = f"{result['seconds'] * 1000:>8.2f} {'-':>8} {'-':>8}"
+        print(f"{result['operation']:<10} {result['mode']:<9} {result['users']:>6} {result['concurrency']:>5} "
+              f"{ops:>10.1f} {percentiles} {result['failures']:>5} {delta:>8}")
+
+    copy = report['copy']
+    print(f"\nfile copy: {copy['files']} files, {copy['bytes']} bytes, "
+          f"cold p50 {copy['cold_ms']['p50']:.2f} ms, unchanged p50 {copy['unchanged_ms']['p50']:.2f} ms")
+
+
+async def run(args) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix='whydetector-bench-'))
+    database_url = args.database_url or f"sqlite+aiosqlite:///{workdir / 'bench.sqlite'}"
+    bench = LifecycleBenchmark(database_url, workdir / 'plugins')
+    try:
+        await bench.setup()
+        results = []
+        for user_count in args.users:
+            print(f"benchmarking {user_count} users ...", file=sys.stderr)
+            results.extend(await bench.bench_users(user_count, args.concurrency))
+        copy = await bench.bench_copy(args.copy_repeats)
+    finally:
+        await bench.close()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'benchmark': 'lifecycle',
+        'plugin_version': BrainDriveWhyDetectorLifecycleManager().plugin_data['version'],
+        'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'database': database_url.split(':', 1)[0],
+        'upsert_installs': BrainDriveWhyDetectorLifecycleManager.UPSERT_INSTALLS,
+        'results': results,
+        'copy': copy,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=_parse_ints, default=[1, 10, 100, 1000, 10000],
+                        help='comma-separated user counts (default: 1,10,100,1000,10000)')
+    parser.add_argument('--concurrency', type=_parse_ints, default=[1, 8, 32],
+                        help='comma-separated concurrency levels for per-user operations (default: 1,8,32)')
+    parser.add_argument('--copy-repeats', type=int, default=5, help='samples for the file copy benchmark')
+    parser.add_argument('--database-url', help='async SQLAlchemy URL of another local stand-in (default: temporary SQLite)')
+    parser.add_argument('--no-upsert', action='store_true', help='benchmark the check/insert/verify install path')
+    parser.add_argument('--output', help='write results as JSON to this path')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run to compare throughput against')
+    parser.add_argument('--verbose', action='store_true', help='keep lifecycle manager log output')
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        import structlog
+        structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.ERROR))
+    if args.no_upsert:
+        BrainDriveWhyDetectorLifecycleManager.UPSERT_INSTALLS = False
+    lifecycle_manager.clear_lifecycle_managers()
+
+    report = asyncio.run(run(args))
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_results(report, baseline)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
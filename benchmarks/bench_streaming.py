@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+BrainDriveWhyDetector Streaming Benchmark
+
+Runs a local stand-in for the BrainDrive /api/v1/ai/providers/chat endpoint
+and a load generator that opens many concurrent whydetector chat streams
+against it. It reports what AIService.sendToCoach would see: time to first
+token, tokens per second and latency percentiles, plus how much of each
+response survives the client's chunk parsing.
+
+The stand-in streams events in one of three styles: OpenAI SSE
+(data: {"choices":[{"delta":...}]}), Ollama SSE
+(data: {"message":{...},"done":false}) or Ollama NDJSON. The token rate and
+the number of tokens per event are configurable. Events can be written
+whole or split at a random byte offset, inside the JSON payload, or inside a
+UTF-8 sequence, which reproduces how network reads cut a stream.
+
+The client parser follows the sendToCoach chunk callback, which strips
+"data: ", skips [DONE], runs JSON.parse and then extractTextFromData:
+  - 'lines' calls the callback once per line of each read.
+  - 'raw' calls it once with the whole read.
+  - 'decoder' uses stream_relay.StreamDecoder instead.
+--relay puts stream_relay.StreamRelay between the stand-in and the client.
+
+By default the stand-in shares one event loop with the load generator. At
+hundreds of sessions with high token rates that loop becomes the
+bottleneck, so run the stand-in in its own process with --serve and point
+the load at it with --target.
+
+    python benchmarks/bench_streaming.py --sessions 500 --concurrency 200 \\
+        --style openai --tokens-per-second 40 --split mid-json --output stream.json
+    python benchmarks/bench_streaming.py --serve --port 8765      # stand-in only
+    python benchmarks/bench_streaming.py --target 127.0.0.1:8765  # load only
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+if str(PLUGIN_DIR) not in sys.path:
+    sys.path.insert(0, str(PLUGIN_DIR))
+
+from bench_common import percentile  # noqa: E402
+from context_assembler import count_tokens, get_context_assembler  # noqa: E402
+from session_store import empty_session_data  # noqa: E402
+from stream_relay import CONVERSATION_TYPE, StreamDecoder, StreamRelay, extract_text  # noqa: E402
+
+CHAT_PATH = '/api/v1/ai/providers/chat'
+STYLES = ('openai', 'ollama', 'ndjson')
+SPLITS = ('event', 'random', 'mid-json', 'utf8')
+PARSERS = ('lines', 'raw', 'decoder')
+# Mirrors PHASE_ORDER in src/types.ts.
+PHASES = ('intro', 'snapshot', 'energy_map', 'deep_stories', 'patterns', 'statement', 'action', 'completed')
+
+# Multi-byte words so that 'utf8' splits have sequences to cut.
+_WORDS = (
+    'why', 'purpose', 'values', 'energy', 'story', 'because', 'meaning', 'flow',
+    'café', 'naïve', 'résumé', 'über', '—', '✨', 'growth', 'people', 'create'
+)
+
+
+def response_tokens(count: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [(' ' if index else '') + rng.choice(_WORDS) for index in range(count)]
+
+
+def encode_event(style: str, text: str, done: bool = False) -> bytes:
+    if style == 'openai':
+        if done:
+            return b'data: [DONE]\n\n'
+        payload = {'object': 'chat.completion.chunk', 'choices': [{'index': 0, 'delta': {'content': text}}]}
+    else:
+        payload = {'model': 'stand-in', 'message': {'role': 'assistant', 'content': text}, 'done': done}
+    body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False)
+    if style == 'ndjson':
+        return (body + '\n').encode('utf-8')
+    return f'data: {body}\n\n'.encode('utf-8')
+
+
+def split_points(event: bytes, mode: str, rng: random.Random) -> list:
+    """Byte offsets at which to cut one event into separate writes."""
+    if mode == 'event' or len(event) < 2:
+        return []
+    if mode == 'random':
+        return [rng.randrange(1, len(event))]
+    if mode == 'utf8':
+        for offset, byte in enumerate(event):
+            # A continuation byte: cutting before it splits a multi-byte sequence.
+            if 0x80 <= byte < 0xC0:
+                return [offset]
+        # Nothing to cut in ASCII-only events; splitting them would measure 'mid-json'.
+        return []
+    start, end = event.find(b'{'), event.rfind(b'}')
+    if 0 <= start < end:
+        return [(start + end + 1) // 2]
+    return [len(event) // 2]
+
+
+class ProviderStandIn:
+    """Minimal HTTP/1.1 server answering chat requests with a paced stream.
+
+    Responses are sent with Connection: close and no transfer encoding, so
+    the stream ends when the connection does. Each response carries
+    X-Stand-In-Tokens and X-Stand-In-Chars so clients can measure loss.
+    """
+
+    def __init__(self, style: str = 'openai', tokens: int = 200, tokens_per_second: float = 50.0,
+                 chunk_tokens: int = 1, first_token_delay: float = 0.2, split: str = 'event',
+                 split_delay: float = 0.001, seed: int = 0):
+        self.style = style
+        self.tokens = tokens
+        self.tokens_per_second = tokens_per_second
+        self.chunk_tokens = max(1, chunk_tokens)
+        self.first_token_delay = first_token_delay
+        self.split = split
+        self.split_delay = split_delay
+        self.seed = seed
+        self.requests = 0
+        self._server = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0):
+        self._server = await asyncio.start_server(self._handle, host, port, backlog=4096)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self) -> None:
+        await self._server.serve_forever()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        request_line = await reader.readline()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get('content-length') or 0))
+        method, path = request_line.decode('latin-1').split(' ')[:2]
+        return method, path.split('?')[0], body
+
+    async def _write(self, writer: asyncio.StreamWriter, event: bytes, rng: random.Random) -> None:
+        start = 0
+        for offset in split_points(event, self.split, rng) + [len(event)]:
+            if start:
+                await asyncio.sleep(self.split_delay)
+            writer.write(event[start:offset])
+            await writer.drain()
+            start = offset
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            method, path, body = await self._read_request(reader)
+            if method != 'POST' or path != CHAT_PATH:
+                writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                return
+            params = json.loads(body or b'{}')
+            self.requests += 1
+            rng = random.Random(self.seed + self.requests)
+            tokens = response_tokens(self.tokens, self.seed)
+            text = ''.join(tokens)
+            measure = f'X-Stand-In-Tokens: {len(tokens)}\r\nX-Stand-In-Chars: {len(text)}\r\n'
+
+            if not params.get('stream', True):
+                payload = json.dumps({'choices': [{'message': {'role': 'assistant', 'content': text}}]}).encode('utf-8')
+                writer.write(
+                    f'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\n'
+                    f'{measure}Connection: close\r\n\r\n'.encode('latin-1') + payload
+                )
+                return
+
+            content_type = 'application/x-ndjson' if self.style == 'ndjson' else 'text/event-stream'
+            writer.write(
+                f'HTTP/1.1 200 OK\r\nContent-Type: {content_type}\r\nCache-Control: no-cache\r\n'
+                f'{measure}Connection: close\r\n\r\n'.encode('latin-1')
+            )
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            for index in range(0, len(tokens), self.chunk_tokens):
+                if self.tokens_per_second > 0:
+                    delay = started + self.first_token_delay + index / self.tokens_per_second - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                await self._write(writer, encode_event(self.style, ''.join(tokens[index:index + self.chunk_tokens])), rng)
+            await self._write(writer, encode_event(self.style, '', done=True), rng)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+
+
+class CoachChunkParser:
+    """The sendToCoach chunk handling, applied per line ('lines') or per read ('raw')."""
+
+    def __init__(self, mode: str = 'lines'):
+        self.mode = mode
+        self.decoder = StreamDecoder() if mode == 'decoder' else None
+        self.parse_errors = 0
+
+    def feed(self, data: bytes) -> list:
+        if self.decoder is not None:
+            return [text for text, _ in self.decoder.feed(data) if text]
+        chunk = data.decode('utf-8', errors='replace')
+        pieces = chunk.split('\n') if self.mode == 'lines' else [chunk]
+        return [text for text in map(self._on_chunk, pieces) if text]
+
+    def close(self) -> list:
+        if self.decoder is None:
+            return []
+        return [text for text, _ in self.decoder.close() if text]
+
+    def _on_chunk(self, chunk: str) -> str:
+        json_string = chunk[6:] if chunk.startswith('data: ') else chunk
+        if not json_string.strip() or json_string.strip() == '[DONE]':
+            return ''
+        try:
+            data = json.loads(json_string)
+        except ValueError:
+            # sendToCoach ignores parse errors for partial chunks; the text is lost.
+            self.parse_errors += 1
+            return ''
+        return extract_text(data)
+
+
+def chat_request(index: int, phase: str) -> dict:
+    """Request body shaped like the one AIService.sendToCoach posts."""
+    user_message = f"Session {index}: I feel most alive when I help people find their own answers."
+    messages = get_context_assembler().assemble(phase, empty_session_data(), [], user_message)['messages']
+    return {
+        'provider': 'ollama',
+        'settings_id': 'ollama_servers_settings',
+        'server_id': 'stand-in',
+        'model': 'stand-in',
+        'messages': [{'role': message['role'], 'content': message['content']} for message in messages],
+        'params': {'temperature': 0.7, 'max_tokens': 2048},
+        'stream': True,
+        'user_id': f'user-{index}',
+        'conversation_type': CONVERSATION_TYPE
+    }
+
+
+async def run_session(host: str, port: int, payload: dict, parser_mode: str, relay_options=None) -> dict:
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        body = json.dumps(payload).encode('utf-8')
+        writer.write(
+            f'POST {CHAT_PATH} HTTP/1.1\r\nHost: {host}:{port}\r\nContent-Type: application/json\r\n'
+            f'Accept: text/event-stream\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n'.encode('latin-1')
+            + body
+        )
+        await writer.drain()
+
+        status = await reader.readline()
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if status.split()[1:2] != [b'200']:
+            raise RuntimeError(f"unexpected response: {status.decode('latin-1').strip()}")
+
+        async def reads():
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    return
+                yield data
+
+        source = reads()
+        relay = None
+        if relay_options is not None:
+            relay = StreamRelay(source, **relay_options)
+            source = relay.frames()
+
+        parser = CoachChunkParser(parser_mode)
+        first_token_at = None
+        parts = []
+        chunks = 0
+        async for data in source:
+            chunks += 1
+            texts = parser.feed(data)
+            if texts and first_token_at is None:
+                first_token_at = time.perf_counter()
+            parts.extend(texts)
+        parts.extend(parser.close())
+        finished = time.perf_counter()
+    finally:
+        writer.close()
+
+    text = ''.join(parts)
+    expected_chars = int(headers.get('x-stand-in-chars') or 0)
+    expected_tokens = int(headers.get('x-stand-in-tokens') or 0)
+    completeness = min(1.0, len(text) / expected_chars) if expected_chars else 1.0
+    tokens = round(expected_tokens * completeness) if expected_tokens else count_tokens(text)
+    streaming_seconds = finished - first_token_at if first_token_at is not None else 0.0
+    return {
+        'ttft': (first_token_at - started) if first_token_at is not None else None,
+        'latency': finished - started,
+        'tokens': tokens,
+        'tokens_per_second': tokens / streaming_seconds if streaming_seconds > 0 else None,
+        'completeness': completeness,
+        'chunks': chunks,
+        'parse_errors': parser.parse_errors,
+        'relay': relay.stats() if relay is not None else None
+    }
+
+
+def _latency_summary(latencies):
+    if not latencies:
+        return None
+    return {
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p95': percentile(latencies, 0.95) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'max': max(latencies) * 1000,
+    }
+
+
+def summarize(samples: list, wall_seconds: float) -> dict:
+    completed = [sample for sample in samples if 'error' not in sample]
+    errors = [sample['error'] for sample in samples if 'error' in sample]
+    rates = [sample['tokens_per_second'] for sample in completed if sample['tokens_per_second']]
+    return {
+        'sessions': len(samples),
+        'completed': len(completed),
+        'errors': len(errors),
+        'error_examples': sorted(set(errors))[:5],
+        'wall_seconds': wall_seconds,
+        'ttft_ms': _latency_summary([sample['ttft'] for sample in completed if sample['ttft'] is not None]),
+        'latency_ms': _latency_summary([sample['latency'] for sample in completed]),
+        'tokens_per_second': {
+            'median': statistics.median(rates),
+            # Slowest sessions: the tail a user notices as a stalling response.
+            'p5': percentile(rates, 0.05),
+            'aggregate': sum(sample['tokens'] for sample in completed) / wall_seconds,
+        } if rates else None,
+        'completeness': {
+            'mean': statistics.mean(sample['completeness'] for sample in completed),
+            'min': min(sample['completeness'] for sample in completed),
+            'incomplete_sessions': sum(1 for sample in completed if sample['completeness'] < 1.0),
+        } if completed else None,
+        'parse_errors': sum(sample['parse_errors'] for sample in completed),
+        'chunks_per_session': statistics.mean(sample['chunks'] for sample in completed) if completed else None,
+    }
+
+
+async def run(args) -> dict:
+    server = None
+    if args.target:
+        host, _, port = args.target.rpartition(':')
+        port = int(port)
+    else:
+        server = ProviderStandIn(
+            style=args.style, tokens=args.tokens, tokens_per_second=args.tokens_per_second,
+            chunk_tokens=args.chunk_tokens, first_token_delay=args.first_token_delay,
+            split=args.split, split_delay=args.split_delay, seed=args.seed
+        )
+        host, port = await server.start('127.0.0.1', 0)
+
+    relay_options = None
+    if args.relay:
+        relay_options = {'flush_interval': args.flush_interval, 'flush_bytes': args.flush_bytes}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def session(index):
+        async with semaphore:
+            try:
+                return await run_session(host, port, chat_request(index, args.phase), args.parser, relay_options)
+            except Exception as e:
+                return {'error': f"{type(e).__name__}: {e}"}
+
+    started = time.perf_counter()
+    try:
+        samples = await asyncio.gather(*(session(index) for index in range(args.sessions)))
+    finally:
+        if server is not None:
+            await server.close()
+    wall_seconds = time.perf_counter() - started
+
+    report = summarize(samples, wall_seconds)
+    report.update({
+        'benchmark': 'streaming',
+        'python': sys.version.split()[0],
+        'target': args.target or 'in-process stand-in',
+        'concurrency': args.concurrency,
+        'parser': args.parser,
+        'relay': relay_options,
+        'stand_in': None if args.target else {
+            'style': args.style, 'tokens': args.tokens, 'tokens_per_second': args.tokens_per_second,
+            'chunk_tokens': args.chunk_tokens, 'first_token_delay': args.first_token_delay,
+            'split': args.split, 'split_delay': args.split_delay
+        },
+    })
+    return report
+
+
+def print_results(report: dict) -> None:
+    print(f"sessions: {report['completed']}/{report['sessions']} completed, {report['errors']} errors, "
+          f"{report['wall_seconds']:.2f} s wall, concurrency {report['concurrency']}")
+    for example in report['error_examples']:
+        print(f"  error: {example}")
+    for key, label in (('ttft_ms', 'time to first token'), ('latency_ms', 'total latency')):
+        summary = report[key]
+        if summary:
+            print(f"{label:<20} p50 {summary['p50']:8.1f} ms  p95 {summary['p95']:8.1f} ms  "
+                  f"p99 {summary['p99']:8.1f} ms  max {summary['max']:8.1f} ms")
+    rates = report['tokens_per_second']
+    if rates:
+        print(f"{'tokens/s':<20} median {rates['median']:.1f}  p5 {rates['p5']:.1f}  "
+              f"aggregate {rates['aggregate']:.0f}")
+    completeness = report['completeness']
+    if completeness:
+        print(f"{'text received':<20} mean {completeness['mean'] * 100:.1f}%  min {completeness['min'] * 100:.1f}%  "
+              f"({completeness['incomplete_sessions']} incomplete sessions, {report['parse_errors']} parse errors, "
+              f"parser '{report['parser']}')")
+
+
+async def serve(args) -> None:
+    server = ProviderStandIn(
+        style=args.style, tokens=args.tokens, tokens_per_second=args.tokens_per_second,
+        chunk_tokens=args.chunk_tokens, first_token_delay=args.first_token_delay,
+        split=args.split, split_delay=args.split_delay, seed=args.seed
+    )
+    host, port = await server.start(args.host, args.port)
+    print(f"stand-in serving POST {CHAT_PATH} on {host}:{port} ({args.style}, split {args.split})")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=200, help='chat streams to open (default: 200)')
+    parser.add_argument('--concurrency', type=int, default=200, help='streams open at once (default: 200)')
+    parser.add_argument('--phase', choices=PHASES, default='intro',
+                        help='session phase used to build request messages (default: intro)')
+    parser.add_argument('--parser', choices=PARSERS, default='lines', help='client chunk parser (default: lines)')
+    parser.add_argument('--relay', action='store_true', help='put StreamRelay between the stand-in and the client')
+    parser.add_argument('--flush-interval', type=float, default=0.025, help='relay flush interval in seconds')
+    parser.add_argument('--flush-bytes', type=int, default=1024, help='relay flush size in bytes')
+    parser.add_argument('--style', choices=STYLES, default='openai', help='stand-in event format (default: openai)')
+    parser.add_argument('--tokens', type=int, default=200, help='tokens per response (default: 200)')
+    parser.add_argument('--tokens-per-second', type=float, default=50.0,
+                        help='stand-in token rate per stream, 0 for unpaced (default: 50)')
+    parser.add_argument('--chunk-tokens', type=int, default=1, help='tokens per event (default: 1)')
+    parser.add_argument('--first-token-delay', type=float, default=0.2,
+                        help='seconds before the first event (default: 0.2)')
+    parser.add_argument('--split', choices=SPLITS, default='event', help='where to cut events into writes (default: event)')
+    parser.add_argument('--split-delay', type=float, default=0.001, help='seconds between the pieces of a split event')
+    parser.add_argument('--seed', type=int, default=0, help='seed for response text and random splits')
+    parser.add_argument('--target', help='host:port of a stand-in started with --serve instead of an in-process one')
+    parser.add_argument('--serve', action='store_true', help='only run the stand-in until interrupted')
+    parser.add_argument('--host', default='127.0.0.1', help='address for --serve (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='port for --serve (default: 8765)')
+    parser.add_argument('--output', help='write results as JSON to this path')
+    parser.add_argument('--verbose', action='store_true', help='keep log output of the plugin modules')
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        import structlog
+        structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.ERROR))
+
+    if args.serve:
+        try:
+            asyncio.run(serve(args))
+        except KeyboardInterrupt:
+            pass
+        return 0
+
+    report = asyncio.run(run(args))
+    print_results(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if report['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+"""
+BrainDriveWhyDetector Context Assembler
+
+Builds the chat messages for a coach turn on the server. Instead of a fixed
+number of history messages, history is filled newest-first into a token
+budget; the system prompt, the phase prompt and the new user message are
+always kept. Token counts are cached per message, and the phase prompt is
+rendered once per phase and the SessionData fields that prompt uses.
+
+The prompt text mirrors src/prompts.ts and must be kept in sync with it.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+COACH_SYSTEM_PROMPT = """You are a warm, empathetic "Find Your Why" coach helping someone discover their core purpose.
+
+## Your Role
+- Guide users through structured self-reflection
+- Ask thoughtful follow-up questions
+- Acknowledge feelings before asking questions
+- Synthesize patterns from their stories
+- Help formulate their Why statement
+
+## Conversation Style
+- Warm and encouraging, never clinical
+- Use simple, conversational language
+- Acknowledge emotions: "That sounds meaningful..."
+- Build on responses: "You mentioned X, tell me more..."
+- Ask ONE question at a time
+
+## Phase Guidelines
+
+### INTRO (Phase 1)
+- Welcome warmly
+- Explain this is self-reflection, not therapy
+- Set expectations for the journey
+
+### SNAPSHOT (Phase 2)
+Ask about:
+- Current work/role
+- What they like about it
+- What frustrates them
+- One thing they'd change
+
+### ENERGY MAP (Phase 3)
+Explore:
+- Times they felt energized, time flew by
+- Times they felt drained, watching the clock
+- Go deeper: "What specifically made that moment good/bad?"
+- Get at least 3 energizers and 3 drainers
+
+### DEEP STORIES (Phase 4)
+Ask about:
+- A time they felt proud
+- A time they helped someone that stayed with them
+- Use [Acknowledge] + [Build] + [Question] pattern
+- Periodically synthesize: "So what I'm hearing is..."
+
+### PATTERNS (Phase 5)
+- Identify recurring themes
+- Share observations: "I keep seeing patterns like..."
+- Check with user: "Does this feel true?"
+- Refine based on feedback
+
+### STATEMENT (Phase 6)
+- Propose a Why: "To ___ so that ___"
+- It's a draft, not holy text
+- Refine based on user feedback
+
+### ACTION (Phase 7)
+- Discuss how to apply the Why
+- Suggest practical next steps
+- Celebrate their journey
+
+## Safety Rules
+- You are NOT a therapist
+- Never diagnose or use clinical language
+- If user shows distress, suggest professional help
+- Keep focus on self-reflection and purpose"""
+
+START_SESSION = 'START_SESSION'
+
+# Tokens the chat format adds around every message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def _joined(values: Iterable[str], empty: str) -> str:
+    return ', '.join(values) or empty
+
+
+def _phase_inputs(phase: str, session_data: Dict[str, Any]) -> tuple:
+    """The parts of SessionData that get_phase_prompt() reads for phase."""
+    if phase == 'energy_map':
+        return (len(session_data['energizers']), len(session_data['drainers']))
+    if phase == 'deep_stories':
+        return (len(session_data['stories']),)
+    if phase == 'patterns':
+        return (tuple(session_data['energizers']), tuple(session_data['drainers']), tuple(session_data['patterns']))
+    if phase in ('statement', 'action'):
+        return (session_data['whyStatement'],)
+    return ()
+
+
+def get_phase_prompt(phase: str, session_data: Dict[str, Any]) -> str:
+    if phase == 'intro':
+        return 'Start with a warm welcome. This is the beginning of our conversation.'
+    if phase == 'snapshot':
+        return """We're gathering a quick snapshot of who they are today. Ask about:
+- What they currently do (work/life)
+- What they enjoy about it
+- What frustrates them
+- What they'd change if they could"""
+    if phase == 'energy_map':
+        return f"""We're mapping their energy. Current progress:
+- Energizers found: {len(session_data['energizers'])}/3 minimum
+- Drainers found: {len(session_data['drainers'])}/3 minimum
+
+Ask about specific times they felt energized or drained. Go deeper on each one."""
+    if phase == 'deep_stories':
+        return f"""We're exploring meaningful stories. Stories collected: {len(session_data['stories'])}
+
+Ask about:
+- Times they felt proud
+- Times they helped someone that stayed with them
+- What values showed up in those moments
+
+Use the [Acknowledge] + [Build] + [Question] pattern."""
+    if phase == 'patterns':
+        return f"""Time to identify patterns. We have:
+- Energizers: {_joined(session_data['energizers'], 'none yet')}
+- Drainers: {_joined(session_data['drainers'], 'none yet')}
+- Patterns noted: {_joined(session_data['patterns'], 'none yet')}
+
+Share the themes you see. Check if they resonate with the user."""
+    if phase == 'statement':
+        return f"""Time to formulate their Why statement.
+Current draft: {session_data['whyStatement'] or 'Not yet created'}
+
+Propose a "To ___ so that ___" statement based on the patterns.
+Be open to refinement."""
+    if phase == 'action':
+        return f"""Wrap up the session positively.
+Their Why: {session_data['whyStatement'] or 'To be finalized'}
+
+Discuss how they can apply this Why in daily life and decisions.
+Celebrate their journey."""
+    return ''
+
+
+def _load_tiktoken_encoder():
+    """Return a cl100k_base encoder when the optional tiktoken package and its data are available."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.get_encoding('cl100k_base')
+    except Exception as e:
+        logger.warning(f"BrainDriveWhyDetector: tiktoken encoding unavailable, estimating tokens: {e}")
+        return None
+
+
+_encoder = None
+_encoder_loaded = False
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken if installed, otherwise estimate about four characters per token."""
+    global _encoder, _encoder_loaded
+    if not _encoder_loaded:
+        _encoder = _load_tiktoken_encoder()
+        _encoder_loaded = True
+    if _encoder is not None:
+        return len(_encoder.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+class ContextAssembler:
+    """Assemble coach messages within a token budget.
+
+    token_budget covers the whole prompt, including per-message overhead;
+    leave room in it for the model's reply.
+    """
+
+    def __init__(self, token_budget: int = 6000, max_history: Optional[int] = None,
+                 counter: Callable[[str], int] = count_tokens, cache_size: int = 8192,
+                 prompt_cache_size: int = 256):
+        self.token_budget = token_budget
+        self.max_history = max_history
+        self.counter = counter
+        self.cache_size = cache_size
+        self.prompt_cache_size = prompt_cache_size
+        self._token_cache: OrderedDict[str, int] = OrderedDict()
+        self._prompt_cache: OrderedDict[tuple, Tuple[List[Dict[str, str]], int]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._system_message = {'role': 'system', 'content': COACH_SYSTEM_PROMPT}
+        self._system_tokens = self.counter(COACH_SYSTEM_PROMPT) + MESSAGE_OVERHEAD_TOKENS
+
+    def message_tokens(self, content: str) -> int:
+        """Token cost of one message, counted once per distinct content."""
+        with self._lock:
+            tokens = self._token_cache.get(content)
+            if tokens is not None:
+                self._token_cache.move_to_end(content)
+                return tokens
+        tokens = self.counter(content) + MESSAGE_OVERHEAD_TOKENS
+        with self._lock:
+            self._token_cache[content] = tokens
+            while len(self._token_cache) > self.cache_size:
+                self._token_cache.popitem(last=False)
+        return tokens
+
+    def render_prompts(self, phase: str, session_data: Dict[str, Any]) -> Tuple[List[Dict[str, str]], int]:
+        """The system and phase messages with their token cost, cached per prompt fingerprint."""
+        fingerprint = (phase, _phase_inputs(phase, session_data))
+        with self._lock:
+            cached = self._prompt_cache.get(fingerprint)
+            if cached is not None:
+                self._prompt_cache.move_to_end(fingerprint)
+                return cached
+
+        messages = [self._system_message]
+        tokens = self._system_tokens
+        phase_context = get_phase_prompt(phase, session_data)
+        if phase_context:
+            content = f"[Current Phase: {phase.upper()}]\n{phase_context}"
+            messages.append({'role': 'system', 'content': content})
+            tokens += self.counter(content) + MESSAGE_OVERHEAD_TOKENS
+
+        with self._lock:
+            self._prompt_cache[fingerprint] = (messages, tokens)
+            while len(self._prompt_cache) > self.prompt_cache_size:
+                self._prompt_cache.popitem(last=False)
+        return messages, tokens
+
+    def assemble(self, phase: str, session_data: Dict[str, Any], history: List[Dict[str, Any]],
+                 user_message: Optional[str] = None, token_budget: Optional[int] = None) -> Dict[str, Any]:
+        """Build the messages for one turn, like buildCoachMessages but budgeted by tokens.
+
+        History entries may use either role ('user'/'assistant') or sender
+        ('user'/'coach'). The most recent history that fits is kept; once a
+        message does not fit, older ones are dropped too so the kept history
+        stays contiguous.
+        """
+        budget = self.token_budget if token_budget is None else token_budget
+        prompt_messages, used = self.render_prompts(phase, session_data)
+
+        tail = []
+        if user_message and user_message != START_SESSION:
+            tail.append({'role': 'user', 'content': user_message})
+            used += self.message_tokens(user_message)
+
+        candidates = history
+        if self.max_history is not None:
+            candidates = history[-self.max_history:] if self.max_history > 0 else []
+        included = []
+        for message in reversed(candidates):
+            tokens = self.message_tokens(message['content'])
+            if used + tokens > budget:
+                break
+            used += tokens
+            sender = message.get('role') or message.get('sender')
+            included.append({
+                'role': 'assistant' if sender in ('coach', 'assistant') else 'user',
+                'content': message['content']
+            })
+        included.reverse()
+
+        return {
+            'messages': [dict(message) for message in prompt_messages] + included + tail,
+            'tokens': used,
+            'token_budget': budget,
+            'history_included': len(included),
+            'history_dropped': len(history) - len(included),
+            'over_budget': used > budget
+        }
+
+    def assemble_from_session(self, session: Dict[str, Any], user_message: Optional[str] = None,
+                              token_budget: Optional[int] = None) -> Dict[str, Any]:
+        """assemble() for a session loaded from session_store."""
+        return self.assemble(
+            session['phase'], session['session_data'], session['messages'], user_message, token_budget
+        )
+
+    def clear_caches(self) -> None:
+        with self._lock:
+            self._token_cache.clear()
+            self._prompt_cache.clear()
+
+
+_context_assembler: Optional[ContextAssembler] = None
+
+
+def get_context_assembler() -> ContextAssembler:
+    global _context_assembler
+    if _context_assembler is None:
+        _context_assembler = ContextAssembler()
+    return _context_assembler
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+BrainDriveWhyDetector Crisis Detector
+
+Screens user input and streamed coach output for crisis keywords. The keyword
+list is compiled once into an Aho-Corasick automaton, so a scan is a single
+pass over the text however many keywords there are. Text is normalized before
+matching (case folded, accents stripped, punctuation and whitespace runs
+collapsed to one space), so "Kill-Myself" and "kill  myself" match "kill myself".
+
+A stream scanner keeps its automaton and normalization state between feed()
+calls, so keywords split across SSE chunks are found without rescanning what
+was already seen.
+"""
+
+from __future__ import annotations
+
+import threading
+import unicodedata
+from collections import deque
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Mirrors CRISIS_KEYWORDS in src/types.ts.
+CRISIS_KEYWORDS = (
+    'suicide', 'kill myself', 'end my life', 'self-harm', 'hurt myself',
+    'want to die', 'no reason to live', 'better off dead'
+)
+
+_normalized_chars: Dict[str, str] = {}
+_normalized_chars_lock = threading.Lock()
+
+
+def _normalize_char(ch: str) -> str:
+    """Normalize one character to zero or more lowercase letters/digits, or a single space."""
+    normalized = _normalized_chars.get(ch)
+    if normalized is None:
+        parts = []
+        for decomposed in unicodedata.normalize('NFKD', ch):
+            if unicodedata.combining(decomposed):
+                continue
+            for folded in decomposed.casefold():
+                parts.append(folded if folded.isalnum() else ' ')
+        normalized = ''.join(parts)
+        with _normalized_chars_lock:
+            _normalized_chars[ch] = normalized
+    return normalized
+
+
+def normalize_text(text: str) -> str:
+    """The normalization applied to keywords and scanned text, for a whole string."""
+    normalized = []
+    last_space = True
+    for ch in text:
+        for out in _normalize_char(ch):
+            if out == ' ':
+                if last_space:
+                    continue
+                last_space = True
+            else:
+                last_space = False
+            normalized.append(out)
+    return ''.join(normalized).rstrip(' ')
+
+
+class CrisisMatch(NamedTuple):
+    keyword: str
+    # Offset just past the match in the normalized text seen so far
+    end: int
+
+
+class _Automaton:
+    """Aho-Corasick goto/fail/output tables over normalized keywords."""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[Tuple[str, ...]] = [()]
+        self.keywords: Dict[str, str] = {}
+
+        for keyword in keywords:
+            normalized = normalize_text(keyword)
+            if not normalized or normalized in self.keywords:
+                continue
+            self.keywords[normalized] = keyword
+            state = 0
+            for ch in normalized:
+                next_state = self.goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(())
+                    self.goto[state][ch] = next_state
+                state = next_state
+            self.output[state] = self.output[state] + (keyword,)
+
+        # Breadth-first fail links; outputs of the fail target are merged in.
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and ch not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                target = self.goto[fallback].get(ch, 0)
+                self.fail[next_state] = target if target != next_state else 0
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def step(self, state: int, ch: str) -> int:
+        goto = self.goto
+        while True:
+            next_state = goto[state].get(ch)
+            if next_state is not None:
+                return next_state
+            if state == 0:
+                return 0
+            state = self.fail[state]
+
+
+class CrisisStreamScanner:
+    """Incremental scanner for one stream; create one per message or response."""
+
+    def __init__(self, automaton: _Automaton):
+        self._automaton = automaton
+        self._state = 0
+        # Start as if after a space so leading punctuation and whitespace are dropped.
+        self._last_space = True
+        self._position = 0
+        self.matches: List[CrisisMatch] = []
+
+    @property
+    def matched(self) -> bool:
+        return bool(self.matches)
+
+    def feed(self, chunk: str) -> List[CrisisMatch]:
+        """Scan the next chunk and return the matches that end in it."""
+        automaton = self._automaton
+        output = automaton.output
+        state = self._state
+        last_space = self._last_space
+        position = self._position
+        found = []
+        for ch in chunk:
+            for out in _normalize_char(ch):
+                if out == ' ':
+                    if last_space:
+                        continue
+                    last_space = True
+                else:
+                    last_space = False
+                state = automaton.step(state, out)
+                position += 1
+                for keyword in output[state]:
+                    found.append(CrisisMatch(keyword, position))
+        self._state = state
+        self._last_space = last_space
+        self._position = position
+        self.matches.extend(found)
+        return found
+
+    def reset(self) -> None:
+        self._state = 0
+        self._last_space = True
+        self._position = 0
+        self.matches = []
+
+
+class CrisisDetector:
+    """Compiled keyword matcher shared by all scans; safe to use from several threads."""
+
+    def __init__(self, keywords: Iterable[str] = CRISIS_KEYWORDS):
+        self._automaton = _Automaton(keywords)
+
+    @property
+    def keywords(self) -> List[str]:
+        return list(self._automaton.keywords.values())
+
+    def stream(self) -> CrisisStreamScanner:
+        return CrisisStreamScanner(self._automaton)
+
+    def scan(self, text: str) -> List[CrisisMatch]:
+        return self.stream().feed(text)
+
+    def contains_crisis_content(self, text: str) -> bool:
+        return bool(self.scan(text))
+
+
+_crisis_detector: Optional[CrisisDetector] = None
+
+
+def get_crisis_detector() -> CrisisDetector:
+    global _crisis_detector
+    if _crisis_detector is None:
+        _crisis_detector = CrisisDetector()
+    return _crisis_detector
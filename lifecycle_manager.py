@@ -5,90 +5,883 @@ BrainDriveWhyDetector Plugin Lifecycle Manager
 Handles install/update/delete operations for the BrainDriveWhyDetector plugin.
 """
 
+from __future__ import annotations
+
 import json
+import re
+import sys
+import importlib
 import logging
 import datetime
 import os
 import shutil
 import asyncio
+import hashlib
+import contextlib
+import copy
+import functools
+import itertools
+import errno
+import time
+import threading
+import gzip
+import mimetypes
+import mmap
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, Optional
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Dict, Any, Optional, Iterable, List, Mapping, NamedTuple, Tuple
 import structlog
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
 logger = structlog.get_logger()
 
-# Import base lifecycle manager
+
+# SQLAlchemy is imported on first use so the plugin loader can import this
+# module without paying for it.
+def text(sql: str):
+    from sqlalchemy import text as _text
+    return _text(sql)
+
+
+def bindparam(key: str, **kwargs):
+    from sqlalchemy import bindparam as _bindparam
+    return _bindparam(key, **kwargs)
+
+
+def inspect(subject):
+    from sqlalchemy import inspect as _inspect
+    return _inspect(subject)
+
+
+def _is_integrity_error(error: BaseException) -> bool:
+    from sqlalchemy.exc import IntegrityError
+    return isinstance(error, IntegrityError)
+
+
+def _load_base_lifecycle_manager():
+    try:
+        from app.plugins.base_lifecycle_manager import BaseLifecycleManager
+        logger.info("Using BaseLifecycleManager from app.plugins")
+        return BaseLifecycleManager
+    except ImportError:
+        pass
+    
+    # Import the backend copy through the regular import system so it is
+    # registered in sys.modules before it runs and its own imports resolve:
+    # as app.plugins.base_lifecycle_manager when the backend package is
+    # importable from its root, otherwise as a top-level module next to its
+    # siblings in app/plugins.
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    backend_root = os.path.abspath(os.path.join(current_dir, "..", "..", "backend"))
+    plugins_dir = os.path.join(backend_root, "app", "plugins")
+    backend_file = os.path.join(plugins_dir, "base_lifecycle_manager.py")
+    if os.path.isfile(backend_file):
+        candidates = []
+        if os.path.isfile(os.path.join(backend_root, "app", "__init__.py")):
+            candidates.append((backend_root, "app.plugins.base_lifecycle_manager"))
+        candidates.append((plugins_dir, "base_lifecycle_manager"))
+        error = None
+        for search_path, module_name in candidates:
+            if search_path not in sys.path:
+                sys.path.append(search_path)
+            try:
+                module = importlib.import_module(module_name)
+                logger.info(f"Using BaseLifecycleManager from local backend: {backend_file}")
+                return module.BaseLifecycleManager
+            except (ImportError, AttributeError) as e:
+                error = e
+        logger.error(f"Failed to import BaseLifecycleManager: {error}")
+        raise ImportError("BrainDriveWhyDetector plugin requires BaseLifecycleManager") from error
+    
+    logger.warning(f"BaseLifecycleManager not found at {backend_file}, using minimal implementation")
+    from abc import ABC, abstractmethod
+    from typing import Set
+    
+    class BaseLifecycleManager(ABC):
+        def __init__(self, plugin_slug: str, version: str, shared_storage_path: Path):
+            self.plugin_slug = plugin_slug
+            self.version = version
+            self.shared_path = shared_storage_path
+            self.active_users: Set[str] = set()
+            self.instance_id = f"{plugin_slug}_{version}"
+            self.created_at = datetime.datetime.now()
+            self.last_used = datetime.datetime.now()
+        
+        async def install_for_user(self, user_id: str, db, shared_plugin_path: Path):
+            if user_id in self.active_users:
+                return {'success': False, 'error': 'Plugin already installed for user'}
+            result = await self._perform_user_installation(user_id, db, shared_plugin_path)
+            if result['success']:
+                self.active_users.add(user_id)
+                self.last_used = datetime.datetime.now()
+            return result
+        
+        async def uninstall_for_user(self, user_id: str, db):
+            if user_id not in self.active_users:
+                return {'success': False, 'error': 'Plugin not installed for user'}
+            result = await self._perform_user_uninstallation(user_id, db)
+            if result['success']:
+                self.active_users.discard(user_id)
+                self.last_used = datetime.datetime.now()
+            return result
+        
+        @abstractmethod
+        async def get_plugin_metadata(self): pass
+        @abstractmethod
+        async def get_module_metadata(self): pass
+        @abstractmethod
+        async def _perform_user_installation(self, user_id, db, shared_plugin_path): pass
+        @abstractmethod
+        async def _perform_user_uninstallation(self, user_id, db): pass
+    
+    logger.info("Using minimal BaseLifecycleManager implementation")
+    return BaseLifecycleManager
+
+
+# The base class is resolved on first use rather than at import, so the plugin
+# loader can import this module without searching the filesystem for the
+# backend. BaseLifecycleManager and BrainDriveWhyDetectorLifecycleManager are
+# served by the module __getattr__ below.
+_manager_class_instance: Optional[type] = None
+_manager_class_lock = threading.Lock()
+
+
+def _manager_class() -> type:
+    """Return BrainDriveWhyDetectorLifecycleManager, building it on first call."""
+    global _manager_class_instance
+    if _manager_class_instance is None:
+        with _manager_class_lock:
+            if _manager_class_instance is None:
+                base = _load_base_lifecycle_manager()
+                body = _LifecycleManagerBody
+                cls = type(base)(
+                    'BrainDriveWhyDetectorLifecycleManager',
+                    (body, base),
+                    {'__module__': __name__, '__qualname__': 'BrainDriveWhyDetectorLifecycleManager',
+                     '__doc__': body.__doc__}
+                )
+                globals().update(BaseLifecycleManager=base, BrainDriveWhyDetectorLifecycleManager=cls)
+                _manager_class_instance = cls
+    return _manager_class_instance
+
+
+_LAZY_ATTRIBUTES = ('BaseLifecycleManager', 'BrainDriveWhyDetectorLifecycleManager')
+
+
+def __getattr__(name: str):
+    if name in _LAZY_ATTRIBUTES:
+        _manager_class()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
+
+def _session_store_module():
+    """Import session_store under its own name, so the host application and this
+    module share one module and one process-wide SessionStore."""
+    plugin_dir = os.path.dirname(os.path.abspath(__file__))
+    if plugin_dir not in sys.path:
+        sys.path.append(plugin_dir)
+    import session_store
+    return session_store
+
+
 try:
-    from app.plugins.base_lifecycle_manager import BaseLifecycleManager
-    logger.info("Using BaseLifecycleManager from app.plugins")
-except ImportError:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# Bounded pool for blocking filesystem work so lifecycle calls never stall the event loop.
+_IO_MAX_WORKERS = min(8, (os.cpu_count() or 1) + 4)
+_io_executor_instance: Optional[ThreadPoolExecutor] = None
+
+
+def _io_executor() -> ThreadPoolExecutor:
+    global _io_executor_instance
+    if _io_executor_instance is None:
+        _io_executor_instance = ThreadPoolExecutor(
+            max_workers=_IO_MAX_WORKERS,
+            thread_name_prefix="whydetector-io"
+        )
+    return _io_executor_instance
+
+
+async def _run_io(func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_io_executor(), functools.partial(func, *args, **kwargs))
+
+
+def _acquire_file_lock(lock_path: Path):
+    """Open and lock lock_path, retrying if the holder removed the file meanwhile."""
+    while True:
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(lock_path, 'a+')
+        try:
+            if fcntl is None:
+                # Windows cannot remove a file that is open, so the file is never replaced.
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                return lock_file
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            locked = os.fstat(lock_file.fileno())
+            try:
+                current = os.stat(lock_path)
+            except FileNotFoundError:
+                current = None
+            if current is not None and (current.st_dev, current.st_ino) == (locked.st_dev, locked.st_ino):
+                return lock_file
+        except BaseException:
+            lock_file.close()
+            raise
+        lock_file.close()
+
+
+def _remove_lock_file(lock_path: Path) -> None:
+    """Remove a lock file while holding its lock; waiters then lock a new file."""
+    with contextlib.suppress(OSError):
+        lock_path.unlink()
+
+
+def _release_file_lock(lock_file) -> None:
     try:
-        import sys
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        backend_path = os.path.join(current_dir, "..", "..", "backend", "app", "plugins")
-        backend_path = os.path.abspath(backend_path)
-        
-        if os.path.exists(backend_path):
-            if backend_path not in sys.path:
-                sys.path.insert(0, backend_path)
-            from base_lifecycle_manager import BaseLifecycleManager
-            logger.info(f"Using BaseLifecycleManager from local backend: {backend_path}")
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
         else:
-            logger.warning(f"BaseLifecycleManager not found at {backend_path}, using minimal implementation")
-            from abc import ABC, abstractmethod
-            from datetime import datetime
-            from pathlib import Path
-            from typing import Set
-            
-            class BaseLifecycleManager(ABC):
-                def __init__(self, plugin_slug: str, version: str, shared_storage_path: Path):
-                    self.plugin_slug = plugin_slug
-                    self.version = version
-                    self.shared_path = shared_storage_path
-                    self.active_users: Set[str] = set()
-                    self.instance_id = f"{plugin_slug}_{version}"
-                    self.created_at = datetime.now()
-                    self.last_used = datetime.now()
-                
-                async def install_for_user(self, user_id: str, db, shared_plugin_path: Path):
-                    if user_id in self.active_users:
-                        return {'success': False, 'error': 'Plugin already installed for user'}
-                    result = await self._perform_user_installation(user_id, db, shared_plugin_path)
-                    if result['success']:
-                        self.active_users.add(user_id)
-                        self.last_used = datetime.now()
-                    return result
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+    finally:
+        lock_file.close()
+
+
+# In-process locks per event loop and lock file, so only one coroutine per process
+# blocks on the OS lock. asyncio.Lock binds to the loop that first waits on it, so
+# each loop (tests, worker processes, asyncio.run per call) gets its own locks.
+_process_file_locks: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_process_file_locks_guard = threading.Lock()
+
+
+def _process_file_lock(lock_path: Path) -> asyncio.Lock:
+    loop = asyncio.get_running_loop()
+    with _process_file_locks_guard:
+        locks = _process_file_locks.get(loop)
+        if locks is None:
+            locks = _process_file_locks[loop] = {}
+        lock = locks.get(str(lock_path))
+        if lock is None:
+            lock = locks[str(lock_path)] = asyncio.Lock()
+        return lock
+
+
+@contextlib.asynccontextmanager
+async def _exclusive_file_lock(lock_path: Path):
+    """Hold an exclusive OS-level lock on lock_path.
+    
+    Coroutines of this process queue on an asyncio.Lock first; the remaining
+    wait for other processes happens on the loop's default executor, never on
+    the bounded I/O pool that the lock holder needs to make progress.
+    """
+    process_lock = _process_file_lock(lock_path)
+    async with process_lock:
+        loop = asyncio.get_running_loop()
+        lock_file = await loop.run_in_executor(None, _acquire_file_lock, lock_path)
+        try:
+            yield
+        finally:
+            await _run_io(_release_file_lock, lock_file)
+
+
+def _fast_copy(source: Path, target: Path) -> int:
+    """Copy a file with copy_file_range where available and preserve metadata like copy2.
+    
+    Falls back to shutil.copyfile, which itself uses sendfile/fcopyfile on
+    platforms that have them.
+    """
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    copied = False
+    if copy_file_range is not None:
+        try:
+            with open(source, 'rb') as src, open(target, 'wb') as dst:
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    sent = copy_file_range(src.fileno(), dst.fileno(), remaining)
+                    if sent == 0:
+                        break
+                    remaining -= sent
+            copied = remaining == 0
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EPERM):
+                raise
+    if not copied:
+        shutil.copyfile(source, target)
+    shutil.copystat(source, target)
+    return target.stat().st_size
+
+
+def brotli_compress(data: bytes) -> Optional[bytes]:
+    """Compress with brotli when the optional brotli package is installed, else return None.
+
+    Shared by the precompressed asset copies and benchmarks/bench_bundle.py.
+    """
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+
+def _version_key(version: Any) -> tuple:
+    """Sort key for plugin versions such as 1.0.4, v1.1 or 1.2.0-beta.1.
+    
+    Release parts compare numerically with trailing zeros ignored, and a
+    pre-release sorts before its release.
+    """
+    release, _, pre_release = str(version).strip().lstrip('vV').split('+', 1)[0].partition('-')
+    numbers = []
+    for part in release.split('.'):
+        digits = ''.join(itertools.takewhile(str.isdigit, part))
+        numbers.append(int(digits) if digits else 0)
+    while numbers and numbers[-1] == 0:
+        numbers.pop()
+    if not pre_release:
+        return (tuple(numbers), (1,))
+    return (tuple(numbers), (0, tuple(
+        (0, int(part), '') if part.isdigit() else (1, 0, part) for part in pre_release.split('.')
+    )))
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class LifecycleMetrics:
+    """Metrics backend interface for lifecycle operations.
+    
+    The base class discards everything. Install a backend with
+    set_lifecycle_metrics() to forward timings and counters elsewhere.
+    """
+    
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        """Record value in the histogram name."""
+    
+    def inc(self, name: str, amount: float = 1, labels: Optional[Dict[str, str]] = None) -> None:
+        """Add amount to the counter name."""
+
+
+class InProcessMetricsRegistry(LifecycleMetrics):
+    """Thread-safe in-process histograms and counters with a Prometheus text exporter."""
+    
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+    
+    HELP = {
+        'whydetector_lifecycle_operation_seconds': 'Duration of lifecycle operations.',
+        'whydetector_lifecycle_phase_seconds': 'Duration of individual lifecycle phases.',
+        'whydetector_lifecycle_operations_total': 'Lifecycle operations by outcome.',
+        'whydetector_copy_files_total': 'Files written to shared plugin directories.',
+        'whydetector_copy_bytes_total': 'Bytes written to the shared plugin object store.',
+        'whydetector_health_checks_total': 'Plugin health lookups by cache result.',
+        'whydetector_single_flight_shared_total': 'Lifecycle calls answered by an identical in-flight call.',
+        'whydetector_integrity_checks_total': 'Background integrity checks of shared directories by result.',
+        'whydetector_integrity_bytes_total': 'Bytes hashed by the background integrity verifier.',
+    }
+    
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[tuple, list]] = {}
+        self._counters: Dict[str, Dict[tuple, float]] = {}
+    
+    def observe(self, name: str, value: float, labels: Optional[Dict[str, str]] = None) -> None:
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            state = series.get(key)
+            if state is None:
+                # [per-bucket counts..., sum, count]
+                state = series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+    
+    def inc(self, name: str, amount: float = 1, labels: Optional[Dict[str, str]] = None) -> None:
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+    
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'histograms': {
+                    name: [
+                        {'labels': dict(key), 'count': state[-1], 'sum': state[-2]}
+                        for key, state in series.items()
+                    ]
+                    for name, series in self._histograms.items()
+                },
+                'counters': {
+                    name: [{'labels': dict(key), 'value': value} for key, value in series.items()]
+                    for name, series in self._counters.items()
+                }
+            }
+    
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+    
+    @staticmethod
+    def _format_labels(labels: tuple, extra: Optional[tuple] = None) -> str:
+        pairs = list(labels) + ([extra] if extra else [])
+        if not pairs:
+            return ''
+        escaped = []
+        for key, value in pairs:
+            value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            escaped.append(f'{key}="{value}"')
+        return '{' + ','.join(escaped) + '}'
+    
+    def render_prometheus(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                lines.append(f"# HELP {name} {self.HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, state in sorted(series.items()):
+                    for index, bound in enumerate(self.buckets):
+                        lines.append(f"{name}_bucket{self._format_labels(key, ('le', repr(float(bound))))} {state[index]}")
+                    lines.append(f"{name}_bucket{self._format_labels(key, ('le', '+Inf'))} {state[-1]}")
+                    lines.append(f"{name}_sum{self._format_labels(key)} {state[-2]}")
+                    lines.append(f"{name}_count{self._format_labels(key)} {state[-1]}")
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# HELP {name} {self.HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{self._format_labels(key)} {value}")
+        return '\n'.join(lines) + '\n'
+
+
+_lifecycle_metrics: LifecycleMetrics = InProcessMetricsRegistry()
+
+
+def get_lifecycle_metrics() -> LifecycleMetrics:
+    return _lifecycle_metrics
+
+
+def set_lifecycle_metrics(backend: LifecycleMetrics) -> None:
+    """Replace the process-wide metrics backend, e.g. with an adapter to prometheus_client."""
+    global _lifecycle_metrics
+    _lifecycle_metrics = backend
+
+
+@contextlib.contextmanager
+def _phase(name: str):
+    """Time one step of a lifecycle operation into whydetector_lifecycle_phase_seconds."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        _lifecycle_metrics.observe('whydetector_lifecycle_phase_seconds', elapsed, {'phase': name})
+        logger.debug(f"BrainDriveWhyDetector: phase {name} took {elapsed * 1000:.2f} ms")
+
+
+def _timed_operation(operation: str):
+    """Record duration and outcome of a lifecycle method returning a result dict."""
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            outcome = 'error'
+            try:
+                result = await func(*args, **kwargs)
+                if isinstance(result, dict):
+                    if result.get('success') or result.get('exists') or result.get('status') == 'not_installed':
+                        outcome = 'success'
+                    else:
+                        outcome = 'failure'
+                return result
+            finally:
+                elapsed = time.perf_counter() - start
+                labels = {'operation': operation, 'outcome': outcome}
+                _lifecycle_metrics.observe('whydetector_lifecycle_operation_seconds', elapsed, labels)
+                _lifecycle_metrics.inc('whydetector_lifecycle_operations_total', 1, labels)
+                logger.debug(f"BrainDriveWhyDetector: {operation} finished ({outcome}) in {elapsed * 1000:.2f} ms")
+        return wrapper
+    return decorator
+
+
+class IntegrityVerifier:
+    """Verify shared version directories against their file manifest on a background thread.
+    
+    Every file listed in a version's manifest is hashed through a read-only
+    memory map. Hashing is paced so it stays under max_bytes_per_second of
+    reads and roughly cpu_fraction of one core; results are kept in memory
+    and read without touching the disk.
+    """
+    
+    BLOCK_SIZE = 1024 * 1024
+    
+    def __init__(self, plugin_root: Path, manifest_filename: str, interval: float = 300.0,
+                 max_bytes_per_second: float = 32 * 1024 * 1024, cpu_fraction: float = 0.25):
+        self.plugin_root = Path(plugin_root)
+        self.manifest_filename = manifest_filename
+        self.interval = interval
+        self.max_bytes_per_second = max_bytes_per_second
+        self.cpu_fraction = cpu_fraction
+        self._results: Dict[str, Dict[str, Any]] = {}
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"integrity-verifier:{self.plugin_root.name}", daemon=True
+        )
+        self._thread.start()
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+    
+    def result(self, version_dir: Path) -> Dict[str, Any]:
+        """Return the latest result for version_dir, or a pending marker when it has not been checked."""
+        with self._lock:
+            result = self._results.get(str(version_dir))
+        if result is None:
+            return {'status': 'pending'}
+        return {**result, 'mismatched': list(result['mismatched']), 'missing': list(result['missing'])}
+    
+    def invalidate(self, version_dir: Path) -> None:
+        """Forget the result for version_dir and wake the thread to re-check it.
+        
+        A pass that was already hashing version_dir discards its result.
+        """
+        key = str(version_dir)
+        with self._lock:
+            self._results.pop(key, None)
+            self._generations[key] = self._generations.get(key, 0) + 1
+        self._wake.set()
+    
+    def verify_all(self) -> Dict[str, Dict[str, Any]]:
+        """Run one pass over every version directory on the calling thread."""
+        results = {}
+        try:
+            version_dirs = sorted(
+                path for path in self.plugin_root.iterdir()
+                if path.is_dir() and not path.name.startswith('.')
+            )
+        except OSError:
+            return results
+        for version_dir in version_dirs:
+            if self._stop.is_set():
+                break
+            result = self.verify_directory(version_dir)
+            if result is not None:
+                results[str(version_dir)] = result
+        return results
+    
+    def verify_directory(self, version_dir: Path) -> Optional[Dict[str, Any]]:
+        """Hash one version directory and record the result.
+        
+        Returns None when the directory changed during the pass; the next pass
+        picks it up again.
+        """
+        key = str(version_dir)
+        manifest_path = version_dir / self.manifest_filename
+        with self._lock:
+            generation = self._generations.get(key, 0)
+        started = time.monotonic()
+        
+        try:
+            manifest_stat = manifest_path.stat()
+            with open(manifest_path, 'r') as f:
+                files = json.load(f)['files']
+        except (OSError, json.JSONDecodeError, KeyError) as e:
+            result = self._make_result('unverifiable', started, 0, 0, [], [], error=str(e))
+        else:
+            mismatched, missing = [], []
+            bytes_hashed = 0
+            for relative_path, entry in sorted(files.items()):
+                if self._stop.is_set():
+                    return None
+                try:
+                    sha256, size = self._hash_file(version_dir / relative_path)
+                except FileNotFoundError:
+                    missing.append(relative_path)
+                    continue
+                except OSError:
+                    mismatched.append(relative_path)
+                    continue
+                bytes_hashed += size
+                if sha256 != entry.get('sha256') or size != entry.get('size'):
+                    mismatched.append(relative_path)
+            
+            try:
+                manifest_changed = manifest_path.stat().st_mtime_ns != manifest_stat.st_mtime_ns
+            except OSError:
+                manifest_changed = True
+            if manifest_changed:
+                return None
+            status = 'corrupt' if mismatched or missing else 'ok'
+            result = self._make_result(status, started, len(files), bytes_hashed, mismatched, missing)
+            _lifecycle_metrics.inc('whydetector_integrity_bytes_total', bytes_hashed)
+        
+        with self._lock:
+            if self._generations.get(key, 0) != generation:
+                return None
+            self._results[key] = result
+        _lifecycle_metrics.inc('whydetector_integrity_checks_total', 1, {'status': result['status']})
+        if result['status'] != 'ok':
+            logger.warning(f"BrainDriveWhyDetector: Integrity check {result['status']} for {version_dir}: "
+                           f"{len(result['mismatched'])} mismatched, {len(result['missing'])} missing")
+        return result
+    
+    @staticmethod
+    def _make_result(status: str, started: float, files_checked: int, bytes_hashed: int,
+                     mismatched: List[str], missing: List[str], error: Optional[str] = None) -> Dict[str, Any]:
+        result = {
+            'status': status,
+            'checked_at': datetime.datetime.now().isoformat(timespec='seconds'),
+            'duration_seconds': round(time.monotonic() - started, 6),
+            'files_checked': files_checked,
+            'bytes_hashed': bytes_hashed,
+            'mismatched': mismatched,
+            'missing': missing,
+        }
+        if error is not None:
+            result['error'] = error
+        return result
+    
+    def _hash_file(self, path: Path) -> Tuple[str, int]:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return digest.hexdigest(), 0
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    for offset in range(0, size, self.BLOCK_SIZE):
+                        block_started = time.monotonic()
+                        cpu_started = time.thread_time()
+                        digest.update(view[offset:offset + self.BLOCK_SIZE])
+                        self._throttle(
+                            min(self.BLOCK_SIZE, size - offset),
+                            time.monotonic() - block_started,
+                            time.thread_time() - cpu_started
+                        )
+                finally:
+                    view.release()
+        return digest.hexdigest(), size
+    
+    def _throttle(self, nbytes: int, elapsed: float, cpu_seconds: float) -> None:
+        """Sleep long enough to keep this block within the I/O and CPU budgets."""
+        delay = 0.0
+        if self.max_bytes_per_second:
+            delay = nbytes / self.max_bytes_per_second - elapsed
+        if 0 < self.cpu_fraction < 1:
+            delay = max(delay, cpu_seconds * (1 / self.cpu_fraction - 1))
+        if delay > 0:
+            self._stop.wait(delay)
+    
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                self.verify_all()
+            except Exception as e:
+                logger.error(f"BrainDriveWhyDetector: Integrity verifier pass failed: {e}")
+            self._wake.wait(self.interval)
+
+
+def _single_flight(operation: str, exclusive: bool):
+    """Share one execution between identical concurrent calls for the same user and session.
+    
+    Calls are keyed by (operation, user_id, version, session); a call arriving
+    while an identical one runs on the same session awaits that execution and
+    gets a copy of its result. Calls on other sessions never join it, so no
+    caller gets a result or an error from a session it does not own. With
+    exclusive, executions also hold the manager's per-user lock so that
+    installs and deletes for one user never interleave, whatever the session.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(self, user_id: str, db, *args, **kwargs):
+            # The in-flight task references db, so its id cannot be reused while the key exists.
+            key = (operation, user_id, self.plugin_data['version'], id(db))
+            task = self._in_flight.get(key)
+            if task is None:
+                async def run():
+                    if not exclusive:
+                        return await func(self, user_id, db, *args, **kwargs)
+                    async with self._user_lock(user_id):
+                        return await func(self, user_id, db, *args, **kwargs)
                 
-                async def uninstall_for_user(self, user_id: str, db):
-                    if user_id not in self.active_users:
-                        return {'success': False, 'error': 'Plugin not installed for user'}
-                    result = await self._perform_user_uninstallation(user_id, db)
-                    if result['success']:
-                        self.active_users.discard(user_id)
-                        self.last_used = datetime.now()
-                    return result
+                task = asyncio.ensure_future(run())
+                self._in_flight[key] = task
                 
-                @abstractmethod
-                async def get_plugin_metadata(self): pass
-                @abstractmethod
-                async def get_module_metadata(self): pass
-                @abstractmethod
-                async def _perform_user_installation(self, user_id, db, shared_plugin_path): pass
-                @abstractmethod
-                async def _perform_user_uninstallation(self, user_id, db): pass
-            
-            logger.info("Using minimal BaseLifecycleManager implementation")
+                def forget(done, key=key):
+                    if self._in_flight.get(key) is done:
+                        del self._in_flight[key]
+                task.add_done_callback(forget)
+            else:
+                _lifecycle_metrics.inc('whydetector_single_flight_shared_total', 1, {'operation': operation})
+                logger.info(f"BrainDriveWhyDetector: Joining in-flight {operation} for user {user_id}")
             
-    except ImportError as e:
-        logger.error(f"Failed to import BaseLifecycleManager: {e}")
-        raise ImportError("BrainDriveWhyDetector plugin requires BaseLifecycleManager")
+            # Shielded so a cancelled caller does not cancel the shared execution.
+            result = await asyncio.shield(task)
+            return dict(result) if isinstance(result, dict) else result
+        return wrapper
+    return decorator
+
+
+class _ModuleTemplate(NamedTuple):
+    name: str
+    columns: Mapping[str, Any]
 
 
-class BrainDriveWhyDetectorLifecycleManager(BaseLifecycleManager):
+class _RecordTemplates(NamedTuple):
+    """Per-version install data that does not depend on the user.
+    
+    JSON columns are serialized and statements are built once; installs only
+    add ids, user_id and timestamps on top of these read-only mappings.
+    """
+    plugin_columns: Mapping[str, Any]
+    modules: Tuple[_ModuleTemplate, ...]
+    plugin_insert: Any
+    module_insert: Any
+    plugin_upsert: Any
+    module_upsert: Any
+    installed_users_query: Any
+    status_many_query: Any
+    module_delete_many: Any
+    plugin_delete_many: Any
+    purge_batch_query: Any
+    installed_versions_query: Any
+    plugin_upgrade: Any
+    module_upgrade: Any
+
+
+class _LifecycleManagerBody:
     """Lifecycle manager for BrainDriveWhyDetector plugin"""
     
+    # Users per transaction for bulk operations; also keeps IN (...) lists
+    # below the bind parameter limits of SQLite and other backends.
+    BULK_CHUNK_SIZE = 500
+    
+    STATUS_INDEX_NAME = 'ix_plugin_user_id_plugin_slug'
+    
+    # Metadata refreshed in place by update_plugin(); per-user state such as
+    # enabled, status, downloads, props and config_fields is left untouched.
+    UPGRADED_PLUGIN_COLUMNS = (
+        'name', 'description', 'version', 'type', 'icon', 'category', 'official',
+        'author', 'compatibility', 'scope', 'bundle_method', 'bundle_location',
+        'is_local', 'long_description', 'source_type', 'source_url',
+        'update_check_url', 'update_available', 'latest_version',
+        'installation_type', 'permissions'
+    )
+    UPGRADED_MODULE_COLUMNS = (
+        'display_name', 'description', 'icon', 'category', 'required_services',
+        'dependencies', 'layout', 'tags'
+    )
+    
+    # Install with INSERT ... ON CONFLICT DO NOTHING RETURNING on dialects
+    # that support it, replacing the check and verification SELECTs.
+    UPSERT_INSTALLS = True
+    
+    PLUGIN_INSERT_SQL = """
+            INSERT INTO plugin
+            (id, name, description, version, type, enabled, icon, category, status,
+            official, author, last_updated, compatibility, downloads, scope,
+            bundle_method, bundle_location, is_local, long_description,
+            config_fields, messages, dependencies, created_at, updated_at, user_id,
+            plugin_slug, source_type, source_url, update_check_url, last_update_check,
+            update_available, latest_version, installation_type, permissions)
+            VALUES
+            (:id, :name, :description, :version, :type, :enabled, :icon, :category,
+            :status, :official, :author, :last_updated, :compatibility, :downloads,
+            :scope, :bundle_method, :bundle_location, :is_local, :long_description,
+            :config_fields, :messages, :dependencies, :created_at, :updated_at, :user_id,
+            :plugin_slug, :source_type, :source_url, :update_check_url, :last_update_check,
+            :update_available, :latest_version, :installation_type, :permissions)
+            """
+    
+    MODULE_INSERT_SQL = """
+                INSERT INTO module
+                (id, plugin_id, name, display_name, description, icon, category,
+                enabled, priority, props, config_fields, messages, required_services,
+                dependencies, layout, tags, created_at, updated_at, user_id)
+                VALUES
+                (:id, :plugin_id, :name, :display_name, :description, :icon, :category,
+                :enabled, :priority, :props, :config_fields, :messages, :required_services,
+                :dependencies, :layout, :tags, :created_at, :updated_at, :user_id)
+                """
+    
+    # Written inside each shared version directory; describes the files copied there.
+    MANIFEST_FILENAME = '.plugin_manifest.json'
+    # Content-addressed blobs shared by all version directories, next to them
+    OBJECT_STORE_DIRNAME = '.objects'
+    # Version directories and blobs younger than this are never collected
+    GC_GRACE_SECONDS = 3600.0
+    
+    # Host-facing description of the dist assets and their precompressed variants.
+    ASSET_MANIFEST_FILENAME = 'asset-manifest.json'
+    # Bumped when the asset manifest's contents change meaning; older manifests are rewritten.
+    ASSET_MANIFEST_FORMAT = 2
+    COMPRESSIBLE_SUFFIXES = {'.js', '.css', '.html', '.json', '.map', '.svg', '.txt'}
+    # Entry points keep stable names across builds and must be revalidated.
+    REVALIDATED_ASSETS = {'dist/remoteEntry.js', 'dist/index.html'}
+    # Only names carrying a content hash (main.3f2a9c1b.js, 573-d41d8cd98f00b204.js)
+    # change with their content; everything else, including webpack's default
+    # [id].js chunk names, keeps its name across releases and must be revalidated.
+    CONTENT_HASHED_NAME = re.compile(r'[.-][0-9a-f]{8,}\.[^/]+$')
+    IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+    
+    COPY_EXCLUDE_PATTERNS = {
+        'node_modules', 'package-lock.json', '.git', '.gitignore',
+        '__pycache__', '*.pyc', '.DS_Store', 'Thumbs.db', 'benchmarks', 'tools', 'tests'
+    }
+    
+    # Process-wide cache of _RecordTemplates keyed by (plugin_slug, version)
+    _record_templates_cache: Dict[tuple, _RecordTemplates] = {}
+    
+    # Process-wide cache of source file hashes: path -> (mtime_ns, size, sha256)
+    _source_hash_cache: Dict[str, tuple] = {}
+    
+    # Process-wide health results keyed by shared path. Within the TTL a cached
+    # result is returned without touching the disk; after it, a stat of the
+    # checked files decides whether the result is still valid.
+    HEALTH_CACHE_TTL = 30.0
+    _health_cache: Dict[str, Dict[str, Any]] = {}
+    
     def __init__(self, plugins_base_dir: str = None):
         self.plugin_data = {
             "name": "BrainDriveWhyDetector",
@@ -153,6 +946,26 @@ class BrainDriveWhyDetectorLifecycleManager(BaseLifecycleManager):
             version=self.plugin_data['version'],
             shared_storage_path=shared_path
         )
+        
+        # Single-flight bookkeeping: in-flight tasks and per-user locks with their waiter counts
+        self._in_flight: Dict[tuple, asyncio.Future] = {}
+        self._user_locks: Dict[str, list] = {}
+        # Databases whose session record table is known to exist
+        self._session_store_ready: set = set()
+    
+    @contextlib.asynccontextmanager
+    async def _user_lock(self, user_id: str):
+        entry = self._user_locks.get(user_id)
+        if entry is None:
+            entry = self._user_locks[user_id] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self._user_locks.get(user_id) is entry:
+                del self._user_locks[user_id]
     
     @property
     def PLUGIN_DATA(self):
@@ -166,7 +979,10 @@ class BrainDriveWhyDetectorLifecycleManager(BaseLifecycleManager):
     
     async def _perform_user_installation(self, user_id: str, db: AsyncSession, shared_plugin_path: Path) -> Dict[str, Any]:
         try:
-            db_result = await self._create_database_records(user_id, db)
+            if self._supports_upsert(db):
+                db_result = await self._upsert_database_records(user_id, db)
+            else:
+                db_result = await self._create_database_records(user_id, db)
             if not db_result['success']:
                 return db_result
             
@@ -185,7 +1001,8 @@ class BrainDriveWhyDetectorLifecycleManager(BaseLifecycleManager):
     
     async def _perform_user_uninstallation(self, user_id: str, db: AsyncSession) -> Dict[str, Any]:
         try:
-            existing_check = await self._check_existing_plugin(user_id, db)
+            with _phase('existence_check'):
+                existing_check = await self._check_existing_plugin(user_id, db)
             if not existing_check['exists']:
                 return {'success': False, 'error': 'Plugin not found for user'}
             
@@ -205,66 +1022,329 @@ class BrainDriveWhyDetectorLifecycleManager(BaseLifecycleManager):
             logger.error(f"BrainDriveWhyDetector: User uninstallation failed for {user_id}: {e}")
             return {'success': False, 'error': str(e)}
     
+    def _should_copy(self, relative_path: Path) -> bool:
+        for part in relative_path.parts:
+            if part in self.COPY_EXCLUDE_PATTERNS:
+                return False
+        for pattern in self.COPY_EXCLUDE_PATTERNS:
+            if '*' in pattern and relative_path.name.endswith(pattern.replace('*', '')):
+                return False
+        return True
+    
+    def _build_source_manifest(self, source_dir: Path) -> Dict[str, Dict[str, Any]]:
+        """Hash every copyable file under source_dir.
+        
+        Excluded directories are pruned before descending, and hashes are
+        reused while a file's mtime and size are unchanged.
+        """
+        files = {}
+        for dirpath, dirnames, filenames in os.walk(source_dir):
+            current = Path(dirpath)
+            dirnames[:] = [d for d in dirnames if self._should_copy((current / d).relative_to(source_dir))]
+            for filename in filenames:
+                item = current / filename
+                relative_path = item.relative_to(source_dir)
+                if not self._should_copy(relative_path):
+                    continue
+                stat = item.stat()
+                cache_key = str(item)
+                cached = self._source_hash_cache.get(cache_key)
+                if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+                    sha256 = cached[2]
+                else:
+                    sha256 = _file_sha256(item)
+                    self._source_hash_cache[cache_key] = (stat.st_mtime_ns, stat.st_size, sha256)
+                files[relative_path.as_posix()] = {'sha256': sha256, 'size': stat.st_size}
+        return files
+    
+    def _load_manifest(self, target_dir: Path) -> Dict[str, Any]:
+        try:
+            with open(target_dir / self.MANIFEST_FILENAME, 'r') as f:
+                manifest = json.load(f)
+            if isinstance(manifest.get('files'), dict):
+                return manifest
+        except (OSError, json.JSONDecodeError):
+            pass
+        return {'files': {}}
+    
+    def _write_manifest(self, target_dir: Path, files: Dict[str, Dict[str, Any]]) -> None:
+        """Write the manifest of target_dir, recording each file's stat fingerprint as linked."""
+        manifest_path = target_dir / self.MANIFEST_FILENAME
+        tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'plugin_slug': self.plugin_data['plugin_slug'],
+                'version': self.plugin_data['version'],
+                'files': {
+                    relative_path: {**entry, 'stat': self._stat_fingerprint(target_dir / relative_path)}
+                    for relative_path, entry in files.items()
+                }
+            }, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+    
+    @staticmethod
+    def _stat_fingerprint(path: Path) -> Optional[List[int]]:
+        """Inode, mtime and size of path; writing to the file in place changes it."""
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        return [stat.st_ino, stat.st_mtime_ns, stat.st_size]
+    
+    @classmethod
+    def _target_unchanged(cls, target_path: Path, stored: Dict[str, Any]) -> bool:
+        """Whether target_path is still the file its manifest entry was written for.
+        
+        Entries without a fingerprint only allow a size check.
+        """
+        fingerprint = cls._stat_fingerprint(target_path)
+        if fingerprint is None:
+            return False
+        if stored.get('stat') is None:
+            return fingerprint[2] == stored['size']
+        return fingerprint == stored['stat']
+    
+    @staticmethod
+    def _same_content(stored: Optional[Dict[str, Any]], entry: Dict[str, Any]) -> bool:
+        return stored is not None and stored.get('sha256') == entry['sha256'] and stored.get('size') == entry['size']
+    
+    def _diff_against_manifest(self, source_files: Dict[str, Dict[str, Any]], target_dir: Path,
+                               damaged: Iterable[str] = ()) -> tuple:
+        """Return (changed, removed, damaged) relative paths for bringing target_dir up to source_files.
+        
+        A file is changed when its source content differs from the manifest,
+        or when its target is missing or was written to since it was linked,
+        as its inode, mtime and size tell. Targets written to in place, and
+        the paths passed in damaged, are hardlinks into the object store, so
+        they are also returned as damaged: their blob is stored again from source.
+        """
+        stored_files = self._load_manifest(target_dir)['files']
+        damaged = set(damaged) & source_files.keys()
+        changed = []
+        for relative_path, entry in source_files.items():
+            stored = stored_files.get(relative_path)
+            if relative_path in damaged or not self._same_content(stored, entry):
+                changed.append(relative_path)
+                continue
+            fingerprint = self._stat_fingerprint(target_dir / relative_path)
+            if fingerprint is None or stored.get('stat') is None:
+                # Missing, or listed by a manifest without fingerprints: link it again.
+                changed.append(relative_path)
+            elif fingerprint != stored['stat']:
+                changed.append(relative_path)
+                damaged.add(relative_path)
+        removed = [relative_path for relative_path in stored_files if relative_path not in source_files]
+        return changed, removed, damaged
+    
+    @staticmethod
+    def _blob_path(objects_dir: Path, sha256: str) -> Path:
+        return objects_dir / sha256[:2] / sha256[2:]
+    
+    @classmethod
+    def _link_one(cls, objects_dir: Path, source_path: Path, target_path: Path, entry: Dict[str, Any],
+                  restore: bool = False) -> int:
+        """Hardlink target_path to the blob for entry, storing the blob from source_path first if needed.
+        
+        With restore the blob is stored again even if present, for targets
+        whose shared inode was written to. Returns the bytes written to the
+        store, 0 when the blob already existed. Falls back to a copy where
+        hardlinks are not possible.
+        """
+        blob_path = cls._blob_path(objects_dir, entry['sha256'])
+        written = 0
+        if restore or not cls._target_matches(blob_path, entry):
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = blob_path.with_name(f"{blob_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            written = _fast_copy(source_path, tmp_path)
+            os.replace(tmp_path, blob_path)
+        
+        target_path.parent.mkdir(parents=True, exist_ok=True)
+        # Always unlink first: target_path may be a hardlink to a blob that other versions share.
+        with contextlib.suppress(FileNotFoundError):
+            target_path.unlink()
+        try:
+            os.link(blob_path, target_path)
+        except OSError:
+            _fast_copy(blob_path, target_path)
+        return written
+    
+    @staticmethod
+    def _remove_files(target_dir: Path, relative_paths: List[str]) -> None:
+        for relative_path in relative_paths:
+            for suffix in ('', '.gz', '.br'):
+                with contextlib.suppress(FileNotFoundError):
+                    (target_dir / f"{relative_path}{suffix}").unlink()
+    
+    def _dist_assets(self, source_files: Dict[str, Dict[str, Any]]) -> List[str]:
+        return sorted(
+            relative_path for relative_path in source_files
+            if relative_path.startswith('dist/')
+            and Path(relative_path).suffix in self.COMPRESSIBLE_SUFFIXES
+        )
+    
+    @staticmethod
+    def _precompress_asset(target_dir: Path, relative_path: str, force: bool) -> Dict[str, Any]:
+        """Write .gz and .br siblings of one asset, reusing existing ones unless force."""
+        asset_path = target_dir / relative_path
+        data = None
+        encodings = {}
+        for encoding, suffix in (('gzip', '.gz'), ('br', '.br')):
+            compressed_path = asset_path.with_name(asset_path.name + suffix)
+            if force or not compressed_path.exists():
+                if data is None:
+                    data = asset_path.read_bytes()
+                if encoding == 'gzip':
+                    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+                else:
+                    compressed = brotli_compress(data)
+                    if compressed is None:
+                        continue
+                tmp_path = compressed_path.with_name(compressed_path.name + '.tmp')
+                tmp_path.write_bytes(compressed)
+                os.replace(tmp_path, compressed_path)
+            encodings[encoding] = {
+                'path': f"{relative_path}{suffix}",
+                'size': compressed_path.stat().st_size
+            }
+        return encodings
+    
+    @classmethod
+    def _cache_control(cls, relative_path: str) -> str:
+        if relative_path in cls.REVALIDATED_ASSETS or not cls.CONTENT_HASHED_NAME.search(relative_path):
+            return 'no-cache'
+        return cls.IMMUTABLE_CACHE_CONTROL
+    
+    def _write_asset_manifest(self, target_dir: Path, source_files: Dict[str, Dict[str, Any]], encodings: Dict[str, Dict[str, Any]]) -> None:
+        assets = {}
+        for relative_path in self._dist_assets(source_files):
+            entry = source_files[relative_path]
+            content_type = mimetypes.guess_type(relative_path)[0] or 'application/octet-stream'
+            assets[relative_path] = {
+                'sha256': entry['sha256'],
+                'size': entry['size'],
+                'etag': f'"{entry["sha256"][:32]}"',
+                'content_type': content_type,
+                'cache_control': self._cache_control(relative_path),
+                'encodings': encodings.get(relative_path, {})
+            }
+        manifest_path = target_dir / self.ASSET_MANIFEST_FILENAME
+        tmp_path = manifest_path.with_name(manifest_path.name + '.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'format': self.ASSET_MANIFEST_FORMAT,
+                'plugin_slug': self.plugin_data['plugin_slug'],
+                'version': self.plugin_data['version'],
+                'assets': assets
+            }, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, manifest_path)
+    
+    def _asset_manifest_state(self, target_dir: Path) -> str:
+        """'current', 'outdated' (written in an older format) or 'missing'."""
+        try:
+            with open(target_dir / self.ASSET_MANIFEST_FILENAME, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return 'missing'
+        return 'current' if manifest.get('format') == self.ASSET_MANIFEST_FORMAT else 'outdated'
+    
+    async def _precompress_assets(self, target_dir: Path, source_files: Dict[str, Dict[str, Any]], changed: List[str], force_all: bool = False) -> None:
+        """Precompress dist assets in parallel and refresh the asset manifest.
+        
+        Variants of unchanged assets are reused unless force_all is set.
+        """
+        changed_set = set(changed)
+        assets = self._dist_assets(source_files)
+        results = await asyncio.gather(*(
+            _run_io(self._precompress_asset, target_dir, relative_path, force_all or relative_path in changed_set)
+            for relative_path in assets
+        ))
+        await _run_io(self._write_asset_manifest, target_dir, source_files, dict(zip(assets, results)))
+    
     async def _copy_plugin_files_impl(self, user_id: str, target_dir: Path, update: bool = False) -> Dict[str, Any]:
+        """Bring target_dir in line with the plugin source.
+        
+        The shared directory is identical for every user, so only files whose
+        hash or size differs from the stored manifest are written; when nothing
+        changed the copy is skipped. Files are hardlinks into the
+        content-addressed store next to the version directories, so content
+        that an earlier version already stored is linked rather than copied.
+        An exclusive lock next to target_dir makes concurrent installs of the
+        same version wait for a single copier. All disk work runs on the I/O
+        pool and changed files are linked in parallel. Targets are always
+        unlinked before being written, so update is accepted for compatibility only.
+        """
+        with _phase('file_copy'):
+            return await self._copy_plugin_files_locked(target_dir, update)
+    
+    async def _copy_plugin_files_locked(self, target_dir: Path, update: bool) -> Dict[str, Any]:
         try:
             source_dir = Path(__file__).parent
-            copied_files = []
+            lock_path = target_dir.parent / f"{target_dir.name}.lock"
             
-            exclude_patterns = {
-                'node_modules', 'package-lock.json', '.git', '.gitignore',
-                '__pycache__', '*.pyc', '.DS_Store', 'Thumbs.db'
-            }
-            
-            def should_copy(path: Path) -> bool:
-                for part in path.parts:
-                    if part in exclude_patterns:
-                        return False
-                for pattern in exclude_patterns:
-                    if '*' in pattern and path.name.endswith(pattern.replace('*', '')):
-                        return False
-                return True
-            
-            for item in source_dir.rglob('*'):
-                if item.name == 'lifecycle_manager.py' and item == Path(__file__):
-                    continue
-                    
-                relative_path = item.relative_to(source_dir)
+            async with _exclusive_file_lock(lock_path):
+                source_files = await _run_io(self._build_source_manifest, source_dir)
+                changed, removed, damaged = await _run_io(
+                    self._diff_against_manifest, source_files, target_dir, self._integrity_failures(target_dir)
+                )
+                asset_manifest_state = await _run_io(self._asset_manifest_state, target_dir)
                 
-                if not should_copy(relative_path):
-                    continue
+                if not changed and not removed and asset_manifest_state == 'current':
+                    logger.info(f"BrainDriveWhyDetector: Shared files up to date in {target_dir}, skipping copy")
+                    return {'success': True, 'copied_files': [], 'skipped': True}
                 
-                target_path = target_dir / relative_path
+                if damaged:
+                    logger.warning(f"BrainDriveWhyDetector: Restoring {len(damaged)} modified shared files in {target_dir}")
+                self._invalidate_integrity(target_dir)
+                objects_dir = target_dir.parent / self.OBJECT_STORE_DIRNAME
+                async with _exclusive_file_lock(target_dir.parent / f"{self.OBJECT_STORE_DIRNAME}.lock"):
+                    outcomes = await asyncio.gather(*(
+                        _run_io(
+                            self._link_one, objects_dir, source_dir / relative_path,
+                            target_dir / relative_path, source_files[relative_path], relative_path in damaged
+                        )
+                        for relative_path in changed
+                    ), return_exceptions=True)
                 
-                try:
-                    if item.is_file():
-                        target_path.parent.mkdir(parents=True, exist_ok=True)
-                        if update and target_path.exists():
-                            target_path.unlink()
-                        shutil.copy2(item, target_path)
-                        copied_files.append(str(relative_path))
-                    elif item.is_dir():
-                        target_path.mkdir(parents=True, exist_ok=True)
-                except Exception as e:
-                    logger.warning(f"Failed to copy {relative_path}: {e}")
-                    continue
-            
-            lifecycle_manager_source = source_dir / 'lifecycle_manager.py'
-            lifecycle_manager_target = target_dir / 'lifecycle_manager.py'
-            if lifecycle_manager_source.exists():
-                lifecycle_manager_target.parent.mkdir(parents=True, exist_ok=True)
-                if update and lifecycle_manager_target.exists():
-                    lifecycle_manager_target.unlink()
-                shutil.copy2(lifecycle_manager_source, lifecycle_manager_target)
-                copied_files.append('lifecycle_manager.py')
+                copied_files = []
+                copied_bytes = 0
+                for relative_path, outcome in zip(changed, outcomes):
+                    if isinstance(outcome, BaseException):
+                        logger.warning(f"Failed to copy {relative_path}: {outcome}")
+                        source_files.pop(relative_path)
+                    else:
+                        copied_files.append(relative_path)
+                        copied_bytes += outcome
+                _lifecycle_metrics.inc('whydetector_copy_files_total', len(copied_files))
+                _lifecycle_metrics.inc('whydetector_copy_bytes_total', copied_bytes)
+                
+                if removed:
+                    await _run_io(self._remove_files, target_dir, removed)
+                with _phase('precompress'):
+                    await self._precompress_assets(
+                        target_dir, source_files, copied_files, force_all=asset_manifest_state == 'missing'
+                    )
+                await _run_io(self._write_manifest, target_dir, source_files)
+                self.invalidate_health_cache(target_dir)
+                self._invalidate_integrity(target_dir)
             
-            logger.info(f"BrainDriveWhyDetector: Copied {len(copied_files)} files to {target_dir}")
-            return {'success': True, 'copied_files': copied_files}
+            logger.info(f"BrainDriveWhyDetector: Linked {len(copied_files)} files to {target_dir} ({copied_bytes} new bytes stored)")
+            return {'success': True, 'copied_files': copied_files, 'copied_bytes': copied_bytes, 'skipped': False}
             
         except Exception as e:
             logger.error(f"BrainDriveWhyDetector: Error copying plugin files: {e}")
             return {'success': False, 'error': str(e)}
     
+    @staticmethod
+    def _target_matches(target_path: Path, entry: Dict[str, Any]) -> bool:
+        try:
+            return target_path.stat().st_size == entry['size']
+        except OSError:
+            return False
+    
     async def _validate_installation_impl(self, user_id: str, plugin_dir: Path) -> Dict[str, Any]:
+        return await _run_io(self._validate_installation_sync, user_id, plugin_dir)
+    
+    def _validate_installation_sync(self, user_id: str, plugin_dir: Path) -> Dict[str, Any]:
         try:
             required_files = ["package.json", "dist/remoteEntry.js"]
             missing_files = []
@@ -305,6 +1385,10 @@ class BrainDriveWhyDetectorLifecycleManager(BaseLifecycleManager):
                     'error': 'BrainDriveWhyDetector: Bundle file (remoteEntry.js) is empty'
                 }
             
+            asset_error = self._validate_asset_manifest(plugin_dir)
+            if asset_error:
+                return {'valid': False, 'error': f'BrainDriveWhyDetector: {asset_error}'}
+            
             logger.info(f"BrainDriveWhyDetector: Installation validation passed for user {user_id}")
             return {'valid': True}
             
@@ -312,12 +1396,146 @@ class BrainDriveWhyDetectorLifecycleManager(BaseLifecycleManager):
             logger.error(f"BrainDriveWhyDetector: Error validating installation: {e}")
             return {'valid': False, 'error': str(e)}
     
-    async def _get_plugin_health_impl(self, user_id: str, plugin_dir: Path) -> Dict[str, Any]:
+    def _validate_asset_manifest(self, plugin_dir: Path) -> Optional[str]:
+        """Return an error message if the asset manifest is missing or does not match the files."""
         try:
-            health_info = {
-                'bundle_exists': False,
-                'bundle_size': 0,
-                'package_json_valid': False
+            with open(plugin_dir / self.ASSET_MANIFEST_FILENAME, 'r') as f:
+                assets = json.load(f)['assets']
+        except (OSError, json.JSONDecodeError, KeyError) as e:
+            return f'Invalid or missing {self.ASSET_MANIFEST_FILENAME}: {e}'
+        
+        if "dist/remoteEntry.js" not in assets:
+            return f'{self.ASSET_MANIFEST_FILENAME} does not list dist/remoteEntry.js'
+        
+        for relative_path, asset in assets.items():
+            expected = [(relative_path, asset['size'])]
+            expected += [(variant['path'], variant['size']) for variant in asset.get('encodings', {}).values()]
+            for path, size in expected:
+                try:
+                    actual = (plugin_dir / path).stat().st_size
+                except OSError:
+                    return f'Asset listed in {self.ASSET_MANIFEST_FILENAME} is missing: {path}'
+                if actual != size:
+                    return f'Asset size mismatch for {path}: expected {size}, found {actual}'
+        return None
+    
+    async def _get_plugin_health_impl(self, user_id: str, plugin_dir: Path) -> Dict[str, Any]:
+        with _phase('health_check'):
+            return await self._get_cached_health(plugin_dir)
+    
+    async def _get_cached_health(self, plugin_dir: Path) -> Dict[str, Any]:
+        cache_key = str(plugin_dir)
+        entry = self._health_cache.get(cache_key)
+        now = time.monotonic()
+        if entry and now - entry['checked_at'] < self.HEALTH_CACHE_TTL:
+            _lifecycle_metrics.inc('whydetector_health_checks_total', 1, {'cache': 'hit'})
+            return self._copy_health(entry['result'])
+        
+        signature = await _run_io(self._health_signature, plugin_dir)
+        if entry and entry['signature'] == signature:
+            entry['checked_at'] = now
+            _lifecycle_metrics.inc('whydetector_health_checks_total', 1, {'cache': 'revalidated'})
+            return self._copy_health(entry['result'])
+        
+        _lifecycle_metrics.inc('whydetector_health_checks_total', 1, {'cache': 'miss'})
+        result = await _run_io(self._get_plugin_health_sync, plugin_dir)
+        if 'error' not in result['details']:
+            self._health_cache[cache_key] = {
+                'checked_at': time.monotonic(),
+                'signature': signature,
+                'result': result
+            }
+        return self._copy_health(result)
+    
+    @classmethod
+    def invalidate_health_cache(cls, plugin_dir: Optional[Path] = None) -> None:
+        """Drop cached health for plugin_dir, or for every shared path when omitted."""
+        if plugin_dir is None:
+            cls._health_cache.clear()
+        else:
+            cls._health_cache.pop(str(plugin_dir), None)
+    
+    def _integrity_verifier(self) -> Optional[IntegrityVerifier]:
+        return _integrity_verifiers.get(str(self.shared_path.parent))
+    
+    def _invalidate_integrity(self, version_dir: Path) -> None:
+        verifier = self._integrity_verifier()
+        if verifier is not None:
+            verifier.invalidate(version_dir)
+    
+    def _integrity_failures(self, version_dir: Path) -> List[str]:
+        """Files the background verifier last found corrupt or missing in version_dir."""
+        verifier = self._integrity_verifier()
+        if verifier is None:
+            return []
+        integrity = verifier.result(version_dir)
+        if integrity['status'] != 'corrupt':
+            return []
+        return integrity['mismatched'] + integrity['missing']
+    
+    def _with_integrity(self, plugin_health: Dict[str, Any]) -> Dict[str, Any]:
+        """Attach the background verifier's latest result to a health result.
+        
+        A corrupt shared directory makes the plugin unhealthy; without a
+        running verifier the health result is returned unchanged.
+        """
+        verifier = self._integrity_verifier()
+        if verifier is None:
+            return plugin_health
+        integrity = verifier.result(self.shared_path)
+        plugin_health['details']['integrity'] = integrity
+        if integrity['status'] == 'corrupt':
+            plugin_health['healthy'] = False
+        return plugin_health
+    
+    @staticmethod
+    def _copy_health(result: Dict[str, Any]) -> Dict[str, Any]:
+        # Deep, since details holds the nested chunks and bundle_total dicts of the cached entry.
+        return {'healthy': result['healthy'], 'details': copy.deepcopy(result['details'])}
+    
+    @classmethod
+    def _health_signature(cls, plugin_dir: Path) -> tuple:
+        signature = []
+        for relative_path in ("dist/remoteEntry.js", "package.json", cls.ASSET_MANIFEST_FILENAME):
+            try:
+                stat = (plugin_dir / relative_path).stat()
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+    
+    def _bundle_chunks(self, plugin_dir: Path) -> Dict[str, Dict[str, int]]:
+        """Raw and precompressed sizes of every dist/*.js chunk, keyed by file name.
+        
+        Sizes come from the asset manifest written at copy time; without one
+        only raw sizes are reported.
+        """
+        try:
+            with open(plugin_dir / self.ASSET_MANIFEST_FILENAME, 'r') as f:
+                assets = json.load(f)['assets']
+        except (OSError, json.JSONDecodeError, KeyError):
+            assets = None
+        
+        chunks = {}
+        if assets is not None:
+            for relative_path, asset in sorted(assets.items()):
+                if not relative_path.endswith('.js'):
+                    continue
+                sizes = {'raw': asset['size']}
+                for encoding, variant in sorted(asset.get('encodings', {}).items()):
+                    sizes[encoding] = variant['size']
+                chunks[relative_path[len('dist/'):]] = sizes
+        else:
+            for path in sorted((plugin_dir / 'dist').glob('*.js')):
+                chunks[path.name] = {'raw': path.stat().st_size}
+        return chunks
+    
+    def _get_plugin_health_sync(self, plugin_dir: Path) -> Dict[str, Any]:
+        try:
+            health_info = {
+                'bundle_exists': False,
+                'bundle_size': 0,
+                'package_json_valid': False
             }
             
             bundle_path = plugin_dir / "dist" / "remoteEntry.js"
@@ -325,6 +1543,13 @@ class BrainDriveWhyDetectorLifecycleManager(BaseLifecycleManager):
                 health_info['bundle_exists'] = True
                 health_info['bundle_size'] = bundle_path.stat().st_size
             
+            chunks = self._bundle_chunks(plugin_dir)
+            health_info['chunks'] = chunks
+            health_info['bundle_total'] = {
+                encoding: sum(sizes[encoding] for sizes in chunks.values() if encoding in sizes)
+                for encoding in sorted({encoding for sizes in chunks.values() for encoding in sizes})
+            }
+            
             package_json_path = plugin_dir / "package.json"
             if package_json_path.exists():
                 try:
@@ -352,6 +1577,17 @@ class BrainDriveWhyDetectorLifecycleManager(BaseLifecycleManager):
                 'details': {'error': str(e)}
             }
     
+    @staticmethod
+    def _plugin_info_from_row(plugin_row) -> Dict[str, Any]:
+        return {
+            'id': plugin_row.id,
+            'name': plugin_row.name,
+            'version': plugin_row.version,
+            'enabled': plugin_row.enabled,
+            'created_at': plugin_row.created_at,
+            'updated_at': plugin_row.updated_at
+        }
+    
     async def _check_existing_plugin(self, user_id: str, db: AsyncSession) -> Dict[str, Any]:
         try:
             plugin_slug = self.plugin_data['plugin_slug']
@@ -367,105 +1603,70 @@ class BrainDriveWhyDetectorLifecycleManager(BaseLifecycleManager):
                 'plugin_slug': plugin_slug
             })
             
+            # The database, not this long-lived manager, decides whether the user
+            # has the plugin; active_users follows it so the base class's
+            # install_for_user/uninstall_for_user do not short-circuit on stale state.
             plugin_row = result.fetchone()
             if plugin_row:
+                self.active_users.add(user_id)
                 return {
                     'exists': True,
                     'plugin_id': plugin_row.id,
-                    'plugin_info': {
-                        'id': plugin_row.id,
-                        'name': plugin_row.name,
-                        'version': plugin_row.version,
-                        'enabled': plugin_row.enabled,
-                        'created_at': plugin_row.created_at,
-                        'updated_at': plugin_row.updated_at
-                    }
+                    'plugin_info': self._plugin_info_from_row(plugin_row)
                 }
             else:
+                self.active_users.discard(user_id)
                 return {'exists': False}
                 
         except Exception as e:
             logger.error(f"BrainDriveWhyDetector: Error checking existing plugin: {e}")
             return {'exists': False, 'error': str(e)}
     
-    async def _create_database_records(self, user_id: str, db: AsyncSession) -> Dict[str, Any]:
-        try:
-            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            plugin_slug = self.plugin_data['plugin_slug']
-            plugin_id = f"{user_id}_{plugin_slug}"
-            
-            plugin_stmt = text("""
-            INSERT INTO plugin
-            (id, name, description, version, type, enabled, icon, category, status,
-            official, author, last_updated, compatibility, downloads, scope,
-            bundle_method, bundle_location, is_local, long_description,
-            config_fields, messages, dependencies, created_at, updated_at, user_id,
-            plugin_slug, source_type, source_url, update_check_url, last_update_check,
-            update_available, latest_version, installation_type, permissions)
-            VALUES
-            (:id, :name, :description, :version, :type, :enabled, :icon, :category,
-            :status, :official, :author, :last_updated, :compatibility, :downloads,
-            :scope, :bundle_method, :bundle_location, :is_local, :long_description,
-            :config_fields, :messages, :dependencies, :created_at, :updated_at, :user_id,
-            :plugin_slug, :source_type, :source_url, :update_check_url, :last_update_check,
-            :update_available, :latest_version, :installation_type, :permissions)
-            """)
-            
-            await db.execute(plugin_stmt, {
-                'id': plugin_id,
-                'name': self.plugin_data['name'],
-                'description': self.plugin_data['description'],
-                'version': self.plugin_data['version'],
-                'type': self.plugin_data['type'],
-                'enabled': True,
-                'icon': self.plugin_data['icon'],
-                'category': self.plugin_data['category'],
-                'status': 'activated',
-                'official': self.plugin_data['official'],
-                'author': self.plugin_data['author'],
-                'last_updated': current_time,
-                'compatibility': self.plugin_data['compatibility'],
-                'downloads': 0,
-                'scope': self.plugin_data['scope'],
-                'bundle_method': self.plugin_data['bundle_method'],
-                'bundle_location': self.plugin_data['bundle_location'],
-                'is_local': self.plugin_data['is_local'],
-                'long_description': self.plugin_data['long_description'],
-                'config_fields': json.dumps({}),
-                'messages': None,
-                'dependencies': None,
-                'created_at': current_time,
-                'updated_at': current_time,
-                'user_id': user_id,
-                'plugin_slug': plugin_slug,
-                'source_type': self.plugin_data['source_type'],
-                'source_url': self.plugin_data['source_url'],
-                'update_check_url': self.plugin_data['update_check_url'],
-                'last_update_check': self.plugin_data['last_update_check'],
-                'update_available': self.plugin_data['update_available'],
-                'latest_version': self.plugin_data['latest_version'],
-                'installation_type': self.plugin_data['installation_type'],
-                'permissions': json.dumps(self.plugin_data['permissions'])
-            })
-            
-            modules_created = []
-            for module_data in self.module_data:
-                module_id = f"{user_id}_{plugin_slug}_{module_data['name']}"
-                
-                module_stmt = text("""
-                INSERT INTO module
-                (id, plugin_id, name, display_name, description, icon, category,
-                enabled, priority, props, config_fields, messages, required_services,
-                dependencies, layout, tags, created_at, updated_at, user_id)
-                VALUES
-                (:id, :plugin_id, :name, :display_name, :description, :icon, :category,
-                :enabled, :priority, :props, :config_fields, :messages, :required_services,
-                :dependencies, :layout, :tags, :created_at, :updated_at, :user_id)
-                """)
-                
-                await db.execute(module_stmt, {
-                    'id': module_id,
-                    'plugin_id': plugin_id,
+    def _record_templates(self) -> _RecordTemplates:
+        cache_key = (self.plugin_data['plugin_slug'], self.plugin_data['version'])
+        templates = self._record_templates_cache.get(cache_key)
+        if templates is None:
+            templates = self._build_record_templates()
+            self._record_templates_cache[cache_key] = templates
+        return templates
+    
+    def _build_record_templates(self) -> _RecordTemplates:
+        plugin_columns = MappingProxyType({
+            'name': self.plugin_data['name'],
+            'description': self.plugin_data['description'],
+            'version': self.plugin_data['version'],
+            'type': self.plugin_data['type'],
+            'enabled': True,
+            'icon': self.plugin_data['icon'],
+            'category': self.plugin_data['category'],
+            'status': 'activated',
+            'official': self.plugin_data['official'],
+            'author': self.plugin_data['author'],
+            'compatibility': self.plugin_data['compatibility'],
+            'downloads': 0,
+            'scope': self.plugin_data['scope'],
+            'bundle_method': self.plugin_data['bundle_method'],
+            'bundle_location': self.plugin_data['bundle_location'],
+            'is_local': self.plugin_data['is_local'],
+            'long_description': self.plugin_data['long_description'],
+            'config_fields': json.dumps({}),
+            'messages': None,
+            'dependencies': None,
+            'plugin_slug': self.plugin_data['plugin_slug'],
+            'source_type': self.plugin_data['source_type'],
+            'source_url': self.plugin_data['source_url'],
+            'update_check_url': self.plugin_data['update_check_url'],
+            'last_update_check': self.plugin_data['last_update_check'],
+            'update_available': self.plugin_data['update_available'],
+            'latest_version': self.plugin_data['latest_version'],
+            'installation_type': self.plugin_data['installation_type'],
+            'permissions': json.dumps(self.plugin_data['permissions'])
+        })
+        
+        modules = tuple(
+            _ModuleTemplate(
+                name=module_data['name'],
+                columns=MappingProxyType({
                     'name': module_data['name'],
                     'display_name': module_data['display_name'],
                     'description': module_data['description'],
@@ -479,19 +1680,114 @@ class BrainDriveWhyDetectorLifecycleManager(BaseLifecycleManager):
                     'required_services': json.dumps(module_data['required_services']),
                     'dependencies': json.dumps(module_data['dependencies']),
                     'layout': json.dumps(module_data['layout']),
-                    'tags': json.dumps(module_data['tags']),
-                    'created_at': current_time,
-                    'updated_at': current_time,
-                    'user_id': user_id
+                    'tags': json.dumps(module_data['tags'])
                 })
-                
-                modules_created.append(module_id)
+            )
+            for module_data in self.module_data
+        )
+        
+        return _RecordTemplates(
+            plugin_columns=plugin_columns,
+            modules=modules,
+            plugin_insert=text(self.PLUGIN_INSERT_SQL),
+            module_insert=text(self.MODULE_INSERT_SQL),
+            plugin_upsert=text(self.PLUGIN_INSERT_SQL.rstrip() + """
+            ON CONFLICT DO NOTHING
+            RETURNING id
+            """),
+            module_upsert=text(self.MODULE_INSERT_SQL.rstrip() + """
+                ON CONFLICT DO NOTHING
+                RETURNING id
+                """),
+            installed_users_query=text("""
+            SELECT id, user_id
+            FROM plugin
+            WHERE plugin_slug = :plugin_slug AND user_id IN :user_ids
+            """).bindparams(bindparam('user_ids', expanding=True)),
+            status_many_query=text("""
+            SELECT id, name, version, enabled, created_at, updated_at, user_id
+            FROM plugin
+            WHERE plugin_slug = :plugin_slug AND user_id IN :user_ids
+            """).bindparams(bindparam('user_ids', expanding=True)),
+            module_delete_many=text("""
+            DELETE FROM module
+            WHERE plugin_id IN :plugin_ids AND user_id IN :user_ids
+            """).bindparams(bindparam('plugin_ids', expanding=True), bindparam('user_ids', expanding=True)),
+            plugin_delete_many=text("""
+            DELETE FROM plugin
+            WHERE id IN :plugin_ids AND user_id IN :user_ids
+            """).bindparams(bindparam('plugin_ids', expanding=True), bindparam('user_ids', expanding=True)),
+            purge_batch_query=text("""
+            SELECT id, user_id
+            FROM plugin
+            WHERE plugin_slug = :plugin_slug
+            LIMIT :batch_size
+            """),
+            installed_versions_query=text("""
+            SELECT version, COUNT(*) AS installs
+            FROM plugin
+            WHERE plugin_slug = :plugin_slug
+            GROUP BY version
+            """),
+            plugin_upgrade=text(f"""
+            UPDATE plugin
+            SET {', '.join(f"{column} = :{column}" for column in self.UPGRADED_PLUGIN_COLUMNS)},
+            last_updated = :updated_at, updated_at = :updated_at
+            WHERE plugin_slug = :plugin_slug AND version IN :older_versions
+            """).bindparams(bindparam('older_versions', expanding=True)),
+            module_upgrade=text(f"""
+            UPDATE module
+            SET {', '.join(f"{column} = :{column}" for column in self.UPGRADED_MODULE_COLUMNS)},
+            updated_at = :updated_at
+            WHERE name = :name AND plugin_id IN (
+                SELECT id FROM plugin WHERE plugin_slug = :plugin_slug AND version IN :older_versions
+            )
+            """).bindparams(bindparam('older_versions', expanding=True))
+        )
+    
+    def _plugin_record(self, user_id: str, current_time: str) -> Dict[str, Any]:
+        record = dict(self._record_templates().plugin_columns)
+        record['id'] = f"{user_id}_{self.plugin_data['plugin_slug']}"
+        record['user_id'] = user_id
+        record['last_updated'] = current_time
+        record['created_at'] = current_time
+        record['updated_at'] = current_time
+        return record
+    
+    def _module_records(self, user_id: str, plugin_id: str, current_time: str) -> List[Dict[str, Any]]:
+        plugin_slug = self.plugin_data['plugin_slug']
+        records = []
+        for module in self._record_templates().modules:
+            record = dict(module.columns)
+            record['id'] = f"{user_id}_{plugin_slug}_{module.name}"
+            record['plugin_id'] = plugin_id
+            record['user_id'] = user_id
+            record['created_at'] = current_time
+            record['updated_at'] = current_time
+            records.append(record)
+        return records
+    
+    async def _create_database_records(self, user_id: str, db: AsyncSession) -> Dict[str, Any]:
+        try:
+            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            plugin_record = self._plugin_record(user_id, current_time)
+            plugin_id = plugin_record['id']
             
-            await db.commit()
+            templates = self._record_templates()
+            modules_created = []
+            with _phase('insert'):
+                await db.execute(templates.plugin_insert, plugin_record)
+                for module_record in self._module_records(user_id, plugin_id, current_time):
+                    await db.execute(templates.module_insert, module_record)
+                    modules_created.append(module_record['id'])
+            
+            with _phase('commit'):
+                await db.commit()
             
-            verify_query = text("SELECT id, plugin_slug FROM plugin WHERE id = :plugin_id AND user_id = :user_id")
-            verify_result = await db.execute(verify_query, {'plugin_id': plugin_id, 'user_id': user_id})
-            verify_row = verify_result.fetchone()
+            with _phase('verification'):
+                verify_query = text("SELECT id, plugin_slug FROM plugin WHERE id = :plugin_id AND user_id = :user_id")
+                verify_result = await db.execute(verify_query, {'plugin_id': plugin_id, 'user_id': user_id})
+                verify_row = verify_result.fetchone()
             
             if verify_row:
                 logger.info(f"BrainDriveWhyDetector: Successfully created database records for plugin {plugin_id}")
@@ -505,6 +1801,169 @@ class BrainDriveWhyDetectorLifecycleManager(BaseLifecycleManager):
             await db.rollback()
             return {'success': False, 'error': str(e)}
     
+    def _supports_upsert(self, db: AsyncSession) -> bool:
+        if not self.UPSERT_INSTALLS:
+            return False
+        try:
+            dialect = db.get_bind().dialect
+        except Exception:
+            return False
+        if dialect.name == 'postgresql':
+            return True
+        if dialect.name == 'sqlite':
+            # ON CONFLICT arrived in 3.24, RETURNING in 3.35
+            return tuple(getattr(dialect, 'server_version_info', None) or ()) >= (3, 35)
+        return False
+    
+    async def _upsert_database_records(self, user_id: str, db: AsyncSession) -> Dict[str, Any]:
+        """Create the user's rows in one idempotent statement per table.
+        
+        A plugin row with the same id, e.g. from a concurrent install that
+        passed the same existence check, makes the insert a no-op, which is
+        reported as already installed; no verification query is needed.
+        """
+        try:
+            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            templates = self._record_templates()
+            plugin_record = self._plugin_record(user_id, current_time)
+            plugin_id = plugin_record['id']
+            
+            with _phase('insert'):
+                plugin_result = await db.execute(templates.plugin_upsert, plugin_record)
+                inserted = plugin_result.fetchone() is not None
+                modules_created = []
+                if inserted:
+                    for module_record in self._module_records(user_id, plugin_id, current_time):
+                        module_result = await db.execute(templates.module_upsert, module_record)
+                        module_row = module_result.fetchone()
+                        if module_row is not None:
+                            modules_created.append(module_row.id)
+            
+            if not inserted:
+                await db.rollback()
+                self.active_users.add(user_id)
+                return {'success': False, 'error': 'Plugin already installed for user', 'plugin_id': plugin_id}
+            
+            with _phase('commit'):
+                await db.commit()
+            logger.info(f"BrainDriveWhyDetector: Successfully created database records for plugin {plugin_id}")
+            return {'success': True, 'plugin_id': plugin_id, 'modules_created': modules_created}
+            
+        except Exception as e:
+            logger.error(f"Error creating database records: {e}")
+            await db.rollback()
+            return {'success': False, 'error': str(e)}
+    
+    async def _find_installed_users(self, user_ids: List[str], db: AsyncSession) -> Dict[str, str]:
+        """Return a user_id -> plugin_id map for users that already have the plugin."""
+        installed = {}
+        query = self._record_templates().installed_users_query
+        with _phase('existence_check'):
+            for start in range(0, len(user_ids), self.BULK_CHUNK_SIZE):
+                chunk = user_ids[start:start + self.BULK_CHUNK_SIZE]
+                result = await db.execute(query, {
+                    'plugin_slug': self.plugin_data['plugin_slug'],
+                    'user_ids': chunk
+                })
+                for row in result.fetchall():
+                    installed[row.user_id] = row.id
+        return installed
+    
+    async def _insert_records_per_user(self, plugin_records: List[Dict[str, Any]], module_records: List[Dict[str, Any]], db: AsyncSession) -> set:
+        """Insert a chunk user by user, skipping conflicting users; return the plugin ids inserted.
+        
+        Fallback for a chunk whose executemany hit a conflict. With upsert
+        support the chunk stays one transaction of ON CONFLICT DO NOTHING
+        RETURNING statements; otherwise each user gets its own transaction.
+        """
+        templates = self._record_templates()
+        modules_by_plugin: Dict[str, List[Dict[str, Any]]] = {}
+        for module_record in module_records:
+            modules_by_plugin.setdefault(module_record['plugin_id'], []).append(module_record)
+        
+        inserted = set()
+        if self._supports_upsert(db):
+            for plugin_record in plugin_records:
+                plugin_result = await db.execute(templates.plugin_upsert, plugin_record)
+                if plugin_result.fetchone() is None:
+                    continue
+                for module_record in modules_by_plugin.get(plugin_record['id'], []):
+                    await db.execute(templates.module_upsert, module_record)
+                inserted.add(plugin_record['id'])
+            return inserted
+        
+        for plugin_record in plugin_records:
+            try:
+                await db.execute(templates.plugin_insert, plugin_record)
+                for module_record in modules_by_plugin.get(plugin_record['id'], []):
+                    await db.execute(templates.module_insert, module_record)
+                await db.commit()
+            except Exception as e:
+                await db.rollback()
+                if not _is_integrity_error(e):
+                    raise
+                continue
+            inserted.add(plugin_record['id'])
+        return inserted
+    
+    async def _create_database_records_bulk(self, user_ids: List[str], db: AsyncSession) -> Dict[str, Any]:
+        """Insert plugin and module rows for a chunk of users in a single transaction.
+        
+        Users whose plugin row appeared since the existence check, e.g. through
+        a concurrent single install, make the executemany fail; the chunk is
+        then retried user by user and those users are reported in 'conflicts'
+        instead of failing the chunk.
+        """
+        try:
+            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            plugin_records = []
+            module_records = []
+            for user_id in user_ids:
+                plugin_record = self._plugin_record(user_id, current_time)
+                plugin_records.append(plugin_record)
+                module_records.extend(self._module_records(user_id, plugin_record['id'], current_time))
+            
+            templates = self._record_templates()
+            with _phase('insert'):
+                try:
+                    await db.execute(templates.plugin_insert, plugin_records)
+                    if module_records:
+                        await db.execute(templates.module_insert, module_records)
+                    inserted = {record['id'] for record in plugin_records}
+                except Exception as e:
+                    if not _is_integrity_error(e):
+                        raise
+                    await db.rollback()
+                    logger.warning(f"BrainDriveWhyDetector: Conflict in bulk insert of {len(user_ids)} users, retrying per user")
+                    inserted = await self._insert_records_per_user(plugin_records, module_records, db)
+                    module_records = [record for record in module_records if record['plugin_id'] in inserted]
+            with _phase('commit'):
+                await db.commit()
+            
+            modules_by_plugin: Dict[str, List[str]] = {}
+            for module_record in module_records:
+                modules_by_plugin.setdefault(module_record['plugin_id'], []).append(module_record['id'])
+            
+            return {
+                'success': True,
+                'records': {
+                    record['user_id']: {
+                        'plugin_id': record['id'],
+                        'modules_created': modules_by_plugin.get(record['id'], [])
+                    }
+                    for record in plugin_records if record['id'] in inserted
+                },
+                'conflicts': {
+                    record['user_id']: record['id']
+                    for record in plugin_records if record['id'] not in inserted
+                }
+            }
+            
+        except Exception as e:
+            logger.error(f"Error creating bulk database records: {e}")
+            await db.rollback()
+            return {'success': False, 'error': str(e)}
+    
     async def _delete_database_records(self, user_id: str, plugin_id: str, db: AsyncSession) -> Dict[str, Any]:
         try:
             module_delete_stmt = text("""
@@ -512,28 +1971,32 @@ class BrainDriveWhyDetectorLifecycleManager(BaseLifecycleManager):
             WHERE plugin_id = :plugin_id AND user_id = :user_id
             """)
             
-            module_result = await db.execute(module_delete_stmt, {
-                'plugin_id': plugin_id,
-                'user_id': user_id
-            })
-            
-            deleted_modules = module_result.rowcount
-            
-            plugin_delete_stmt = text("""
-            DELETE FROM plugin 
-            WHERE id = :plugin_id AND user_id = :user_id
-            """)
-            
-            plugin_result = await db.execute(plugin_delete_stmt, {
-                'plugin_id': plugin_id,
-                'user_id': user_id
-            })
+            with _phase('delete'):
+                module_result = await db.execute(module_delete_stmt, {
+                    'plugin_id': plugin_id,
+                    'user_id': user_id
+                })
+                
+                deleted_modules = module_result.rowcount
+                
+                plugin_delete_stmt = text("""
+                DELETE FROM plugin 
+                WHERE id = :plugin_id AND user_id = :user_id
+                """)
+                
+                plugin_result = await db.execute(plugin_delete_stmt, {
+                    'plugin_id': plugin_id,
+                    'user_id': user_id
+                })
+                if plugin_result.rowcount:
+                    await _session_store_module().delete_user_records(db, [user_id])
             
             if plugin_result.rowcount == 0:
                 await db.rollback()
                 return {'success': False, 'error': 'Plugin not found or not owned by user'}
             
-            await db.commit()
+            with _phase('commit'):
+                await db.commit()
             
             logger.info(f"Deleted database records for plugin {plugin_id} ({deleted_modules} modules)")
             return {'success': True, 'deleted_modules': deleted_modules}
@@ -543,6 +2006,35 @@ class BrainDriveWhyDetectorLifecycleManager(BaseLifecycleManager):
             await db.rollback()
             return {'success': False, 'error': str(e)}
     
+    async def ensure_session_store(self, db: AsyncSession) -> Dict[str, Any]:
+        """Create the coaching session record table used by session_store if it is missing.
+        
+        Runs once per database URL for this manager; later calls return immediately.
+        """
+        try:
+            bind_key = str(db.get_bind().url)
+        except Exception:
+            bind_key = None
+        if bind_key is not None and bind_key in self._session_store_ready:
+            return {'success': True, 'provisioned': False}
+        
+        try:
+            with _phase('session_store'):
+                await _session_store_module().create_schema(db)
+                await db.commit()
+            if bind_key is not None:
+                self._session_store_ready.add(bind_key)
+            logger.info("BrainDriveWhyDetector: Session store provisioned")
+            return {'success': True, 'provisioned': True}
+            
+        except Exception as e:
+            logger.error(f"BrainDriveWhyDetector: Error provisioning session store: {e}")
+            try:
+                await db.rollback()
+            except:
+                pass
+            return {'success': False, 'error': str(e)}
+    
     def get_plugin_info(self) -> Dict[str, Any]:
         return self.plugin_data
     
@@ -550,11 +2042,17 @@ class BrainDriveWhyDetectorLifecycleManager(BaseLifecycleManager):
     def MODULE_DATA(self):
         return self.module_data
     
+    @_timed_operation('install')
+    @_single_flight('install', exclusive=True)
     async def install_plugin(self, user_id: str, db: AsyncSession) -> Dict[str, Any]:
         try:
             logger.info(f"BrainDriveWhyDetector: Starting installation for user {user_id}")
             
-            existing_check = await self._check_existing_plugin(user_id, db)
+            # Checked on every path, before the copy and DDL: the upsert only
+            # conflicts on the plugin id, not on (user_id, plugin_slug).
+            upsert = self._supports_upsert(db)
+            with _phase('existence_check'):
+                existing_check = await self._check_existing_plugin(user_id, db)
             if existing_check['exists']:
                 logger.warning(f"BrainDriveWhyDetector: Plugin already installed for user {user_id}")
                 return {
@@ -570,13 +2068,19 @@ class BrainDriveWhyDetectorLifecycleManager(BaseLifecycleManager):
             if not copy_result['success']:
                 return copy_result
             
+            store_result = await self.ensure_session_store(db)
+            if not store_result['success']:
+                return store_result
+            
             try:
                 result = await self.install_for_user(user_id, db, shared_path)
                 
                 if result.get('success'):
-                    verify_check = await self._check_existing_plugin(user_id, db)
-                    if not verify_check['exists']:
-                        return {'success': False, 'error': 'Installation verification failed'}
+                    if not upsert:
+                        with _phase('verification'):
+                            verify_check = await self._check_existing_plugin(user_id, db)
+                        if not verify_check['exists']:
+                            return {'success': False, 'error': 'Installation verification failed'}
                     
                     result.update({
                         'plugin_slug': self.plugin_data['plugin_slug'],
@@ -597,22 +2101,521 @@ class BrainDriveWhyDetectorLifecycleManager(BaseLifecycleManager):
             logger.error(f"BrainDriveWhyDetector: Install plugin failed: {e}")
             return {'success': False, 'error': str(e)}
     
+    @_timed_operation('bulk_install')
+    async def install_plugin_for_users(self, user_ids: Iterable[str], db: AsyncSession) -> Dict[str, Any]:
+        """Install the plugin for many users with set-based queries.
+        
+        Shared files are copied once, already-installed users are found with
+        one IN query per chunk, and the plugin and module rows of each chunk
+        are written with executemany inside a single transaction. Users
+        installed concurrently in the meantime are reported as already
+        installed. A failing chunk is rolled back on its own and does not
+        affect other chunks.
+        """
+        try:
+            user_ids = list(dict.fromkeys(user_ids))
+            logger.info(f"BrainDriveWhyDetector: Starting bulk installation for {len(user_ids)} users")
+            results: Dict[str, Dict[str, Any]] = {}
+            if not user_ids:
+                return {'success': True, 'installed': 0, 'already_installed': 0, 'failed': 0, 'results': results}
+            
+            installed = await self._find_installed_users(user_ids, db)
+            for user_id, plugin_id in installed.items():
+                self.active_users.add(user_id)
+                results[user_id] = {
+                    'success': False,
+                    'error': 'Plugin already installed for user',
+                    'plugin_id': plugin_id
+                }
+            
+            pending = [user_id for user_id in user_ids if user_id not in installed]
+            if pending:
+                shared_path = self.shared_path
+                shared_path.mkdir(parents=True, exist_ok=True)
+                
+                copy_result = await self._copy_plugin_files_impl(pending[0], shared_path)
+                if copy_result['success']:
+                    copy_result = await self.ensure_session_store(db)
+                if not copy_result['success']:
+                    for user_id in pending:
+                        results[user_id] = {'success': False, 'error': copy_result['error']}
+                    pending = []
+            
+            for start in range(0, len(pending), self.BULK_CHUNK_SIZE):
+                chunk = pending[start:start + self.BULK_CHUNK_SIZE]
+                chunk_result = await self._create_database_records_bulk(chunk, db)
+                if not chunk_result['success']:
+                    for user_id in chunk:
+                        results[user_id] = {'success': False, 'error': chunk_result['error']}
+                    continue
+                
+                for user_id, plugin_id in chunk_result['conflicts'].items():
+                    installed[user_id] = plugin_id
+                    self.active_users.add(user_id)
+                    results[user_id] = {
+                        'success': False,
+                        'error': 'Plugin already installed for user',
+                        'plugin_id': plugin_id
+                    }
+                for user_id, record in chunk_result['records'].items():
+                    self.active_users.add(user_id)
+                    results[user_id] = {
+                        'success': True,
+                        'plugin_id': record['plugin_id'],
+                        'plugin_slug': self.plugin_data['plugin_slug'],
+                        'plugin_name': self.plugin_data['name'],
+                        'modules_created': record['modules_created']
+                    }
+            
+            installed_count = sum(1 for result in results.values() if result['success'])
+            failed_count = len(results) - installed_count - len(installed)
+            logger.info(
+                f"BrainDriveWhyDetector: Bulk installation finished - {installed_count} installed, "
+                f"{len(installed)} already installed, {failed_count} failed"
+            )
+            return {
+                'success': failed_count == 0,
+                'installed': installed_count,
+                'already_installed': len(installed),
+                'failed': failed_count,
+                'results': results
+            }
+            
+        except Exception as e:
+            logger.error(f"BrainDriveWhyDetector: Bulk install failed: {e}")
+            try:
+                await db.rollback()
+            except:
+                pass
+            return {'success': False, 'error': str(e)}
+    
+    @_timed_operation('delete')
+    @_single_flight('delete', exclusive=True)
     async def delete_plugin(self, user_id: str, db: AsyncSession) -> Dict[str, Any]:
         try:
             logger.info(f"BrainDriveWhyDetector: Starting deletion for user {user_id}")
+            store_result = await self.ensure_session_store(db)
+            if not store_result['success']:
+                return store_result
+            with _phase('existence_check'):
+                existing_check = await self._check_existing_plugin(user_id, db)
+            if not existing_check['exists']:
+                return {'success': False, 'error': existing_check.get('error', 'Plugin not found for user')}
             result = await self.uninstall_for_user(user_id, db)
             return result
         except Exception as e:
             logger.error(f"BrainDriveWhyDetector: Delete plugin failed: {e}")
             return {'success': False, 'error': str(e)}
     
+    async def _delete_database_records_bulk(self, installed: Dict[str, str], db: AsyncSession) -> Dict[str, Any]:
+        """Delete the rows of a user_id -> plugin_id batch in a single short transaction."""
+        try:
+            templates = self._record_templates()
+            params = {'plugin_ids': list(installed.values()), 'user_ids': list(installed)}
+            with _phase('delete'):
+                module_result = await db.execute(templates.module_delete_many, params)
+                plugin_result = await db.execute(templates.plugin_delete_many, params)
+                await _session_store_module().delete_user_records(db, list(installed))
+            with _phase('commit'):
+                await db.commit()
+            return {
+                'success': True,
+                'deleted_plugins': plugin_result.rowcount,
+                'deleted_modules': module_result.rowcount
+            }
+        except Exception as e:
+            logger.error(f"Error deleting bulk database records: {e}")
+            await db.rollback()
+            return {'success': False, 'error': str(e)}
+    
+    def _record_bulk_deletion(self, installed: Dict[str, str], delete_result: Dict[str, Any], results: Dict[str, Dict[str, Any]]) -> None:
+        for user_id, plugin_id in installed.items():
+            if delete_result['success']:
+                self.active_users.discard(user_id)
+                results[user_id] = {'success': True, 'plugin_id': plugin_id}
+            else:
+                results[user_id] = {'success': False, 'error': delete_result['error'], 'plugin_id': plugin_id}
+    
+    @_timed_operation('bulk_delete')
+    async def delete_plugin_for_users(self, user_ids: Iterable[str], db: AsyncSession) -> Dict[str, Any]:
+        """Uninstall the plugin for many users with set-based deletes.
+        
+        Each chunk of BULK_CHUNK_SIZE users is looked up with one IN query and
+        removed with one DELETE per table in its own transaction, so locks are
+        held briefly and a failing chunk does not undo the others.
+        """
+        try:
+            user_ids = list(dict.fromkeys(user_ids))
+            logger.info(f"BrainDriveWhyDetector: Starting bulk deletion for {len(user_ids)} users")
+            results: Dict[str, Dict[str, Any]] = {}
+            deleted_modules = 0
+            store_result = await self.ensure_session_store(db)
+            if not store_result['success']:
+                return store_result
+            
+            for start in range(0, len(user_ids), self.BULK_CHUNK_SIZE):
+                chunk = user_ids[start:start + self.BULK_CHUNK_SIZE]
+                installed = await self._find_installed_users(chunk, db)
+                for user_id in chunk:
+                    if user_id not in installed:
+                        self.active_users.discard(user_id)
+                        results[user_id] = {'success': False, 'error': 'Plugin not found for user'}
+                if not installed:
+                    continue
+                
+                delete_result = await self._delete_database_records_bulk(installed, db)
+                if delete_result['success']:
+                    deleted_modules += delete_result['deleted_modules']
+                self._record_bulk_deletion(installed, delete_result, results)
+            
+            deleted = sum(1 for result in results.values() if result['success'])
+            not_installed = sum(1 for result in results.values() if 'plugin_id' not in result)
+            failed = len(results) - deleted - not_installed
+            logger.info(
+                f"BrainDriveWhyDetector: Bulk deletion finished - {deleted} deleted, "
+                f"{not_installed} not installed, {failed} failed"
+            )
+            return {
+                'success': failed == 0,
+                'deleted': deleted,
+                'not_installed': not_installed,
+                'failed': failed,
+                'deleted_modules': deleted_modules,
+                'results': results
+            }
+            
+        except Exception as e:
+            logger.error(f"BrainDriveWhyDetector: Bulk delete failed: {e}")
+            try:
+                await db.rollback()
+            except:
+                pass
+            return {'success': False, 'error': str(e)}
+    
+    @_timed_operation('purge')
+    async def purge_all(self, db: AsyncSession) -> Dict[str, Any]:
+        """Remove the plugin for every user, BULK_CHUNK_SIZE users per transaction.
+        
+        Stops at the first failing batch so the remaining rows can be retried,
+        and at a batch that removes no plugin rows, e.g. rows without a
+        user_id, which would otherwise be selected again forever.
+        """
+        try:
+            logger.info("BrainDriveWhyDetector: Starting purge of all installations")
+            templates = self._record_templates()
+            store_result = await self.ensure_session_store(db)
+            if not store_result['success']:
+                return store_result
+            results: Dict[str, Dict[str, Any]] = {}
+            deleted_modules = 0
+            
+            while True:
+                batch = await db.execute(templates.purge_batch_query, {
+                    'plugin_slug': self.plugin_data['plugin_slug'],
+                    'batch_size': self.BULK_CHUNK_SIZE
+                })
+                installed = {row.user_id: row.id for row in batch.fetchall()}
+                if not installed:
+                    break
+                
+                delete_result = await self._delete_database_records_bulk(installed, db)
+                self._record_bulk_deletion(installed, delete_result, results)
+                if not delete_result['success']:
+                    return {
+                        'success': False,
+                        'error': delete_result['error'],
+                        'deleted': sum(1 for result in results.values() if result['success']),
+                        'deleted_modules': deleted_modules,
+                        'results': results
+                    }
+                deleted_modules += delete_result['deleted_modules']
+                if delete_result['deleted_plugins'] == 0:
+                    for user_id, plugin_id in installed.items():
+                        results[user_id] = {'success': False, 'error': 'Plugin row was not removed', 'plugin_id': plugin_id}
+                    logger.error(f"BrainDriveWhyDetector: Purge made no progress on {len(installed)} plugin rows")
+                    return {
+                        'success': False,
+                        'error': f'Purge made no progress: {len(installed)} plugin rows could not be removed',
+                        'deleted': sum(1 for result in results.values() if result['success']),
+                        'deleted_modules': deleted_modules,
+                        'results': results
+                    }
+            
+            self.active_users.clear()
+            logger.info(f"BrainDriveWhyDetector: Purged plugin for {len(results)} users")
+            return {
+                'success': True,
+                'deleted': len(results),
+                'deleted_modules': deleted_modules,
+                'results': results
+            }
+            
+        except Exception as e:
+            logger.error(f"BrainDriveWhyDetector: Purge failed: {e}")
+            try:
+                await db.rollback()
+            except:
+                pass
+            return {'success': False, 'error': str(e)}
+    
+    def _seed_from_previous_version(self, previous_dir: Path, objects_dir: Path, source_files: Dict[str, Dict[str, Any]]) -> int:
+        """Adopt files of previous_dir that did not change into the object store.
+        
+        Version directories written before the store existed hold the only
+        copy of their content; hardlinking it into the store lets the copy
+        link those files instead of copying them from source again. Returns
+        the number of files adopted.
+        """
+        previous_files = self._load_manifest(previous_dir)['files']
+        seeded = 0
+        for relative_path, entry in source_files.items():
+            blob_path = self._blob_path(objects_dir, entry['sha256'])
+            if self._target_matches(blob_path, entry):
+                continue
+            previous_path = previous_dir / relative_path
+            previous = previous_files.get(relative_path)
+            if not self._same_content(previous, entry) or not self._target_unchanged(previous_path, previous):
+                continue
+            blob_path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(previous_path, blob_path)
+            except FileExistsError:
+                continue
+            except OSError:
+                break
+            seeded += 1
+        return seeded
+    
+    async def _upgrade_shared_files(self, previous_versions: List[str]) -> Dict[str, Any]:
+        target_dir = self.shared_path
+        source_files = await _run_io(self._build_source_manifest, Path(__file__).parent)
+        
+        seeded = 0
+        previous_dir = None
+        for version in previous_versions:
+            candidate = target_dir.parent / f"v{version}"
+            if (candidate / self.MANIFEST_FILENAME).exists():
+                previous_dir = candidate
+                break
+        if previous_dir is not None:
+            async with _exclusive_file_lock(target_dir.parent / f"{self.OBJECT_STORE_DIRNAME}.lock"):
+                seeded = await _run_io(
+                    self._seed_from_previous_version, previous_dir,
+                    target_dir.parent / self.OBJECT_STORE_DIRNAME, source_files
+                )
+        
+        copy_result = await self._copy_plugin_files_impl('upgrade', target_dir, update=True)
+        if copy_result['success']:
+            copy_result['seeded_files'] = seeded
+            copy_result['previous_dir'] = str(previous_dir) if previous_dir else None
+        return copy_result
+    
+    @_timed_operation('upgrade')
+    async def update_plugin(self, db: AsyncSession) -> Dict[str, Any]:
+        """Upgrade every installed user to this manager's version in place.
+        
+        The new shared directory is seeded from the previous version's files
+        that are unchanged according to its manifest, and only changed files
+        are copied from source. Module and plugin rows are then refreshed with
+        one set-based UPDATE per table instead of a delete and reinstall per user.
+        Only rows at a strictly older version are upgraded; installs at a newer
+        version are left alone and reported in 'newer_versions'.
+        """
+        try:
+            templates = self._record_templates()
+            version = self.plugin_data['version']
+            plugin_slug = self.plugin_data['plugin_slug']
+            
+            result = await db.execute(templates.installed_versions_query, {'plugin_slug': plugin_slug})
+            version_key = _version_key(version)
+            installed_versions = {}
+            newer_versions = {}
+            for row in result.fetchall():
+                row_key = _version_key(row.version)
+                if row_key < version_key:
+                    installed_versions[row.version] = row.installs
+                elif row_key > version_key:
+                    newer_versions[row.version] = row.installs
+            if newer_versions:
+                logger.warning(f"BrainDriveWhyDetector: Leaving installs at newer versions untouched: {newer_versions}")
+            logger.info(f"BrainDriveWhyDetector: Upgrading {sum(installed_versions.values())} installs to {version} from {installed_versions}")
+            
+            previous_versions = sorted(installed_versions, key=_version_key, reverse=True)
+            self.shared_path.mkdir(parents=True, exist_ok=True)
+            copy_result = await self._upgrade_shared_files(previous_versions)
+            if not copy_result['success']:
+                return copy_result
+            
+            store_result = await self.ensure_session_store(db)
+            if not store_result['success']:
+                return store_result
+            
+            if not installed_versions:
+                return {
+                    'success': True,
+                    'version': version,
+                    'previous_versions': {},
+                    'newer_versions': newer_versions,
+                    'updated_plugins': 0,
+                    'updated_modules': 0,
+                    'copied_files': copy_result['copied_files'],
+                    'seeded_files': copy_result['seeded_files']
+                }
+            
+            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            updated_modules = 0
+            with _phase('update'):
+                # Modules first: their filter relies on plugin rows still carrying the old version.
+                for module in templates.modules:
+                    module_params = {column: module.columns[column] for column in self.UPGRADED_MODULE_COLUMNS}
+                    module_params.update({
+                        'name': module.name,
+                        'updated_at': current_time,
+                        'plugin_slug': plugin_slug,
+                        'older_versions': previous_versions
+                    })
+                    module_result = await db.execute(templates.module_upgrade, module_params)
+                    updated_modules += module_result.rowcount
+                
+                plugin_params = {column: templates.plugin_columns[column] for column in self.UPGRADED_PLUGIN_COLUMNS}
+                plugin_params.update({
+                    'updated_at': current_time,
+                    'plugin_slug': plugin_slug,
+                    'older_versions': previous_versions
+                })
+                plugin_result = await db.execute(templates.plugin_upgrade, plugin_params)
+            with _phase('commit'):
+                await db.commit()
+            
+            logger.info(
+                f"BrainDriveWhyDetector: Upgraded {plugin_result.rowcount} installs to {version} "
+                f"({len(copy_result['copied_files'])} files copied, {copy_result['seeded_files']} reused)"
+            )
+            return {
+                'success': True,
+                'version': version,
+                'previous_versions': installed_versions,
+                'newer_versions': newer_versions,
+                'updated_plugins': plugin_result.rowcount,
+                'updated_modules': updated_modules,
+                'copied_files': copy_result['copied_files'],
+                'seeded_files': copy_result['seeded_files']
+            }
+            
+        except Exception as e:
+            logger.error(f"BrainDriveWhyDetector: Upgrade failed: {e}")
+            try:
+                await db.rollback()
+            except:
+                pass
+            return {'success': False, 'error': str(e)}
+    
+    def _collectable_version_dirs(self, plugin_root: Path, referenced: set) -> List[Path]:
+        cutoff = time.time() - self.GC_GRACE_SECONDS
+        collectable = []
+        for path in sorted(plugin_root.iterdir()):
+            if not path.is_dir() or not path.name.startswith('v') or path.name[1:] in referenced:
+                continue
+            manifest_path = path / self.MANIFEST_FILENAME
+            try:
+                modified = (manifest_path if manifest_path.exists() else path).stat().st_mtime
+            except OSError:
+                continue
+            if modified < cutoff:
+                collectable.append(path)
+        return collectable
+    
+    @staticmethod
+    def _remove_version_dir(version_dir: Path, lock_path: Path) -> None:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        _remove_lock_file(lock_path)
+    
+    def _sweep_object_store(self, plugin_root: Path) -> Tuple[int, int]:
+        """Delete blobs that no version directory links to or lists. Returns (blobs, bytes) removed."""
+        objects_dir = plugin_root / self.OBJECT_STORE_DIRNAME
+        if not objects_dir.is_dir():
+            return 0, 0
+        listed = set()
+        for path in plugin_root.iterdir():
+            if path.is_dir() and not path.name.startswith('.'):
+                listed.update(entry['sha256'] for entry in self._load_manifest(path)['files'].values())
+        
+        cutoff = time.time() - self.GC_GRACE_SECONDS
+        removed = freed = 0
+        for fanout_dir in objects_dir.iterdir():
+            if not fanout_dir.is_dir():
+                continue
+            for blob_path in fanout_dir.iterdir():
+                stat = blob_path.stat()
+                if blob_path.name.endswith('.tmp'):
+                    collect = stat.st_mtime < cutoff
+                else:
+                    # Without hardlinks versions hold copies, so the manifests decide as well.
+                    collect = stat.st_nlink <= 1 and f"{fanout_dir.name}{blob_path.name}" not in listed
+                if collect:
+                    with contextlib.suppress(FileNotFoundError):
+                        blob_path.unlink()
+                        removed += 1
+                        freed += stat.st_size
+            with contextlib.suppress(OSError):
+                fanout_dir.rmdir()
+        return removed, freed
+    
+    @_timed_operation('gc')
+    async def collect_garbage(self, db: AsyncSession) -> Dict[str, Any]:
+        """Remove shared version directories no plugin row references, then unreferenced blobs.
+        
+        This manager's own version and anything written within
+        GC_GRACE_SECONDS are kept, so installs in flight are never collected.
+        """
+        try:
+            result = await db.execute(text("""
+            SELECT DISTINCT version FROM plugin WHERE plugin_slug = :plugin_slug
+            """), {'plugin_slug': self.plugin_data['plugin_slug']})
+            referenced = {str(row.version) for row in result.fetchall()}
+            referenced.add(self.plugin_data['version'])
+            
+            plugin_root = self.shared_path.parent
+            if not plugin_root.is_dir():
+                return {'success': True, 'removed_versions': [], 'removed_blobs': 0, 'freed_bytes': 0}
+            
+            removed_versions = []
+            for version_dir in await _run_io(self._collectable_version_dirs, plugin_root, referenced):
+                lock_path = plugin_root / f"{version_dir.name}.lock"
+                async with _exclusive_file_lock(lock_path):
+                    await _run_io(self._remove_version_dir, version_dir, lock_path)
+                self.invalidate_health_cache(version_dir)
+                self._invalidate_integrity(version_dir)
+                removed_versions.append(version_dir.name)
+            
+            async with _exclusive_file_lock(plugin_root / f"{self.OBJECT_STORE_DIRNAME}.lock"):
+                removed_blobs, freed_bytes = await _run_io(self._sweep_object_store, plugin_root)
+            
+            logger.info(
+                f"BrainDriveWhyDetector: Garbage collection removed {len(removed_versions)} versions "
+                f"and {removed_blobs} blobs ({freed_bytes} bytes)"
+            )
+            return {
+                'success': True,
+                'removed_versions': removed_versions,
+                'removed_blobs': removed_blobs,
+                'freed_bytes': freed_bytes
+            }
+            
+        except Exception as e:
+            logger.error(f"BrainDriveWhyDetector: Garbage collection failed: {e}")
+            return {'success': False, 'error': str(e)}
+    
+    @_timed_operation('status')
+    @_single_flight('status', exclusive=False)
     async def get_plugin_status(self, user_id: str, db: AsyncSession) -> Dict[str, Any]:
         try:
-            existing_check = await self._check_existing_plugin(user_id, db)
+            with _phase('existence_check'):
+                existing_check = await self._check_existing_plugin(user_id, db)
             if not existing_check['exists']:
                 return {'exists': False, 'status': 'not_installed'}
             
-            plugin_health = await self._get_plugin_health_impl(user_id, self.shared_path)
+            plugin_health = self._with_integrity(await self._get_plugin_health_impl(user_id, self.shared_path))
             
             return {
                 'exists': True,
@@ -626,20 +2629,185 @@ class BrainDriveWhyDetectorLifecycleManager(BaseLifecycleManager):
             logger.error(f"BrainDriveWhyDetector: Error checking plugin status: {e}")
             return {'exists': False, 'status': 'error', 'error': str(e)}
 
+    
+    @_timed_operation('bulk_status')
+    async def get_plugin_status_many(self, user_ids: Iterable[str], db: AsyncSession) -> Dict[str, Any]:
+        """Return get_plugin_status() results for many users.
+        
+        Rows are streamed from one IN (...) query per chunk and joined with a
+        single shared health check instead of one SELECT and health check per user.
+        """
+        try:
+            user_ids = list(dict.fromkeys(user_ids))
+            results: Dict[str, Dict[str, Any]] = {
+                user_id: {'exists': False, 'status': 'not_installed'} for user_id in user_ids
+            }
+            if not user_ids:
+                return {'success': True, 'results': results}
+            
+            plugin_health = self._with_integrity(await self._get_plugin_health_impl(user_ids[0], self.shared_path))
+            status = 'healthy' if plugin_health['healthy'] else 'unhealthy'
+            
+            query = self._record_templates().status_many_query
+            for start in range(0, len(user_ids), self.BULK_CHUNK_SIZE):
+                chunk = user_ids[start:start + self.BULK_CHUNK_SIZE]
+                with _phase('existence_check'):
+                    stream = await db.stream(query, {
+                        'plugin_slug': self.plugin_data['plugin_slug'],
+                        'user_ids': chunk
+                    })
+                    async for plugin_row in stream:
+                        results[plugin_row.user_id] = {
+                            'exists': True,
+                            'status': status,
+                            'plugin_id': plugin_row.id,
+                            'plugin_info': self._plugin_info_from_row(plugin_row),
+                            'health_details': dict(plugin_health['details'])
+                        }
+            
+            return {'success': True, 'results': results}
+            
+        except Exception as e:
+            logger.error(f"BrainDriveWhyDetector: Error checking plugin status for users: {e}")
+            return {'success': False, 'error': str(e)}
+    
+    async def ensure_status_index(self, db: AsyncSession, create: bool = True) -> Dict[str, Any]:
+        """Check for, and optionally create, a (user_id, plugin_slug) index on plugin.
+        
+        Any existing index, unique constraint or primary key whose leading
+        columns are user_id and plugin_slug counts, whatever its name.
+        """
+        try:
+            def find_index(sync_session):
+                inspector = inspect(sync_session.connection())
+                candidates = [index['column_names'] for index in inspector.get_indexes('plugin')]
+                candidates += [constraint['column_names'] for constraint in inspector.get_unique_constraints('plugin')]
+                candidates.append(inspector.get_pk_constraint('plugin').get('constrained_columns') or [])
+                return any(list(columns[:2]) == ['user_id', 'plugin_slug'] for columns in candidates)
+            
+            if await db.run_sync(find_index):
+                return {'success': True, 'exists': True, 'created': False}
+            if not create:
+                return {'success': True, 'exists': False, 'created': False}
+            
+            await db.execute(text(f"CREATE INDEX {self.STATUS_INDEX_NAME} ON plugin (user_id, plugin_slug)"))
+            await db.commit()
+            logger.info(f"BrainDriveWhyDetector: Created index {self.STATUS_INDEX_NAME} on plugin")
+            return {'success': True, 'exists': True, 'created': True}
+            
+        except Exception as e:
+            logger.error(f"BrainDriveWhyDetector: Error ensuring plugin status index: {e}")
+            try:
+                await db.rollback()
+            except:
+                pass
+            return {'success': False, 'error': str(e)}
+
+
+# Process-wide manager registry. Managers are cheap to keep and hold the
+# base-class bookkeeping (active_users, last_used) across calls.
+_manager_registry: Dict[Optional[str], BrainDriveWhyDetectorLifecycleManager] = {}
+_manager_registry_lock = threading.Lock()
+
+
+def get_lifecycle_manager(plugins_base_dir: str = None) -> BrainDriveWhyDetectorLifecycleManager:
+    """Return the shared manager for plugins_base_dir, creating it on first use."""
+    key = os.path.abspath(plugins_base_dir) if plugins_base_dir else None
+    manager = _manager_registry.get(key)
+    if manager is None:
+        with _manager_registry_lock:
+            manager = _manager_registry.get(key)
+            if manager is None:
+                manager = _manager_class()(plugins_base_dir)
+                _manager_registry[key] = manager
+    return manager
+
+
+def prewarm_lifecycle_managers(plugins_base_dirs: Iterable[Optional[str]] = (None,), hash_sources: bool = True) -> List[BrainDriveWhyDetectorLifecycleManager]:
+    """Create managers ahead of the first request, e.g. from application startup.
+    
+    With hash_sources the source file manifest is computed as well, so the
+    first install only has to compare it against the shared copy.
+    """
+    managers = [get_lifecycle_manager(plugins_base_dir) for plugins_base_dir in plugins_base_dirs]
+    if hash_sources and managers:
+        managers[0]._build_source_manifest(Path(__file__).parent)
+    return managers
+
+
+def clear_lifecycle_managers() -> None:
+    with _manager_registry_lock:
+        _manager_registry.clear()
+
+
+# Background integrity verifiers, keyed by the directory holding the plugin's
+# shared version directories. get_plugin_status() reads their latest results.
+_integrity_verifiers: Dict[str, IntegrityVerifier] = {}
+
+
+def start_integrity_verifier(plugins_base_dir: str = None, interval: float = 300.0,
+                             max_bytes_per_second: float = 32 * 1024 * 1024,
+                             cpu_fraction: float = 0.25) -> IntegrityVerifier:
+    """Start (or return the running) background verifier for the plugin's shared directories."""
+    manager = get_lifecycle_manager(plugins_base_dir)
+    plugin_root = manager.shared_path.parent
+    with _manager_registry_lock:
+        verifier = _integrity_verifiers.get(str(plugin_root))
+        if verifier is None:
+            verifier = IntegrityVerifier(
+                plugin_root, manager.MANIFEST_FILENAME, interval=interval,
+                max_bytes_per_second=max_bytes_per_second, cpu_fraction=cpu_fraction
+            )
+            _integrity_verifiers[str(plugin_root)] = verifier
+    verifier.start()
+    return verifier
+
+
+def stop_integrity_verifiers(timeout: Optional[float] = None) -> None:
+    with _manager_registry_lock:
+        verifiers = list(_integrity_verifiers.values())
+        _integrity_verifiers.clear()
+    for verifier in verifiers:
+        verifier.stop(timeout)
+
 
 # Standalone functions for compatibility
 async def install_plugin(user_id: str, db: AsyncSession, plugins_base_dir: str = None) -> Dict[str, Any]:
-    manager = BrainDriveWhyDetectorLifecycleManager(plugins_base_dir)
+    manager = get_lifecycle_manager(plugins_base_dir)
     return await manager.install_plugin(user_id, db)
 
+async def install_plugin_for_users(user_ids: Iterable[str], db: AsyncSession, plugins_base_dir: str = None) -> Dict[str, Any]:
+    manager = get_lifecycle_manager(plugins_base_dir)
+    return await manager.install_plugin_for_users(user_ids, db)
+
 async def delete_plugin(user_id: str, db: AsyncSession, plugins_base_dir: str = None) -> Dict[str, Any]:
-    manager = BrainDriveWhyDetectorLifecycleManager(plugins_base_dir)
+    manager = get_lifecycle_manager(plugins_base_dir)
     return await manager.delete_plugin(user_id, db)
 
+async def delete_plugin_for_users(user_ids: Iterable[str], db: AsyncSession, plugins_base_dir: str = None) -> Dict[str, Any]:
+    manager = get_lifecycle_manager(plugins_base_dir)
+    return await manager.delete_plugin_for_users(user_ids, db)
+
+async def purge_all(db: AsyncSession, plugins_base_dir: str = None) -> Dict[str, Any]:
+    manager = get_lifecycle_manager(plugins_base_dir)
+    return await manager.purge_all(db)
+
+async def update_plugin(db: AsyncSession, plugins_base_dir: str = None) -> Dict[str, Any]:
+    manager = get_lifecycle_manager(plugins_base_dir)
+    return await manager.update_plugin(db)
+
+async def collect_garbage(db: AsyncSession, plugins_base_dir: str = None) -> Dict[str, Any]:
+    manager = get_lifecycle_manager(plugins_base_dir)
+    return await manager.collect_garbage(db)
+
 async def get_plugin_status(user_id: str, db: AsyncSession, plugins_base_dir: str = None) -> Dict[str, Any]:
-    manager = BrainDriveWhyDetectorLifecycleManager(plugins_base_dir)
+    manager = get_lifecycle_manager(plugins_base_dir)
     return await manager.get_plugin_status(user_id, db)
 
+async def get_plugin_status_many(user_ids: Iterable[str], db: AsyncSession, plugins_base_dir: str = None) -> Dict[str, Any]:
+    manager = get_lifecycle_manager(plugins_base_dir)
+    return await manager.get_plugin_status_many(user_ids, db)
+
 
 if __name__ == "__main__":
     import asyncio
@@ -648,7 +2816,7 @@ if __name__ == "__main__":
         print("BrainDriveWhyDetector Plugin Lifecycle Manager - Test Mode")
         print("=" * 50)
         
-        manager = BrainDriveWhyDetectorLifecycleManager()
+        manager = _manager_class()()
         print(f"Plugin: {manager.plugin_data['name']}")
         print(f"Version: {manager.plugin_data['version']}")
         print(f"Slug: {manager.plugin_data['plugin_slug']}")
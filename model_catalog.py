@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+BrainDriveWhyDetector Model Catalog Cache
+
+Caches the model list per (user_id, provider) so that opening the plugin does
+not fan out to every provider server on each mount. Within ttl a cached list
+is returned as is; after ttl and within stale_ttl it is still returned
+immediately while a background refresh runs; older entries are refetched
+before returning. Concurrent refreshes of one key share a single fetch.
+
+The fetcher is supplied by the host, e.g. a call to the provider listing
+behind /api/v1/ai/providers/all-models:
+
+    async def fetch_models(user_id, provider):  # provider is None for all providers
+        ...
+        return {'models': [...]}   # or a plain list of model dicts
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import structlog
+
+logger = structlog.get_logger()
+
+# Mirrors PROVIDER_SETTINGS_ID_MAP in src/services/aiService.ts.
+PROVIDER_SETTINGS_ID_MAP = {
+    'ollama': 'ollama_servers_settings',
+    'anthropic': 'anthropic_api_settings',
+    'openai': 'openai_api_settings',
+    'openrouter': 'openrouter_api_settings'
+}
+
+Fetcher = Callable[[str, Optional[str]], Awaitable[Any]]
+
+
+def normalize_models(response: Any) -> List[Dict[str, str]]:
+    """Map a provider listing to ModelInfo dicts the way AIService.fetchModels does."""
+    if isinstance(response, dict):
+        raw = response.get('models')
+        if raw is None and isinstance(response.get('data'), dict):
+            raw = response['data'].get('models')
+    else:
+        raw = response
+    if not isinstance(raw, list):
+        return []
+    models = []
+    for model in raw:
+        if not isinstance(model, dict):
+            continue
+        provider = model.get('provider') or 'ollama'
+        models.append({
+            'name': model.get('name') or model.get('id') or '',
+            'provider': provider,
+            'providerId': PROVIDER_SETTINGS_ID_MAP.get(provider, provider),
+            'serverName': model.get('server_name') or model.get('serverName') or 'Unknown Server',
+            'serverId': model.get('server_id') or model.get('serverId') or 'unknown'
+        })
+    return models
+
+
+class _CatalogEntry(NamedTuple):
+    fetched_at: float
+    models: Tuple[Dict[str, str], ...]
+
+
+class ModelCatalogCache:
+    """Per-user, per-provider model lists with stale-while-revalidate."""
+
+    def __init__(self, fetcher: Fetcher, ttl: float = 300.0, stale_ttl: float = 3600.0,
+                 max_entries: int = 4096, clock: Callable[[], float] = time.monotonic):
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._entries: OrderedDict[Tuple[str, Optional[str]], _CatalogEntry] = OrderedDict()
+        self._refreshes: Dict[Tuple[str, Optional[str]], asyncio.Future] = {}
+        self._background: Set[asyncio.Future] = set()
+        self.fetches = 0
+
+    def _result(self, entry: _CatalogEntry, source: str, now: float, error: Optional[str] = None) -> Dict[str, Any]:
+        result = {
+            'success': True,
+            'models': [dict(model) for model in entry.models],
+            'source': source,
+            'age_seconds': round(now - entry.fetched_at, 3)
+        }
+        if error is not None:
+            result['error'] = error
+        return result
+
+    async def _fetch(self, key: Tuple[str, Optional[str]]) -> _CatalogEntry:
+        self.fetches += 1
+        response = await self.fetcher(*key)
+        entry = _CatalogEntry(self.clock(), tuple(normalize_models(response)))
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def _refresh(self, key: Tuple[str, Optional[str]]) -> asyncio.Future:
+        """Start a fetch for key, or return the one already running."""
+        task = self._refreshes.get(key)
+        # A finished task stays registered until its done callback runs.
+        if task is None or task.done():
+            task = asyncio.ensure_future(self._fetch(key))
+            self._refreshes[key] = task
+
+            def forget(done, key=key):
+                if self._refreshes.get(key) is done:
+                    del self._refreshes[key]
+            task.add_done_callback(forget)
+        return task
+
+    def _refresh_in_background(self, key: Tuple[str, Optional[str]]) -> None:
+        running = self._refreshes.get(key)
+        if running is not None and not running.done():
+            return
+        task = self._refresh(key)
+        self._background.add(task)
+
+        def report(done, key=key):
+            self._background.discard(done)
+            if not done.cancelled() and done.exception() is not None:
+                logger.warning(f"BrainDriveWhyDetector: Background model refresh failed for {key}: {done.exception()}")
+        task.add_done_callback(report)
+
+    async def get(self, user_id: str, provider: Optional[str] = None, force_refresh: bool = False) -> Dict[str, Any]:
+        """Return the model list for user_id and provider (None for all providers)."""
+        key = (user_id, provider)
+        entry = self._entries.get(key)
+        now = self.clock()
+
+        if entry is not None and not force_refresh:
+            age = now - entry.fetched_at
+            if age < self.ttl:
+                self._entries.move_to_end(key)
+                return self._result(entry, 'cache', now)
+            if age < self.ttl + self.stale_ttl:
+                self._refresh_in_background(key)
+                return self._result(entry, 'stale', now)
+
+        try:
+            # Shielded so a caller that gives up does not cancel the fetch others share.
+            entry = await asyncio.shield(self._refresh(key))
+            return self._result(entry, 'fetched', self.clock())
+        except Exception as e:
+            logger.error(f"BrainDriveWhyDetector: Error fetching models for user {user_id}: {e}")
+            stale = self._entries.get(key)
+            if stale is not None:
+                return self._result(stale, 'stale', self.clock(), error=str(e))
+            return {'success': False, 'models': [], 'error': str(e)}
+
+    async def get_many(self, user_id: str, providers: Iterable[str]) -> Dict[str, Any]:
+        """Fetch several providers concurrently and merge their lists in provider order."""
+        providers = list(dict.fromkeys(providers))
+        results = await asyncio.gather(*(self.get(user_id, provider) for provider in providers))
+        models = []
+        errors = {}
+        for provider, result in zip(providers, results):
+            models.extend(result['models'])
+            if 'error' in result:
+                errors[provider] = result['error']
+        return {
+            'success': all(result['success'] for result in results),
+            'models': models,
+            'errors': errors
+        }
+
+    def invalidate(self, user_id: Optional[str] = None, provider: Optional[str] = None) -> None:
+        """Drop cached lists of user_id (all users when None), for provider only when given."""
+        for key in list(self._entries):
+            if (user_id is None or key[0] == user_id) and (provider is None or key[1] == provider):
+                del self._entries[key]
+
+    async def close(self) -> None:
+        """Cancel background refreshes, e.g. on application shutdown."""
+        tasks = list(self._background)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+BrainDriveWhyDetector Session Store
+
+Server-side storage for coaching sessions. Every change to a session - a chat
+message, a phase change or a SessionData update - is appended as one compact
+record keyed by (user_id, session_id, seq), so a turn writes only what is new
+and a session is rebuilt by replaying its records in order. Replayed sessions
+are cached and later loads only read records past the cached seq. The first
+record of a session carries a random nonce, and a cached replay is only
+extended while that first record is unchanged, so sessions deleted and
+restarted by another worker are replayed from scratch.
+
+The table is created by the lifecycle manager on install and its rows are
+removed when the plugin is uninstalled for a user.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import datetime
+import json
+import secrets
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
+
+import structlog
+
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = structlog.get_logger()
+
+
+def text(sql: str):
+    from sqlalchemy import text as _text
+    return _text(sql)
+
+
+def bindparam(key: str, **kwargs):
+    from sqlalchemy import bindparam as _bindparam
+    return _bindparam(key, **kwargs)
+
+
+def _is_integrity_error(error: BaseException) -> bool:
+    from sqlalchemy.exc import IntegrityError
+    return isinstance(error, IntegrityError)
+
+
+SESSION_TABLE = 'whydetector_session_record'
+
+# Record kinds
+KIND_MESSAGE = 'm'
+KIND_PHASE = 'p'
+KIND_DATA = 'd'
+
+INITIAL_PHASE = 'intro'
+LIST_FIELDS = ('energizers', 'drainers', 'stories', 'patterns')
+SCALAR_FIELDS = ('whyStatement', 'snapshot')
+
+# Sender codes used in message payloads
+_SENDER_CODES = {'user': 'u', 'coach': 'c'}
+_SENDER_NAMES = {code: sender for sender, code in _SENDER_CODES.items()}
+
+_CREATE_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS {SESSION_TABLE} (
+    user_id VARCHAR NOT NULL,
+    session_id VARCHAR(64) NOT NULL,
+    seq INTEGER NOT NULL,
+    kind VARCHAR(1) NOT NULL,
+    payload TEXT NOT NULL,
+    created_at VARCHAR NOT NULL,
+    PRIMARY KEY (user_id, session_id, seq)
+)
+"""
+
+
+def _encode(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload, separators=(',', ':'), ensure_ascii=False)
+
+
+def empty_session_data() -> Dict[str, Any]:
+    data: Dict[str, Any] = {field: [] for field in LIST_FIELDS}
+    data['whyStatement'] = ''
+    data['snapshot'] = None
+    return data
+
+
+def new_session(session_id: str) -> Dict[str, Any]:
+    return {
+        'session_id': session_id,
+        'phase': INITIAL_PHASE,
+        'session_data': empty_session_data(),
+        'messages': [],
+        'last_seq': 0
+    }
+
+
+def message_record(sender: str, content: str, message_id: Optional[str] = None,
+                   phase: Optional[str] = None, timestamp: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+    if sender not in _SENDER_CODES:
+        raise ValueError(f"Unknown message sender: {sender}")
+    payload = {
+        's': _SENDER_CODES[sender],
+        'c': content,
+        't': timestamp or datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='milliseconds')
+    }
+    if message_id:
+        payload['i'] = message_id
+    if phase:
+        payload['p'] = phase
+    return KIND_MESSAGE, payload
+
+
+def phase_record(phase: str) -> Tuple[str, Dict[str, Any]]:
+    return KIND_PHASE, {'p': phase}
+
+
+def data_record(field: str, value: Any) -> Tuple[str, Dict[str, Any]]:
+    """Record a SessionData change: list fields get value appended, other fields are replaced."""
+    if field not in LIST_FIELDS and field not in SCALAR_FIELDS:
+        raise ValueError(f"Unknown session data field: {field}")
+    return KIND_DATA, {'f': field, 'v': value}
+
+
+def apply_record(session: Dict[str, Any], seq: int, kind: str, payload: Dict[str, Any]) -> None:
+    """Fold one record into a session built by new_session()."""
+    if kind == KIND_MESSAGE:
+        session['messages'].append({
+            'id': payload.get('i') or f"{session['session_id']}_{seq}",
+            'sender': _SENDER_NAMES.get(payload['s'], payload['s']),
+            'content': payload['c'],
+            'timestamp': payload['t'],
+            'phase': payload.get('p', session['phase'])
+        })
+    elif kind == KIND_PHASE:
+        session['phase'] = payload['p']
+    elif kind == KIND_DATA:
+        field = payload['f']
+        if field in LIST_FIELDS:
+            session['session_data'][field].append(payload['v'])
+        else:
+            session['session_data'][field] = payload['v']
+    else:
+        logger.warning(f"BrainDriveWhyDetector: Skipping session record {seq} of unknown kind {kind!r}")
+    session['last_seq'] = seq
+
+
+def copy_session(session: Dict[str, Any]) -> Dict[str, Any]:
+    data = session['session_data']
+    return {
+        **session,
+        'session_data': {
+            **data,
+            **{field: list(data[field]) for field in LIST_FIELDS},
+            'snapshot': dict(data['snapshot']) if isinstance(data['snapshot'], dict) else data['snapshot']
+        },
+        'messages': [dict(message) for message in session['messages']]
+    }
+
+
+def history(session: Dict[str, Any], limit: int = 20) -> List[Dict[str, Any]]:
+    """The most recent messages, as buildCoachMessages takes them from the client."""
+    return session['messages'][-limit:] if limit else []
+
+
+async def create_schema(db: AsyncSession) -> None:
+    """Create the session record table if it is missing. The caller commits."""
+    await db.execute(text(_CREATE_TABLE_SQL))
+
+
+async def delete_user_records(db: AsyncSession, user_ids: Iterable[str]) -> int:
+    """Delete every session record of user_ids. The caller commits."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    query = text(f"DELETE FROM {SESSION_TABLE} WHERE user_id IN :user_ids").bindparams(
+        bindparam('user_ids', expanding=True)
+    )
+    result = await db.execute(query, {'user_ids': user_ids})
+    get_session_store().forget_users(user_ids)
+    return result.rowcount
+
+
+async def delete_all_records(db: AsyncSession) -> int:
+    """Delete every session record. The caller commits."""
+    result = await db.execute(text(f"DELETE FROM {SESSION_TABLE}"))
+    get_session_store().forget_users(None)
+    return result.rowcount
+
+
+class SessionStore:
+    """Append and replay session records, caching replayed sessions per (user_id, session_id)."""
+
+    # Attempts per append when another writer takes the same seq first.
+    APPEND_ATTEMPTS = 5
+
+    def __init__(self, max_cached_sessions: int = 1024):
+        self.max_cached_sessions = max_cached_sessions
+        # (user_id, session_id) -> (origin, session); origin identifies the first record the replay started from.
+        self._cache: OrderedDict[Tuple[str, str], Tuple[Tuple[str, str], Dict[str, Any]]] = OrderedDict()
+        self._locks: Dict[Tuple[str, str], list] = {}
+
+    @contextlib.asynccontextmanager
+    async def _session_lock(self, key: Tuple[str, str]):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0 and self._locks.get(key) is entry:
+                del self._locks[key]
+
+    def _cache_put(self, key: Tuple[str, str], origin: Tuple[str, str], session: Dict[str, Any]) -> None:
+        self._cache[key] = (origin, session)
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.max_cached_sessions:
+            self._cache.popitem(last=False)
+
+    def forget_users(self, user_ids: Optional[Iterable[str]]) -> None:
+        """Drop cached sessions of user_ids, or of every user when None."""
+        if user_ids is None:
+            self._cache.clear()
+            return
+        user_ids = set(user_ids)
+        for key in [key for key in self._cache if key[0] in user_ids]:
+            del self._cache[key]
+
+    async def append(self, db: AsyncSession, user_id: str, session_id: str,
+                     records: Iterable[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Append records to a session in one transaction and return the new last seq.
+
+        The session lock only serialises appends within this store; a writer in
+        another process can take the same seq between the read and the insert.
+        The primary key rejects that insert and the append is retried on top
+        of the new last seq.
+        """
+        records = list(records)
+        key = (user_id, session_id)
+        async with self._session_lock(key):
+            for attempt in range(1, self.APPEND_ATTEMPTS + 1):
+                try:
+                    return await self._append_once(db, key, records)
+                except Exception as e:
+                    try:
+                        await db.rollback()
+                    except:
+                        pass
+                    if _is_integrity_error(e) and attempt < self.APPEND_ATTEMPTS:
+                        logger.info(f"BrainDriveWhyDetector: Session {session_id} of user {user_id} was appended concurrently, retrying")
+                        continue
+                    logger.error(f"BrainDriveWhyDetector: Error appending to session {session_id} for user {user_id}: {e}")
+                    return {'success': False, 'error': str(e)}
+
+    async def _append_once(self, db: AsyncSession, key: Tuple[str, str],
+                           records: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        user_id, session_id = key
+        result = await db.execute(text(f"""
+        SELECT COALESCE(MAX(seq), 0) AS last_seq FROM {SESSION_TABLE}
+        WHERE user_id = :user_id AND session_id = :session_id
+        """), {'user_id': user_id, 'session_id': session_id})
+        base_seq = result.scalar()
+        if not records:
+            return {'success': True, 'last_seq': base_seq}
+        if base_seq == 0:
+            kind, payload = records[0]
+            records = [(kind, {**payload, 'n': secrets.token_hex(8)})] + records[1:]
+
+        created_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        rows = [
+            {
+                'user_id': user_id,
+                'session_id': session_id,
+                'seq': base_seq + offset,
+                'kind': kind,
+                'payload': _encode(payload),
+                'created_at': created_at
+            }
+            for offset, (kind, payload) in enumerate(records, start=1)
+        ]
+        await db.execute(text(f"""
+        INSERT INTO {SESSION_TABLE} (user_id, session_id, seq, kind, payload, created_at)
+        VALUES (:user_id, :session_id, :seq, :kind, :payload, :created_at)
+        """), rows)
+        await db.commit()
+
+        # Extend the cached replay only if it was current; otherwise the next load reads the delta.
+        cached = self._cache.get(key)
+        if cached is not None and cached[1]['last_seq'] == base_seq:
+            for row, (kind, payload) in zip(rows, records):
+                apply_record(cached[1], row['seq'], kind, payload)
+
+        return {'success': True, 'last_seq': rows[-1]['seq']}
+
+    async def record_turn(self, db: AsyncSession, user_id: str, session_id: str, user_message: Optional[str] = None,
+                          coach_message: Optional[str] = None, phase: Optional[str] = None,
+                          data_updates: Iterable[Tuple[str, Any]] = ()) -> Dict[str, Any]:
+        """Append one conversational turn: the messages, SessionData changes and a phase change."""
+        records = []
+        if user_message is not None:
+            records.append(message_record('user', user_message))
+        if coach_message is not None:
+            records.append(message_record('coach', coach_message))
+        records.extend(data_record(field, value) for field, value in data_updates)
+        if phase is not None:
+            records.append(phase_record(phase))
+        return await self.append(db, user_id, session_id, records)
+
+    async def load(self, db: AsyncSession, user_id: str, session_id: str) -> Dict[str, Any]:
+        """Rebuild a session, reading only records newer than the cached replay.
+
+        A cached replay whose first record was deleted or replaced since is
+        dropped and the session is replayed from its first record.
+        """
+        key = (user_id, session_id)
+        async with self._session_lock(key):
+            try:
+                replay = await self._replay(db, key, self._cache.get(key))
+                if replay is None:
+                    self._cache.pop(key, None)
+                    replay = await self._replay(db, key, None)
+                origin, session = replay
+
+                if session['last_seq'] == 0:
+                    return {'success': True, 'exists': False, 'session': copy_session(session)}
+                self._cache_put(key, origin, session)
+                return {'success': True, 'exists': True, 'session': copy_session(session)}
+
+            except Exception as e:
+                logger.error(f"BrainDriveWhyDetector: Error loading session {session_id} for user {user_id}: {e}")
+                return {'success': False, 'error': str(e)}
+
+    async def _replay(self, db: AsyncSession, key: Tuple[str, str],
+                      cached: Optional[Tuple[Tuple[str, str], Dict[str, Any]]]):
+        """Fold the records past the cached seq into the cached session, or None if the cache is stale."""
+        user_id, session_id = key
+        expected, session = cached if cached is not None else (None, new_session(session_id))
+        after_seq = session['last_seq']
+        origin = None
+        # The first record is read along with the delta to check the cache still describes this session.
+        stream = await db.stream(text(f"""
+        SELECT seq, kind, payload, created_at FROM {SESSION_TABLE}
+        WHERE user_id = :user_id AND session_id = :session_id AND (seq = 1 OR seq > :after_seq)
+        ORDER BY seq
+        """), {'user_id': user_id, 'session_id': session_id, 'after_seq': after_seq})
+        async for row in stream:
+            if row.seq == 1:
+                origin = (row.created_at, row.payload)
+                if expected is not None and origin != expected:
+                    await stream.close()
+                    return None
+                if after_seq:
+                    continue
+            elif origin is None and expected is not None:
+                await stream.close()
+                return None
+            apply_record(session, row.seq, row.kind, json.loads(row.payload))
+
+        if expected is not None and origin is None:
+            return None
+        return origin, session
+
+    async def list_sessions(self, db: AsyncSession, user_id: str) -> Dict[str, Any]:
+        """Sessions of user_id with their record counts, most recently updated first."""
+        try:
+            result = await db.execute(text(f"""
+            SELECT session_id, MAX(seq) AS last_seq, MIN(created_at) AS created_at, MAX(created_at) AS updated_at
+            FROM {SESSION_TABLE}
+            WHERE user_id = :user_id
+            GROUP BY session_id
+            ORDER BY updated_at DESC
+            """), {'user_id': user_id})
+            sessions = [
+                {
+                    'session_id': row.session_id,
+                    'last_seq': row.last_seq,
+                    'created_at': row.created_at,
+                    'updated_at': row.updated_at
+                }
+                for row in result.fetchall()
+            ]
+            return {'success': True, 'sessions': sessions}
+        except Exception as e:
+            logger.error(f"BrainDriveWhyDetector: Error listing sessions for user {user_id}: {e}")
+            return {'success': False, 'error': str(e)}
+
+
+_session_store: Optional[SessionStore] = None
+
+
+def get_session_store() -> SessionStore:
+    global _session_store
+    if _session_store is None:
+        _session_store = SessionStore()
+    return _session_store
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+BrainDriveWhyDetector Stream Relay
+
+Relays a provider chat stream for conversation_type 'whydetector' requests to
+the browser as fewer, larger SSE frames. Upstream chunks in any of the formats
+the client understands (OpenAI SSE, Ollama NDJSON, plain text fields) are
+decoded incrementally, their text is merged, and one frame is emitted per
+flush interval or per flush_bytes of text:
+
+    data: {"text":"merged tokens"}
+
+followed by data: [DONE]. The client's extractTextFromData() already reads
+the text field, so no client change is needed to consume the relay.
+
+Upstream is read by a separate task into a bounded queue: when the browser
+reads slowly the queue fills and reading from the provider pauses.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import codecs
+import json
+import time
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, Optional, Tuple, Union
+
+import structlog
+
+logger = structlog.get_logger()
+
+CONVERSATION_TYPE = 'whydetector'
+DONE_FRAME = b'data: [DONE]\n\n'
+
+_END = object()
+
+
+def should_relay(request_params: Dict[str, Any]) -> bool:
+    return request_params.get('conversation_type') == CONVERSATION_TYPE
+
+
+def extract_text(data: Any) -> str:
+    """Python port of extractTextFromData() in src/services/aiService.ts."""
+    if not data:
+        return ''
+    if isinstance(data, str):
+        return data
+    if not isinstance(data, dict):
+        return ''
+    choices = data.get('choices')
+    if isinstance(choices, list) and choices and isinstance(choices[0], dict):
+        message = choices[0].get('message')
+        if isinstance(message, dict) and message.get('content'):
+            return message['content']
+        delta = choices[0].get('delta')
+        if isinstance(delta, dict) and delta.get('content'):
+            return delta['content']
+    message = data.get('message')
+    if isinstance(message, dict) and message.get('content'):
+        return message['content']
+    if data.get('response'):
+        return data['response']
+    content = data.get('content')
+    if content:
+        return content if isinstance(content, str) else json.dumps(content)
+    if data.get('text'):
+        return data['text']
+    return ''
+
+
+def encode_frame(payload: Dict[str, Any]) -> bytes:
+    return b'data: ' + json.dumps(payload, separators=(',', ':'), ensure_ascii=False).encode('utf-8') + b'\n\n'
+
+
+class StreamDecoder:
+    """Incremental decoder for SSE and newline-delimited JSON provider streams.
+
+    feed() accepts bytes or str split at arbitrary points, including inside
+    UTF-8 sequences, and returns (text, done) for every complete event.
+    """
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._buffer = ''
+        self._data_lines: List[str] = []
+        self.done = False
+
+    def feed(self, chunk: Union[bytes, str]) -> List[Tuple[str, bool]]:
+        if isinstance(chunk, bytes):
+            chunk = self._decoder.decode(chunk)
+        self._buffer += chunk
+        events = []
+        while not self.done:
+            newline = self._buffer.find('\n')
+            if newline < 0:
+                break
+            line = self._buffer[:newline].rstrip('\r')
+            self._buffer = self._buffer[newline + 1:]
+            event = self._line(line)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def close(self) -> List[Tuple[str, bool]]:
+        """Decode whatever remains once upstream has ended without a final newline."""
+        events = self.feed(self._decoder.decode(b'', final=True) + '\n')
+        if self._data_lines and not self.done:
+            payload, self._data_lines = '\n'.join(self._data_lines), []
+            event = self._payload(payload)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def _line(self, line: str) -> Optional[Tuple[str, bool]]:
+        if not line:
+            # Blank line ends an SSE event
+            if not self._data_lines:
+                return None
+            payload, self._data_lines = '\n'.join(self._data_lines), []
+            return self._payload(payload)
+        if line.startswith(':'):
+            return None
+        if line.startswith('data:'):
+            value = line[5:]
+            self._data_lines.append(value[1:] if value.startswith(' ') else value)
+            # Providers commonly send one JSON document per data line without blank separators.
+            if len(self._data_lines) == 1 and self._complete(self._data_lines[0]):
+                payload, self._data_lines = self._data_lines[0], []
+                return self._payload(payload)
+            return None
+        if line.startswith(('event:', 'id:', 'retry:')):
+            return None
+        # Newline-delimited JSON (Ollama) or a bare payload
+        return self._payload(line)
+
+    @staticmethod
+    def _complete(payload: str) -> bool:
+        stripped = payload.strip()
+        if stripped == '[DONE]':
+            return True
+        try:
+            json.loads(stripped)
+        except ValueError:
+            return False
+        return True
+
+    def _payload(self, payload: str) -> Optional[Tuple[str, bool]]:
+        stripped = payload.strip()
+        if not stripped:
+            return None
+        if stripped == '[DONE]':
+            self.done = True
+            return '', True
+        try:
+            data = json.loads(stripped)
+        except ValueError:
+            # Partial or non-JSON chunks are ignored, as the client does.
+            return None
+        done = isinstance(data, dict) and data.get('done') is True
+        self.done = self.done or done
+        return extract_text(data), done
+
+
+class StreamRelay:
+    """Coalesce an upstream provider stream into compact SSE frames.
+
+    Text is flushed when flush_interval seconds have passed since the first
+    unflushed token or when flush_bytes of text are buffered. queue_size
+    bounds how many upstream chunks are read ahead of the browser.
+    """
+
+    def __init__(self, upstream: AsyncIterable[Union[bytes, str]], flush_interval: float = 0.025,
+                 flush_bytes: int = 1024, queue_size: int = 64):
+        self.upstream = upstream
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.queue_size = queue_size
+        self.chunks_in = 0
+        self.bytes_in = 0
+        self.events_in = 0
+        self.frames_out = 0
+        self.bytes_out = 0
+        self._text_parts: List[str] = []
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self.frames()
+
+    async def _read_upstream(self, queue: asyncio.Queue) -> None:
+        decoder = StreamDecoder()
+        try:
+            async for chunk in self.upstream:
+                self.chunks_in += 1
+                self.bytes_in += len(chunk)
+                for event in decoder.feed(chunk):
+                    await queue.put(event)
+                if decoder.done:
+                    break
+            if not decoder.done:
+                for event in decoder.close():
+                    await queue.put(event)
+            await queue.put(_END)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            close = getattr(self.upstream, 'aclose', None)
+            if close is not None:
+                try:
+                    await close()
+                except Exception:
+                    pass
+
+    def _frame(self, payload: Dict[str, Any]) -> bytes:
+        frame = encode_frame(payload)
+        self.frames_out += 1
+        self.bytes_out += len(frame)
+        return frame
+
+    async def frames(self) -> AsyncIterator[bytes]:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        reader = asyncio.ensure_future(self._read_upstream(queue))
+        pending: List[str] = []
+        pending_bytes = 0
+        first_pending_at = 0.0
+        try:
+            while True:
+                timeout = None
+                if pending:
+                    timeout = max(0.0, first_pending_at + self.flush_interval - time.monotonic())
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    item = None
+
+                if item is None or item is _END or isinstance(item, Exception):
+                    if pending:
+                        yield self._frame({'text': ''.join(pending)})
+                        pending, pending_bytes = [], 0
+                    if item is _END:
+                        break
+                    if isinstance(item, Exception):
+                        logger.error(f"BrainDriveWhyDetector: Upstream stream failed: {item}")
+                        yield self._frame({'error': str(item)})
+                        break
+                    continue
+
+                self.events_in += 1
+                text, done = item
+                if text:
+                    if not pending:
+                        first_pending_at = time.monotonic()
+                    pending.append(text)
+                    pending_bytes += len(text.encode('utf-8'))
+                    self._text_parts.append(text)
+                if pending and (done or pending_bytes >= self.flush_bytes):
+                    yield self._frame({'text': ''.join(pending)})
+                    pending, pending_bytes = [], 0
+
+            self.frames_out += 1
+            self.bytes_out += len(DONE_FRAME)
+            yield DONE_FRAME
+        finally:
+            if not reader.done():
+                reader.cancel()
+                try:
+                    await reader
+                except (asyncio.CancelledError, Exception):
+                    pass
+
+    @property
+    def text(self) -> str:
+        """All text relayed so far."""
+        return ''.join(self._text_parts)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'chunks_in': self.chunks_in,
+            'bytes_in': self.bytes_in,
+            'events_in': self.events_in,
+            'frames_out': self.frames_out,
+            'bytes_out': self.bytes_out,
+            'text_length': len(self.text)
+        }
+
+
+def relay_stream(upstream: AsyncIterable[Union[bytes, str]], **options) -> AsyncIterator[bytes]:
+    """Relay upstream as coalesced SSE frames; see StreamRelay for options."""
+    return StreamRelay(upstream, **options).frames()
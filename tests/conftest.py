@@ -0,0 +1,70 @@
+"""Shared fixtures: a temporary SQLite stand-in for the backend tables and managers at any version."""
+
+import contextlib
+import logging
+import sys
+from pathlib import Path
+
+import pytest
+import structlog
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+for path in (PLUGIN_DIR, PLUGIN_DIR / 'benchmarks'):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+import lifecycle_manager  # noqa: E402
+from bench_common import BACKEND_SCHEMA  # noqa: E402
+import session_store  # noqa: E402
+from lifecycle_manager import BrainDriveWhyDetectorLifecycleManager  # noqa: E402
+
+structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.CRITICAL))
+
+@contextlib.asynccontextmanager
+async def _open_database(path: Path):
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        for statement in BACKEND_SCHEMA:
+            await conn.execute(text(statement))
+    try:
+        yield async_sessionmaker(engine, expire_on_commit=False)
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture(autouse=True)
+def _fresh_lifecycle_state():
+    lifecycle_manager.clear_lifecycle_managers()
+    BrainDriveWhyDetectorLifecycleManager.invalidate_health_cache()
+    session_store.get_session_store().forget_users(None)
+    yield
+    lifecycle_manager.clear_lifecycle_managers()
+    BrainDriveWhyDetectorLifecycleManager.invalidate_health_cache()
+    session_store.get_session_store().forget_users(None)
+
+
+@pytest.fixture
+def plugins_base_dir(tmp_path):
+    return tmp_path / 'plugins'
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Call inside a coroutine: async with database() as sessions: async with sessions() as db: ..."""
+    return lambda: _open_database(tmp_path / 'backend.sqlite')
+
+
+@pytest.fixture
+def make_manager(plugins_base_dir):
+    """Build a lifecycle manager that installs the given plugin version."""
+    def make(version=None):
+        manager = BrainDriveWhyDetectorLifecycleManager(str(plugins_base_dir))
+        if version is not None:
+            manager.plugin_data = dict(manager.plugin_data, version=version)
+            manager.version = version
+            manager.shared_path = manager.shared_path.parent / f"v{version}"
+        return manager
+    return make
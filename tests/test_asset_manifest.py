@@ -0,0 +1,53 @@
+import asyncio
+import json
+
+from lifecycle_manager import BrainDriveWhyDetectorLifecycleManager as Manager
+
+
+def test_only_content_hashed_names_are_immutable():
+    assert Manager._cache_control('dist/main.3f2a9c1b.js') == Manager.IMMUTABLE_CACHE_CONTROL
+    assert Manager._cache_control('dist/573-d41d8cd98f00b204.js') == Manager.IMMUTABLE_CACHE_CONTROL
+    assert Manager._cache_control('dist/417.3f2a9c1b.css') == Manager.IMMUTABLE_CACHE_CONTROL
+    for relative_path in ('dist/main.js', 'dist/573.js', 'dist/417.js', 'dist/remoteEntry.js',
+                          'dist/index.html', 'dist/573.js.LICENSE.txt'):
+        assert Manager._cache_control(relative_path) == 'no-cache', relative_path
+
+
+def _read_assets(manager):
+    with open(manager.shared_path / Manager.ASSET_MANIFEST_FILENAME) as f:
+        return json.load(f)
+
+
+def test_installed_chunks_without_hash_are_revalidated(make_manager):
+    async def scenario():
+        manager = make_manager()
+        result = await manager._copy_plugin_files_impl('a', manager.shared_path)
+        assert result['success'], result
+        manifest = _read_assets(manager)
+        assert manifest['format'] == Manager.ASSET_MANIFEST_FORMAT
+        for name in ('dist/main.js', 'dist/573.js', 'dist/417.js'):
+            asset = manifest['assets'][name]
+            assert asset['cache_control'] == 'no-cache'
+            assert asset['etag'] == f'"{asset["sha256"][:32]}"'
+
+    asyncio.run(scenario())
+
+
+def test_outdated_asset_manifest_is_rewritten(make_manager):
+    async def scenario():
+        manager = make_manager()
+        assert (await manager._copy_plugin_files_impl('a', manager.shared_path))['success']
+        manifest = _read_assets(manager)
+        del manifest['format']
+        manifest['assets']['dist/main.js']['cache_control'] = Manager.IMMUTABLE_CACHE_CONTROL
+        with open(manager.shared_path / Manager.ASSET_MANIFEST_FILENAME, 'w') as f:
+            json.dump(manifest, f)
+
+        result = await manager._copy_plugin_files_impl('a', manager.shared_path)
+        assert result['success'] and not result['skipped']
+        assert result['copied_files'] == []
+        assert _read_assets(manager)['assets']['dist/main.js']['cache_control'] == 'no-cache'
+
+        assert (await manager._copy_plugin_files_impl('a', manager.shared_path))['skipped']
+
+    asyncio.run(scenario())
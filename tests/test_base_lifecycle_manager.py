@@ -0,0 +1,84 @@
+import json
+import shutil
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+
+_PROBE = """
+import json, os, sys
+searched = []
+isfile = os.path.isfile
+os.path.isfile = lambda path: searched.append(path) or isfile(path)
+import lifecycle_manager
+state = {'searched_at_import': list(searched), 'sqlalchemy': 'sqlalchemy' in sys.modules}
+cls = lifecycle_manager._manager_class()
+base = lifecycle_manager.BaseLifecycleManager
+state.update(
+    listed='BrainDriveWhyDetectorLifecycleManager' in dir(lifecycle_manager),
+    same_class=lifecycle_manager.BrainDriveWhyDetectorLifecycleManager is cls,
+    subclass=issubclass(cls, base),
+    base_module=base.__module__,
+    registered=sys.modules.get(base.__module__) is not None,
+    helper=getattr(sys.modules[base.__module__], 'HELPER', None),
+)
+print(json.dumps(state))
+"""
+
+
+def _probe(plugin_dir):
+    output = subprocess.run(
+        [sys.executable, '-c', _PROBE], cwd=plugin_dir, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def _backend(root, package):
+    plugins = root / 'backend' / 'app' / 'plugins'
+    plugins.mkdir(parents=True)
+    (plugins / 'lifecycle_helpers.py').write_text("HELPER = 'sibling'\n")
+    if package:
+        (root / 'backend' / 'app' / '__init__.py').write_text('')
+        (plugins / '__init__.py').write_text('')
+        helper_import = 'from .lifecycle_helpers import HELPER'
+    else:
+        helper_import = 'from lifecycle_helpers import HELPER'
+    (plugins / 'base_lifecycle_manager.py').write_text(textwrap.dedent(f"""
+        import sys
+        assert __name__ in sys.modules
+        {helper_import}
+
+
+        class BaseLifecycleManager:
+            def __init__(self, plugin_slug, version, shared_storage_path):
+                self.plugin_slug = plugin_slug
+                self.version = version
+                self.shared_path = shared_storage_path
+    """))
+
+
+def test_import_does_not_search_for_the_base_class():
+    state = _probe(PLUGIN_DIR)
+    assert state['searched_at_import'] == []
+    assert state['sqlalchemy'] is False
+    assert state['listed'] and state['same_class'] and state['subclass']
+
+
+@pytest.mark.parametrize('package', [True, False], ids=['relative', 'sibling'])
+def test_backend_base_class_resolves_its_own_imports(tmp_path, package):
+    plugin_dir = tmp_path / 'plugins' / 'BrainDriveWhyDetector'
+    plugin_dir.mkdir(parents=True)
+    shutil.copy(PLUGIN_DIR / 'lifecycle_manager.py', plugin_dir)
+    _backend(tmp_path, package)
+
+    state = _probe(plugin_dir)
+
+    assert state['searched_at_import'] == []
+    assert state['subclass'] and state['registered']
+    assert state['helper'] == 'sibling'
+    expected = 'app.plugins.base_lifecycle_manager' if package else 'base_lifecycle_manager'
+    assert state['base_module'] == expected
@@ -0,0 +1,46 @@
+import asyncio
+import random
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'benchmarks'))
+
+import bench_streaming  # noqa: E402
+
+
+@pytest.mark.parametrize('phase', bench_streaming.PHASES)
+def test_chat_request_builds_for_every_phase(phase):
+    request = bench_streaming.chat_request(0, phase)
+    assert request['conversation_type'] == 'whydetector'
+    assert request['messages'][-1]['role'] == 'user'
+
+
+def test_utf8_split_cuts_multibyte_sequences_only():
+    rng = random.Random(0)
+    ascii_event = bench_streaming.encode_event('openai', ' why')
+    assert bench_streaming.split_points(ascii_event, 'utf8', rng) == []
+
+    event = bench_streaming.encode_event('openai', ' café')
+    (offset,) = bench_streaming.split_points(event, 'utf8', rng)
+    with pytest.raises(UnicodeDecodeError):
+        event[:offset].decode('utf-8')
+
+
+def test_decoder_receives_whole_response_through_split_stream():
+    async def scenario():
+        server = bench_streaming.ProviderStandIn(
+            style='ollama', tokens=40, tokens_per_second=0, first_token_delay=0, split='utf8', split_delay=0
+        )
+        host, port = await server.start()
+        try:
+            return await bench_streaming.run_session(
+                host, port, bench_streaming.chat_request(0, 'energy_map'), 'decoder'
+            )
+        finally:
+            await server.close()
+
+    sample = asyncio.run(scenario())
+    assert sample['completeness'] == 1.0
+    assert sample['tokens'] == 40
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+
+async def _no_existing_installs(user_ids, db):
+    # Simulates installs that land between the existence check and the insert.
+    return {}
+
+
+@pytest.mark.parametrize('upsert', [True, False], ids=['upsert', 'executemany'])
+def test_bulk_install_reports_concurrently_installed_users(database, make_manager, upsert):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as db:
+                manager = make_manager()
+                manager.UPSERT_INSTALLS = upsert
+                manager.BULK_CHUNK_SIZE = 3
+                assert (await manager.install_plugin('c', db))['success']
+                manager._find_installed_users = _no_existing_installs
+
+                result = await manager.install_plugin_for_users(['a', 'b', 'c', 'd', 'e'], db)
+
+                assert result['success'], result
+                assert result['installed'] == 4
+                assert result['already_installed'] == 1
+                assert result['failed'] == 0
+                assert result['results']['c'] == {
+                    'success': False,
+                    'error': 'Plugin already installed for user',
+                    'plugin_id': 'c_BrainDriveWhyDetector'
+                }
+                for user_id in ('a', 'b', 'd', 'e'):
+                    assert result['results'][user_id]['modules_created'] == [
+                        f'{user_id}_BrainDriveWhyDetector_BrainDriveWhyDetector'
+                    ]
+
+                plugins = (await db.execute(text("SELECT user_id FROM plugin ORDER BY user_id"))).scalars().all()
+                modules = (await db.execute(text("SELECT user_id FROM module ORDER BY user_id"))).scalars().all()
+                assert plugins == ['a', 'b', 'c', 'd', 'e']
+                assert modules == ['a', 'b', 'c', 'd', 'e']
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize('upsert', [True, False], ids=['upsert', 'executemany'])
+def test_bulk_install_chunk_of_only_conflicts(database, make_manager, upsert):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as db:
+                manager = make_manager()
+                manager.UPSERT_INSTALLS = upsert
+                assert (await manager.install_plugin_for_users(['a', 'b'], db))['installed'] == 2
+                manager._find_installed_users = _no_existing_installs
+
+                result = await manager.install_plugin_for_users(['a', 'b'], db)
+
+                assert result['success'], result
+                assert (result['installed'], result['already_installed'], result['failed']) == (0, 2, 0)
+                count = (await db.execute(text("SELECT COUNT(*) FROM module"))).scalar()
+                assert count == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,48 @@
+import asyncio
+
+
+def _entries(manager):
+    return sorted(path.name for path in manager.shared_path.parent.iterdir() if path.name.startswith('v'))
+
+
+def test_unreferenced_versions_are_removed_with_their_lock_files(database, make_manager):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as db:
+                assert (await make_manager('1.0.1').install_plugin('a', db))['success']
+                assert (await make_manager('1.0.2').install_plugin('b', db))['success']
+                current = make_manager('1.0.3')
+                current.GC_GRACE_SECONDS = 0
+                assert _entries(current) == ['v1.0.1', 'v1.0.1.lock', 'v1.0.2', 'v1.0.2.lock']
+
+                result = await current.collect_garbage(db)
+                assert result == {'success': True, 'removed_versions': [], 'removed_blobs': 0, 'freed_bytes': 0}
+
+                assert (await current.update_plugin(db))['success']
+                result = await current.collect_garbage(db)
+
+                assert result['success'], result
+                assert result['removed_versions'] == ['v1.0.1', 'v1.0.2']
+                assert _entries(current) == ['v1.0.3', 'v1.0.3.lock']
+
+                # The next install of a collected version locks a fresh file.
+                assert (await make_manager('1.0.1').install_plugin('c', db))['success']
+                assert _entries(current) == ['v1.0.1', 'v1.0.1.lock', 'v1.0.3', 'v1.0.3.lock']
+
+    asyncio.run(scenario())
+
+
+def test_versions_within_the_grace_period_are_kept(database, make_manager):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as db:
+                assert (await make_manager('1.0.1').install_plugin('a', db))['success']
+                current = make_manager('1.0.3')
+                assert (await current.update_plugin(db))['success']
+
+                result = await current.collect_garbage(db)
+
+                assert result['success'] and result['removed_versions'] == []
+                assert _entries(current) == ['v1.0.1', 'v1.0.1.lock', 'v1.0.3', 'v1.0.3.lock']
+
+    asyncio.run(scenario())
@@ -0,0 +1,135 @@
+import session_store
+from context_assembler import COACH_SYSTEM_PROMPT, MESSAGE_OVERHEAD_TOKENS, START_SESSION, ContextAssembler
+
+
+class _CountingCounter:
+    """One token per word, remembering every text it was asked to count."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, text):
+        self.calls.append(text)
+        return len(text.split())
+
+
+def _message(sender, words):
+    return {'sender': sender, 'content': ' '.join([sender] * words)}
+
+
+def _cost(words):
+    return words + MESSAGE_OVERHEAD_TOKENS
+
+
+def test_history_fills_the_budget_newest_first():
+    assembler = ContextAssembler(counter=_CountingCounter())
+    session_data = session_store.empty_session_data()
+    _, prompt_tokens = assembler.render_prompts('snapshot', session_data)
+    history = [_message('user', 50), _message('coach', 30), _message('user', 5), _message('coach', 10)]
+
+    # Room for the new message and the two newest entries, not for the 30-word one.
+    budget = prompt_tokens + _cost(2) + _cost(10) + _cost(5) + _cost(30) - 1
+    result = assembler.assemble('snapshot', session_data, history, 'hello there', token_budget=budget)
+
+    messages = result['messages']
+    assert messages[0] == {'role': 'system', 'content': COACH_SYSTEM_PROMPT}
+    assert messages[1]['content'].startswith('[Current Phase: SNAPSHOT]')
+    assert [message['role'] for message in messages[2:]] == ['user', 'assistant', 'user']
+    assert messages[2:4] == [{'role': 'user', 'content': history[2]['content']},
+                             {'role': 'assistant', 'content': history[3]['content']}]
+    assert messages[-1] == {'role': 'user', 'content': 'hello there'}
+    assert (result['history_included'], result['history_dropped']) == (2, 2)
+    assert result['tokens'] == prompt_tokens + _cost(2) + _cost(10) + _cost(5)
+    assert result['over_budget'] is False
+
+
+def test_older_messages_are_dropped_once_one_does_not_fit():
+    assembler = ContextAssembler(counter=_CountingCounter())
+    session_data = session_store.empty_session_data()
+    _, prompt_tokens = assembler.render_prompts('intro', session_data)
+    history = [_message('user', 1), _message('coach', 100), _message('user', 1)]
+
+    result = assembler.assemble('intro', session_data, history, START_SESSION,
+                                token_budget=prompt_tokens + _cost(1) + _cost(1))
+
+    assert result['history_included'] == 1
+    assert result['messages'][-1]['content'] == history[-1]['content']
+
+
+def test_prompts_are_kept_even_over_budget():
+    assembler = ContextAssembler(counter=_CountingCounter())
+    result = assembler.assemble('intro', session_store.empty_session_data(), [_message('user', 1)],
+                                'hi', token_budget=10)
+
+    assert [message['role'] for message in result['messages']] == ['system', 'system', 'user']
+    assert result['history_included'] == 0
+    assert result['over_budget'] is True
+
+
+def test_message_tokens_are_counted_once_per_content():
+    counter = _CountingCounter()
+    assembler = ContextAssembler(counter=counter)
+    history = [_message('user', 3), _message('coach', 4)]
+    session_data = session_store.empty_session_data()
+
+    assembler.assemble('intro', session_data, history, 'next')
+    counted = len(counter.calls)
+    assembler.assemble('intro', session_data, history + [_message('user', 2)], 'next')
+    assert counter.calls[counted:] == [_message('user', 2)['content']]
+
+
+def test_token_cache_evicts_the_least_recently_used_content():
+    counter = _CountingCounter()
+    assembler = ContextAssembler(counter=counter, cache_size=2)
+    for content in ('one', 'two', 'one', 'three', 'one', 'two'):
+        assembler.message_tokens(content)
+
+    assert counter.calls[1:] == ['one', 'two', 'three', 'two']
+
+
+def test_phase_prompt_is_rendered_once_per_fingerprint():
+    counter = _CountingCounter()
+    assembler = ContextAssembler(counter=counter)
+    session_data = session_store.empty_session_data()
+    session_data['energizers'] = ['teaching']
+
+    first, _ = assembler.render_prompts('energy_map', session_data)
+    counted = len(counter.calls)
+    # energy_map reads only the energizer and drainer counts.
+    session_data['whyStatement'] = 'To help so that others grow'
+    session_data['energizers'] = ['mentoring']
+    assert assembler.render_prompts('energy_map', session_data)[0] is first
+    assert len(counter.calls) == counted
+
+    session_data['drainers'] = ['meetings']
+    second, _ = assembler.render_prompts('energy_map', session_data)
+    assert second is not first
+    assert 'Drainers found: 1/3 minimum' in second[1]['content']
+
+
+def test_returned_messages_do_not_share_the_cached_prompts():
+    assembler = ContextAssembler(counter=_CountingCounter())
+    session_data = session_store.empty_session_data()
+
+    result = assembler.assemble('snapshot', session_data, [])
+    result['messages'][0]['content'] = 'changed'
+
+    assert assembler.assemble('snapshot', session_data, [])['messages'][0]['content'] == COACH_SYSTEM_PROMPT
+
+
+def test_assemble_from_session():
+    assembler = ContextAssembler(counter=_CountingCounter())
+    session = session_store.new_session('s1')
+    for seq, (kind, payload) in enumerate([
+        session_store.phase_record('deep_stories'),
+        session_store.data_record('stories', 'the science fair'),
+        session_store.message_record('user', 'I was proud', timestamp='t'),
+        session_store.message_record('coach', 'Tell me more', timestamp='t'),
+    ], start=1):
+        session_store.apply_record(session, seq, kind, payload)
+
+    result = assembler.assemble_from_session(session, 'It was about teamwork')
+
+    assert 'Stories collected: 1' in result['messages'][1]['content']
+    assert [message['role'] for message in result['messages'][2:]] == ['user', 'assistant', 'user']
+    assert result['history_included'] == 2
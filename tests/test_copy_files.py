@@ -0,0 +1,83 @@
+import asyncio
+import hashlib
+import json
+import os
+
+import lifecycle_manager
+from lifecycle_manager import BrainDriveWhyDetectorLifecycleManager as Manager, IntegrityVerifier
+
+ASSET = 'dist/main.js'
+
+
+def _sha256(path):
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _write_in_place(path, keep_mtime=False):
+    """Overwrite the first bytes of path without changing its size or inode."""
+    stat = path.stat()
+    with open(path, 'r+b') as f:
+        f.write(b'/* tampered */')
+    if keep_mtime:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    else:
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def _blob(manager, sha256):
+    return manager._blob_path(manager.shared_path.parent / Manager.OBJECT_STORE_DIRNAME, sha256)
+
+
+def test_unchanged_copy_is_skipped(make_manager):
+    async def scenario():
+        manager = make_manager()
+        assert not (await manager._copy_plugin_files_impl('a', manager.shared_path))['skipped']
+        assert (await manager._copy_plugin_files_impl('a', manager.shared_path))['skipped']
+
+    asyncio.run(scenario())
+
+
+def test_same_size_edit_of_a_shared_file_is_restored(make_manager):
+    async def scenario():
+        manager = make_manager()
+        assert (await manager._copy_plugin_files_impl('a', manager.shared_path))['success']
+        with open(manager.shared_path / Manager.MANIFEST_FILENAME) as f:
+            expected = json.load(f)['files'][ASSET]['sha256']
+        target = manager.shared_path / ASSET
+        _write_in_place(target)
+        assert _sha256(_blob(manager, expected)) != expected
+
+        result = await manager._copy_plugin_files_impl('a', manager.shared_path)
+
+        assert result['success'] and not result['skipped']
+        assert result['copied_files'] == [ASSET]
+        assert _sha256(target) == expected
+        assert _sha256(_blob(manager, expected)) == expected
+        assert os.path.samefile(target, _blob(manager, expected))
+        assert (await manager._copy_plugin_files_impl('a', manager.shared_path))['skipped']
+
+    asyncio.run(scenario())
+
+
+def test_files_the_verifier_found_corrupt_are_restored(make_manager, monkeypatch):
+    async def scenario():
+        manager = make_manager()
+        verifier = IntegrityVerifier(manager.shared_path.parent, Manager.MANIFEST_FILENAME,
+                                     max_bytes_per_second=0, cpu_fraction=1)
+        monkeypatch.setitem(lifecycle_manager._integrity_verifiers, str(manager.shared_path.parent), verifier)
+        assert (await manager._copy_plugin_files_impl('a', manager.shared_path))['success']
+        target = manager.shared_path / ASSET
+        expected = _sha256(target)
+        # A write that keeps size, inode and mtime: only hashing notices it.
+        _write_in_place(target, keep_mtime=True)
+        assert (await manager._copy_plugin_files_impl('a', manager.shared_path))['skipped']
+
+        assert verifier.verify_directory(manager.shared_path)['mismatched'] == [ASSET]
+        result = await manager._copy_plugin_files_impl('a', manager.shared_path)
+
+        assert result['copied_files'] == [ASSET]
+        assert _sha256(target) == expected
+        assert _sha256(_blob(manager, expected)) == expected
+        assert verifier.verify_directory(manager.shared_path)['status'] == 'ok'
+
+    asyncio.run(scenario())
@@ -0,0 +1,43 @@
+import random
+
+from crisis_detector import CRISIS_KEYWORDS, CrisisDetector, normalize_text
+
+
+def test_matches_normalized_keywords_like_includes():
+    detector = CrisisDetector()
+    assert [match.keyword for match in detector.scan('I want to KILL-Myself!')] == ['kill myself']
+    assert [match.keyword for match in detector.scan('  thoughts of  Self Harm')] == ['self-harm']
+    assert [match.keyword for match in detector.scan('Suicidé')] == ['suicide']
+    assert detector.contains_crisis_content('nothing to see here') is False
+
+
+def test_overlapping_keywords_are_all_reported():
+    detector = CrisisDetector(['he', 'she', 'hers', 'his'])
+    assert sorted(match.keyword for match in detector.scan('ushers')) == ['he', 'hers', 'she']
+
+
+def test_stream_finds_keywords_split_across_chunks():
+    rng = random.Random(0)
+    detector = CrisisDetector()
+    text = "Lately I feel there is no reason to live, and I'd be better off... DEAD."
+    expected = detector.scan(text)
+    assert [match.keyword for match in expected] == ['no reason to live', 'better off dead']
+
+    for _ in range(50):
+        cuts = sorted(rng.sample(range(1, len(text)), 6))
+        scanner = detector.stream()
+        for start, end in zip([0] + cuts, cuts + [len(text)]):
+            scanner.feed(text[start:end])
+        assert scanner.matches == expected
+
+
+def test_agrees_with_substring_search_on_normalized_text():
+    rng = random.Random(1)
+    detector = CrisisDetector()
+    words = ['i', 'want', 'to', 'die', 'end', 'my', 'life', 'hurt', 'myself', 'self', 'harm', 'fine', '-', '!']
+    for _ in range(200):
+        text = ' '.join(rng.choice(words) for _ in range(12))
+        normalized = normalize_text(text)
+        expected = sorted(keyword for keyword in CRISIS_KEYWORDS
+                          for _ in range(normalized.count(normalize_text(keyword))))
+        assert sorted(match.keyword for match in detector.scan(text)) == expected, text
@@ -0,0 +1,60 @@
+import asyncio
+import os
+import threading
+import time
+
+from lifecycle_manager import (
+    _IO_MAX_WORKERS, _acquire_file_lock, _exclusive_file_lock, _release_file_lock, _remove_lock_file, _run_io
+)
+
+
+async def _contend(lock_path, holders, log):
+    async def hold(name):
+        async with _exclusive_file_lock(lock_path):
+            holders.append(name)
+            assert len(holders) == 1
+            await asyncio.sleep(0.01)
+            holders.remove(name)
+            log.append(name)
+
+    await asyncio.gather(*(hold(index) for index in range(4)))
+
+
+def test_lock_is_exclusive_and_usable_from_several_event_loops(tmp_path):
+    lock_path = tmp_path / 'v1.0.3.lock'
+    for _ in range(2):
+        log = []
+        asyncio.run(_contend(lock_path, [], log))
+        assert sorted(log) == [0, 1, 2, 3]
+
+
+def test_waiters_do_not_starve_the_io_pool(tmp_path):
+    # Holders need an I/O pool thread; more waiters than pool threads must not deadlock.
+    async def scenario():
+        async def hold():
+            async with _exclusive_file_lock(tmp_path / 'v1.0.3.lock'):
+                await _run_io(time.sleep, 0.001)
+
+        await asyncio.wait_for(asyncio.gather(*(hold() for _ in range(3 * _IO_MAX_WORKERS))), 10)
+
+    asyncio.run(scenario())
+
+
+def test_waiter_relocks_when_the_holder_removes_the_file(tmp_path):
+    lock_path = tmp_path / 'v1.0.3.lock'
+    holder = _acquire_file_lock(lock_path)
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(_acquire_file_lock(lock_path)))
+    waiter.start()
+    time.sleep(0.05)
+    assert acquired == []
+
+    _remove_lock_file(lock_path)
+    _release_file_lock(holder)
+    waiter.join(5)
+
+    (lock_file,) = acquired
+    try:
+        assert os.fstat(lock_file.fileno()).st_ino == os.stat(lock_path).st_ino
+    finally:
+        _release_file_lock(lock_file)
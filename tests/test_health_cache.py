@@ -0,0 +1,75 @@
+import asyncio
+import os
+
+import lifecycle_manager
+
+BUNDLE = 'dist/remoteEntry.js'
+
+
+def _health_checks():
+    counters = lifecycle_manager.get_lifecycle_metrics().snapshot()['counters']
+    return {
+        entry['labels']['cache']: entry['value']
+        for entry in counters.get('whydetector_health_checks_total', [])
+    }
+
+
+def _checks_since(before):
+    after = _health_checks()
+    return {cache: after[cache] - before.get(cache, 0) for cache in after if after[cache] != before.get(cache, 0)}
+
+
+async def _installed(make_manager):
+    manager = make_manager()
+    assert (await manager._copy_plugin_files_impl('a', manager.shared_path))['success']
+    return manager
+
+
+def test_cached_health_is_not_shared_with_callers(make_manager):
+    async def scenario():
+        manager = await _installed(make_manager)
+        first = await manager._get_plugin_health_impl('a', manager.shared_path)
+        assert first['healthy'] and first['details']['chunks']
+        chunks = first['details']['chunks']
+        before = _health_checks()
+
+        chunks.clear()
+        first['details']['bundle_total'].clear()
+        second = await manager._get_plugin_health_impl('a', manager.shared_path)
+
+        assert _checks_since(before) == {'hit': 1}
+        assert second['details']['chunks'] and second['details']['bundle_total']
+        assert second['details']['chunks'] is not chunks
+
+    asyncio.run(scenario())
+
+
+def test_expired_entry_is_revalidated_by_signature(make_manager):
+    async def scenario():
+        manager = await _installed(make_manager)
+        manager.HEALTH_CACHE_TTL = 0
+        await manager._get_plugin_health_impl('a', manager.shared_path)
+        before = _health_checks()
+
+        await manager._get_plugin_health_impl('a', manager.shared_path)
+
+        assert _checks_since(before) == {'revalidated': 1}
+
+    asyncio.run(scenario())
+
+
+def test_changed_bundle_invalidates_the_entry(make_manager):
+    async def scenario():
+        manager = await _installed(make_manager)
+        manager.HEALTH_CACHE_TTL = 0
+        await manager._get_plugin_health_impl('a', manager.shared_path)
+        bundle = manager.shared_path / BUNDLE
+        stat = bundle.stat()
+        os.utime(bundle, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        before = _health_checks()
+
+        await manager._get_plugin_health_impl('a', manager.shared_path)
+
+        assert _checks_since(before) == {'miss': 1}
+
+    asyncio.run(scenario())
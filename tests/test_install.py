@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+
+
+async def _not_installed(user_id, db):
+    # Simulates an install that lands between the existence check and the insert.
+    return {'exists': False}
+
+
+async def _counts(db):
+    plugins = (await db.execute(text("SELECT COUNT(*) FROM plugin"))).scalar()
+    modules = (await db.execute(text("SELECT COUNT(*) FROM module"))).scalar()
+    return plugins, modules
+
+
+@pytest.mark.parametrize('upsert', [True, False], ids=['upsert', 'insert'])
+def test_repeated_install_is_reported_without_new_rows(database, make_manager, upsert):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as db:
+                manager = make_manager()
+                manager.UPSERT_INSTALLS = upsert
+                first = await manager.install_plugin('a', db)
+                assert first['success'], first
+                assert first['modules_created'] == ['a_BrainDriveWhyDetector_BrainDriveWhyDetector']
+
+                again = await manager.install_plugin('a', db)
+
+                assert again == {
+                    'success': False,
+                    'error': 'Plugin already installed for user',
+                    'plugin_id': 'a_BrainDriveWhyDetector'
+                }
+                assert await _counts(db) == (1, 1)
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.parametrize('upsert', [True, False], ids=['upsert', 'insert'])
+def test_install_under_another_id_is_found_before_copying(database, make_manager, upsert):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as db:
+                manager = make_manager()
+                manager.UPSERT_INSTALLS = upsert
+                assert (await manager.install_plugin('a', db))['success']
+                await db.execute(text("UPDATE plugin SET id = 'legacy-id' WHERE user_id = 'a'"))
+                await db.commit()
+
+                async def no_copy(user_id, target_dir):
+                    raise AssertionError('files copied for an installed user')
+
+                manager._copy_plugin_files_impl = no_copy
+                result = await manager.install_plugin('a', db)
+
+                assert result['error'] == 'Plugin already installed for user'
+                assert result['plugin_id'] == 'legacy-id'
+                assert await _counts(db) == (1, 1)
+
+    asyncio.run(scenario())
+
+
+def test_upsert_reports_an_install_by_another_worker(database, make_manager):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as db:
+                assert (await make_manager().install_plugin('a', db))['success']
+                manager = make_manager()
+                manager._check_existing_plugin = _not_installed
+
+                result = await manager.install_plugin('a', db)
+
+                assert result == {
+                    'success': False,
+                    'error': 'Plugin already installed for user',
+                    'plugin_id': 'a_BrainDriveWhyDetector'
+                }
+                assert await _counts(db) == (1, 1)
+
+    asyncio.run(scenario())
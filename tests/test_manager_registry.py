@@ -0,0 +1,68 @@
+import asyncio
+
+from sqlalchemy import text
+
+import lifecycle_manager
+
+
+async def _delete_rows(db, user_id):
+    # Another worker, or an admin, removes the install behind this process's back.
+    await db.execute(text("DELETE FROM module WHERE user_id = :user_id"), {'user_id': user_id})
+    await db.execute(text("DELETE FROM plugin WHERE user_id = :user_id"), {'user_id': user_id})
+    await db.commit()
+
+
+def test_registry_returns_one_manager_per_directory(plugins_base_dir, tmp_path):
+    manager = lifecycle_manager.get_lifecycle_manager(str(plugins_base_dir))
+    assert lifecycle_manager.get_lifecycle_manager(str(plugins_base_dir)) is manager
+    assert lifecycle_manager.get_lifecycle_manager(str(tmp_path / 'other')) is not manager
+
+
+def test_reinstall_after_rows_were_deleted_elsewhere(database, plugins_base_dir):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as db:
+                manager = lifecycle_manager.get_lifecycle_manager(str(plugins_base_dir))
+                assert (await manager.install_plugin('a', db))['success']
+                await _delete_rows(db, 'a')
+
+                status = await lifecycle_manager.get_plugin_status('a', db, str(plugins_base_dir))
+                assert status['status'] == 'not_installed'
+                result = await lifecycle_manager.install_plugin('a', db, str(plugins_base_dir))
+
+                assert result['success'], result
+                status = await lifecycle_manager.get_plugin_status('a', db, str(plugins_base_dir))
+                assert status['status'] == 'healthy'
+
+    asyncio.run(scenario())
+
+
+def test_reinstall_after_delete_elsewhere_without_a_status_call(database, plugins_base_dir):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as db:
+                manager = lifecycle_manager.get_lifecycle_manager(str(plugins_base_dir))
+                assert (await manager.install_plugin('a', db))['success']
+                await _delete_rows(db, 'a')
+
+                assert (await manager.install_plugin('a', db))['success']
+
+    asyncio.run(scenario())
+
+
+def test_delete_of_an_install_made_by_another_worker(database, make_manager, plugins_base_dir):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as db:
+                assert (await make_manager().install_plugin('a', db))['success']
+                manager = lifecycle_manager.get_lifecycle_manager(str(plugins_base_dir))
+
+                result = await manager.delete_plugin('a', db)
+
+                assert result['success'], result
+                assert manager.active_users == set()
+                assert (await manager.delete_plugin('a', db)) == {
+                    'success': False, 'error': 'Plugin not found for user'
+                }
+
+    asyncio.run(scenario())
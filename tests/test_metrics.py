@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+import lifecycle_manager
+from lifecycle_manager import InProcessMetricsRegistry
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    registry = InProcessMetricsRegistry(buckets=(0.5, 30.0))
+    monkeypatch.setattr(lifecycle_manager, '_lifecycle_metrics', registry)
+    return registry
+
+
+def _series(snapshot, kind, name):
+    return {tuple(sorted(entry['labels'].items())): entry for entry in snapshot[kind].get(name, [])}
+
+
+def test_delete_observes_each_phase_once(database, make_manager, metrics):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as db:
+                manager = make_manager()
+                assert (await manager.install_plugin('a', db))['success']
+                metrics.reset()
+
+                assert (await manager.delete_plugin('a', db))['success']
+
+    asyncio.run(scenario())
+    phases = _series(metrics.snapshot(), 'histograms', 'whydetector_lifecycle_phase_seconds')
+    assert {labels: entry['count'] for labels, entry in phases.items()} == {
+        (('phase', 'existence_check'),): 2,
+        (('phase', 'delete'),): 1,
+        (('phase', 'commit'),): 1,
+    }
+    operations = _series(metrics.snapshot(), 'counters', 'whydetector_lifecycle_operations_total')
+    assert [entry['value'] for entry in operations.values()] == [1]
+
+
+def test_prometheus_export(metrics):
+    metrics.observe('whydetector_lifecycle_phase_seconds', 0.25, {'phase': 'insert'})
+    metrics.observe('whydetector_lifecycle_phase_seconds', 2.0, {'phase': 'insert'})
+    metrics.inc('whydetector_copy_files_total', 3)
+    metrics.inc('whydetector_health_checks_total', 1, {'cache': 'a "quoted"\nvalue'})
+
+    assert metrics.render_prometheus().splitlines() == [
+        '# HELP whydetector_lifecycle_phase_seconds Duration of individual lifecycle phases.',
+        '# TYPE whydetector_lifecycle_phase_seconds histogram',
+        'whydetector_lifecycle_phase_seconds_bucket{phase="insert",le="0.5"} 1',
+        'whydetector_lifecycle_phase_seconds_bucket{phase="insert",le="30.0"} 2',
+        'whydetector_lifecycle_phase_seconds_bucket{phase="insert",le="+Inf"} 2',
+        'whydetector_lifecycle_phase_seconds_sum{phase="insert"} 2.25',
+        'whydetector_lifecycle_phase_seconds_count{phase="insert"} 2',
+        '# HELP whydetector_copy_files_total Files written to shared plugin directories.',
+        '# TYPE whydetector_copy_files_total counter',
+        'whydetector_copy_files_total 3',
+        '# HELP whydetector_health_checks_total Plugin health lookups by cache result.',
+        '# TYPE whydetector_health_checks_total counter',
+        'whydetector_health_checks_total{cache="a \\"quoted\\"\\nvalue"} 1',
+    ]
+
+
+def test_status_many_observes_one_existence_check_per_chunk(database, make_manager, metrics):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as db:
+                manager = make_manager()
+                manager.BULK_CHUNK_SIZE = 2
+                assert (await manager.install_plugin_for_users(['a', 'b', 'c'], db))['installed'] == 3
+                metrics.reset()
+
+                return await manager.get_plugin_status_many(['a', 'b', 'c', 'd', 'e'], db)
+
+    result = asyncio.run(scenario())
+    assert {user_id: status['status'] for user_id, status in result['results'].items()} == {
+        'a': 'healthy', 'b': 'healthy', 'c': 'healthy', 'd': 'not_installed', 'e': 'not_installed'
+    }
+    phases = _series(metrics.snapshot(), 'histograms', 'whydetector_lifecycle_phase_seconds')
+    assert phases[(('phase', 'existence_check'),)]['count'] == 3
@@ -0,0 +1,181 @@
+import asyncio
+
+from model_catalog import ModelCatalogCache, normalize_models
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class _Provider:
+    """Fetcher that counts calls and can be held open or made to fail."""
+
+    def __init__(self):
+        self.calls = []
+        self.release = None
+        self.error = None
+        self.version = 0
+
+    async def __call__(self, user_id, provider):
+        self.calls.append((user_id, provider))
+        if self.release is not None:
+            await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        self.version += 1
+        return {'models': [{'name': f'llama-{self.version}', 'provider': provider or 'ollama',
+                            'server_id': 's1', 'server_name': 'Local'}]}
+
+
+def _names(result):
+    return [model['name'] for model in result['models']]
+
+
+def test_normalize_models_maps_provider_listings():
+    assert normalize_models({'data': {'models': [{'id': 'gpt-4o', 'provider': 'openai'}]}}) == [{
+        'name': 'gpt-4o', 'provider': 'openai', 'providerId': 'openai_api_settings',
+        'serverName': 'Unknown Server', 'serverId': 'unknown'
+    }]
+    assert normalize_models([{'name': 'llama3', 'serverId': 'x'}, 'junk'])[0]['providerId'] == 'ollama_servers_settings'
+    assert normalize_models({'error': 'down'}) == []
+
+
+def test_fresh_stale_and_expired_entries():
+    async def scenario():
+        clock, provider = _Clock(), _Provider()
+        cache = ModelCatalogCache(provider, ttl=10, stale_ttl=100, clock=clock)
+
+        first = await cache.get('a')
+        assert (first['source'], _names(first)) == ('fetched', ['llama-1'])
+
+        clock.now += 5
+        assert (await cache.get('a'))['source'] == 'cache'
+        assert provider.calls == [('a', None)]
+
+        clock.now += 10
+        stale = await cache.get('a')
+        assert (stale['source'], _names(stale), stale['age_seconds']) == ('stale', ['llama-1'], 15)
+        await asyncio.sleep(0)
+        assert _names(await cache.get('a')) == ['llama-2']
+        assert len(provider.calls) == 2
+
+        clock.now += 200
+        expired = await cache.get('a')
+        assert (expired['source'], _names(expired)) == ('fetched', ['llama-3'])
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_mounts_share_one_fetch():
+    async def scenario():
+        provider = _Provider()
+        provider.release = asyncio.Event()
+        cache = ModelCatalogCache(provider, clock=_Clock())
+
+        waiting = [asyncio.ensure_future(cache.get('a')) for _ in range(5)]
+        await asyncio.sleep(0)
+        provider.release.set()
+        results = await asyncio.gather(*waiting)
+
+        assert provider.calls == [('a', None)]
+        assert cache.fetches == 1
+        assert all(_names(result) == ['llama-1'] for result in results)
+        # Results are copies: one caller's change is not seen by the next.
+        results[0]['models'][0]['name'] = 'changed'
+        assert _names(await cache.get('a')) == ['llama-1']
+
+    asyncio.run(scenario())
+
+
+def test_a_caller_that_gives_up_does_not_cancel_the_shared_fetch():
+    async def scenario():
+        provider = _Provider()
+        provider.release = asyncio.Event()
+        cache = ModelCatalogCache(provider, clock=_Clock())
+
+        impatient = asyncio.ensure_future(cache.get('a'))
+        patient = asyncio.ensure_future(cache.get('a'))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        provider.release.set()
+
+        assert _names(await patient) == ['llama-1']
+        assert len(provider.calls) == 1
+
+    asyncio.run(scenario())
+
+
+def test_failed_refresh_serves_the_last_list_with_the_error():
+    async def scenario():
+        clock, provider = _Clock(), _Provider()
+        cache = ModelCatalogCache(provider, ttl=10, stale_ttl=0, clock=clock)
+        assert (await cache.get('a'))['success']
+
+        clock.now += 20
+        provider.error = ConnectionError('ollama down')
+        result = await cache.get('a')
+        assert (result['success'], result['source'], result['error']) == (True, 'stale', 'ollama down')
+        assert _names(result) == ['llama-1']
+
+        assert await cache.get('b') == {'success': False, 'models': [], 'error': 'ollama down'}
+
+    asyncio.run(scenario())
+
+
+def test_get_many_merges_providers_and_reports_errors():
+    async def scenario():
+        provider = _Provider()
+        cache = ModelCatalogCache(provider, clock=_Clock())
+        assert (await cache.get('a', 'openai'))['success']
+        provider.error = ConnectionError('no key')
+
+        result = await cache.get_many('a', ['openai', 'anthropic', 'openai'])
+
+        assert result['success'] is False
+        assert [model['provider'] for model in result['models']] == ['openai']
+        assert result['errors'] == {'anthropic': 'no key'}
+
+    asyncio.run(scenario())
+
+
+def test_invalidate_and_eviction():
+    async def scenario():
+        provider = _Provider()
+        cache = ModelCatalogCache(provider, max_entries=2, clock=_Clock())
+        for user_id in ('a', 'b'):
+            await cache.get(user_id)
+        await cache.get('a')
+        await cache.get('c')
+        await cache.get('a')
+        assert provider.calls == [('a', None), ('b', None), ('c', None)]
+
+        cache.invalidate('a')
+        await cache.get('a')
+        assert len(provider.calls) == 4
+
+        cache.invalidate()
+        await cache.get('c')
+        assert len(provider.calls) == 5
+
+    asyncio.run(scenario())
+
+
+def test_close_cancels_background_refreshes():
+    async def scenario():
+        clock, provider = _Clock(), _Provider()
+        cache = ModelCatalogCache(provider, ttl=10, clock=clock)
+        await cache.get('a')
+        provider.release = asyncio.Event()
+        clock.now += 20
+
+        assert (await cache.get('a'))['source'] == 'stale'
+        await asyncio.sleep(0)
+        await cache.close()
+
+        assert _names(await cache.get('a')) == ['llama-1']
+
+    asyncio.run(scenario())
@@ -0,0 +1,49 @@
+import asyncio
+
+from sqlalchemy import text
+
+
+async def _plugin_users(db):
+    return (await db.execute(text("SELECT user_id FROM plugin ORDER BY user_id"))).scalars().all()
+
+
+def test_purge_removes_every_install_in_batches(database, make_manager):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as db:
+                manager = make_manager()
+                manager.BULK_CHUNK_SIZE = 2
+                assert (await manager.install_plugin_for_users(['a', 'b', 'c', 'd', 'e'], db))['installed'] == 5
+
+                result = await manager.purge_all(db)
+
+                assert result['success'], result
+                assert (result['deleted'], result['deleted_modules']) == (5, 5)
+                assert await _plugin_users(db) == []
+                assert (await db.execute(text("SELECT COUNT(*) FROM module"))).scalar() == 0
+                assert manager.active_users == set()
+
+    asyncio.run(scenario())
+
+
+def test_purge_stops_on_rows_it_cannot_remove(database, make_manager):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as db:
+                manager = make_manager()
+                manager.BULK_CHUNK_SIZE = 2
+                assert (await manager.install_plugin_for_users(['a', 'b', 'c'], db))['installed'] == 3
+                await db.execute(text("UPDATE plugin SET user_id = NULL WHERE user_id = 'b'"))
+                await db.commit()
+
+                result = await asyncio.wait_for(manager.purge_all(db), 10)
+
+                assert result['success'] is False
+                assert result['error'] == 'Purge made no progress: 1 plugin rows could not be removed'
+                assert result['deleted'] == 2
+                assert result['results'][None] == {
+                    'success': False, 'error': 'Plugin row was not removed', 'plugin_id': 'b_BrainDriveWhyDetector'
+                }
+                assert await _plugin_users(db) == [None]
+
+    asyncio.run(scenario())
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import sqlite3
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'tools'))
+
+import rollout  # noqa: E402
+
+
+def _options(tmp_path, plugins_base_dir, **overrides):
+    options = {
+        'database_url': f"sqlite+aiosqlite:///{tmp_path / 'backend.sqlite'}",
+        'plugins_base_dir': str(plugins_base_dir),
+        'checkpoint': str(tmp_path / 'rollout.jsonl'),
+        'workers': 2,
+        'concurrency': 3,
+        'chunk_size': 2,
+        'rate': 0,
+        'burst': 2,
+        'skip_failed': False,
+        'report_interval': 0.1,
+        'verbose': False
+    }
+    options.update(overrides)
+    return options
+
+
+def _write_checkpoint(path, entries):
+    with open(path, 'w') as f:
+        for entry in entries:
+            f.write(json.dumps(entry) + '\n')
+
+
+def test_checkpoint_keeps_the_latest_status_and_skips_a_torn_line(tmp_path):
+    path = tmp_path / 'rollout.jsonl'
+    _write_checkpoint(path, [{'user_id': 'a', 'status': 'failed'}, {'user_id': 'b', 'status': 'installed'},
+                             {'user_id': 'a', 'status': 'installed'}])
+    with open(path, 'a') as f:
+        f.write('{"user_id": "c", "sta')
+
+    assert rollout.load_checkpoint(str(path)) == {'a': 'installed', 'b': 'installed'}
+    assert rollout.load_checkpoint(str(tmp_path / 'missing.jsonl')) == {}
+    assert rollout.load_checkpoint(None) == {}
+
+
+def test_resume_skips_done_users_and_retries_failed_ones(tmp_path, plugins_base_dir):
+    _write_checkpoint(tmp_path / 'rollout.jsonl', [
+        {'user_id': 'a', 'status': 'installed'},
+        {'user_id': 'b', 'status': 'already_installed'},
+        {'user_id': 'c', 'status': 'failed', 'error': 'database is locked'}
+    ])
+    users = ['a', 'b', 'c', 'd', 'd']
+
+    retry = rollout.Rollout(users, _options(tmp_path, plugins_base_dir))
+    assert (retry.pending, retry.skipped) == (['c', 'd'], 2)
+
+    skip = rollout.Rollout(users, _options(tmp_path, plugins_base_dir, skip_failed=True))
+    assert (skip.pending, skip.skipped) == (['d'], 2)
+
+
+def test_shards_are_stable_and_in_range():
+    users = [f'user-{number}' for number in range(200)]
+    shards = [rollout.shard_of(user_id, 3) for user_id in users]
+
+    assert set(shards) == {0, 1, 2}
+    assert shards == [rollout.shard_of(user_id, 3) for user_id in users]
+
+
+def test_rate_limiter_allows_a_burst_then_spaces_reservations():
+    limiter = rollout.GlobalRateLimiter(rate=10, burst=5)
+
+    assert limiter.reserve(5) == 0
+    assert 0.05 < limiter.reserve(1) <= 0.1
+    assert 0.5 < limiter.reserve(5) <= 0.6
+    assert rollout.GlobalRateLimiter(rate=0).reserve(1000) == 0
+
+
+def test_rollout_installs_each_user_once_across_runs(tmp_path, database, plugins_base_dir, make_manager):
+    async def prepare():
+        async with database() as sessions:
+            async with sessions() as db:
+                # Installed outside the rollout, so missing from the checkpoint.
+                assert (await make_manager().install_plugin('u3', db))['success']
+
+    asyncio.run(prepare())
+    first = rollout.Rollout([f'u{number}' for number in range(6)], _options(tmp_path, plugins_base_dir)).run()
+
+    assert (first['installed'], first['already_installed'], first['failed'], first['unprocessed']) == (5, 1, 0, 0)
+    assert first['workers'] == 2 and first['worker_errors'] == {}
+
+    second = rollout.Rollout([f'u{number}' for number in range(8)], _options(tmp_path, plugins_base_dir)).run()
+
+    assert (second['users_pending'], second['users_skipped']) == (2, 6)
+    assert (second['installed'], second['already_installed'], second['failed']) == (2, 0, 0)
+    with sqlite3.connect(tmp_path / 'backend.sqlite') as db:
+        plugins = [row[0] for row in db.execute("SELECT user_id FROM plugin ORDER BY user_id")]
+    assert plugins == [f'u{number}' for number in range(8)]
+    statuses = rollout.load_checkpoint(str(tmp_path / 'rollout.jsonl'))
+    assert statuses == dict({f'u{number}': 'installed' for number in range(8)}, u3='already_installed')
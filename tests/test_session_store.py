@@ -0,0 +1,182 @@
+import asyncio
+
+from sqlalchemy import text
+
+import lifecycle_manager
+import session_store
+from session_store import SessionStore, message_record, phase_record
+
+
+async def _create_schema(sessions):
+    async with sessions() as db:
+        await session_store.create_schema(db)
+        await db.commit()
+
+
+async def _seqs(sessions, user_id, session_id):
+    async with sessions() as db:
+        result = await db.execute(text(
+            f"SELECT seq FROM {session_store.SESSION_TABLE} "
+            "WHERE user_id = :user_id AND session_id = :session_id ORDER BY seq"
+        ), {'user_id': user_id, 'session_id': session_id})
+        return result.scalars().all()
+
+
+class _WriterBetweenReadAndInsert:
+    """Session proxy that lets another writer append right after the last-seq read."""
+
+    def __init__(self, db, other_writer):
+        self._db = db
+        self._other_writer = other_writer
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+    async def execute(self, statement, *args, **kwargs):
+        result = await self._db.execute(statement, *args, **kwargs)
+        if self._other_writer is not None and 'MAX(seq)' in str(statement):
+            other_writer, self._other_writer = self._other_writer, None
+            await other_writer()
+        return result
+
+
+def test_append_retries_when_another_writer_takes_the_seq(database):
+    async def scenario():
+        async with database() as sessions:
+            await _create_schema(sessions)
+            store, other_store = SessionStore(), SessionStore()
+
+            async def other_writer():
+                async with sessions() as other_db:
+                    result = await other_store.append(other_db, 'a', 's1', [phase_record('energy_map')])
+                    assert result == {'success': True, 'last_seq': 1}
+
+            async with sessions() as db:
+                result = await store.append(
+                    _WriterBetweenReadAndInsert(db, other_writer), 'a', 's1',
+                    [message_record('user', 'hello'), message_record('coach', 'hi')]
+                )
+
+            assert result == {'success': True, 'last_seq': 3}
+            assert await _seqs(sessions, 'a', 's1') == [1, 2, 3]
+            async with sessions() as db:
+                loaded = (await store.load(db, 'a', 's1'))['session']
+            assert loaded['phase'] == 'energy_map'
+            assert [message['content'] for message in loaded['messages']] == ['hello', 'hi']
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_appends_from_separate_stores(database):
+    async def scenario():
+        async with database() as sessions:
+            await _create_schema(sessions)
+            stores = [SessionStore() for _ in range(4)]
+
+            async def append(store, number):
+                async with sessions() as db:
+                    return await store.append(db, 'a', 's1', [message_record('user', f'message {number}')])
+
+            results = await asyncio.gather(*(append(store, number) for number, store in enumerate(stores)))
+
+            assert all(result['success'] for result in results), results
+            assert sorted(result['last_seq'] for result in results) == [1, 2, 3, 4]
+            assert await _seqs(sessions, 'a', 's1') == [1, 2, 3, 4]
+
+    asyncio.run(scenario())
+
+
+def test_append_gives_up_after_repeated_conflicts(database):
+    async def scenario():
+        async with database() as sessions:
+            await _create_schema(sessions)
+            store = SessionStore()
+            store.APPEND_ATTEMPTS = 1
+            other_store = SessionStore()
+
+            async def other_writer():
+                async with sessions() as other_db:
+                    await other_store.append(other_db, 'a', 's1', [phase_record('energy_map')])
+
+            async with sessions() as db:
+                result = await store.append(
+                    _WriterBetweenReadAndInsert(db, other_writer), 'a', 's1', [message_record('user', 'hello')]
+                )
+
+            assert result['success'] is False
+            assert await _seqs(sessions, 'a', 's1') == [1]
+
+    asyncio.run(scenario())
+
+
+def test_uninstall_forgets_the_shared_store_cache(database, make_manager):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as db:
+                manager = make_manager()
+                assert (await manager.install_plugin('a', db))['success']
+                store = session_store.get_session_store()
+                assert (await store.append(db, 'a', 's1', [message_record('user', 'before')]))['success']
+                assert (await store.load(db, 'a', 's1'))['exists']
+
+                assert (await manager.delete_plugin('a', db))['success']
+                assert (await store.load(db, 'a', 's1'))['exists'] is False
+
+                assert (await manager.install_plugin('a', db))['success']
+                assert (await store.append(db, 'a', 's1', [message_record('user', 'after')]))['last_seq'] == 1
+                loaded = (await store.load(db, 'a', 's1'))['session']
+
+            assert lifecycle_manager._session_store_module() is session_store
+            assert [message['content'] for message in loaded['messages']] == ['after']
+
+    asyncio.run(scenario())
+
+
+async def _delete_elsewhere(sessions, user_id):
+    # Another worker's delete: rows go, this process's cache is not told.
+    async with sessions() as other_db:
+        await other_db.execute(text(f"DELETE FROM {session_store.SESSION_TABLE} WHERE user_id = :user_id"),
+                               {'user_id': user_id})
+        await other_db.commit()
+
+
+def test_load_drops_a_cached_session_deleted_elsewhere(database):
+    async def scenario():
+        async with database() as sessions:
+            await _create_schema(sessions)
+            store = SessionStore()
+            async with sessions() as db:
+                await store.append(db, 'a', 's1', [message_record('user', 'one'), phase_record('energy_map')])
+                assert (await store.load(db, 'a', 's1'))['exists']
+
+                await _delete_elsewhere(sessions, 'a')
+                assert (await store.load(db, 'a', 's1'))['exists'] is False
+
+                await store.append(db, 'a', 's1', [message_record('user', 'two')])
+                loaded = (await store.load(db, 'a', 's1'))['session']
+
+            assert loaded['phase'] == 'intro'
+            assert [message['content'] for message in loaded['messages']] == ['two']
+
+    asyncio.run(scenario())
+
+
+def test_load_replays_a_session_restarted_elsewhere_with_as_many_records(database):
+    async def scenario():
+        async with database() as sessions:
+            await _create_schema(sessions)
+            store, other_store = SessionStore(), SessionStore()
+            async with sessions() as db:
+                await store.append(db, 'a', 's1', [message_record('user', 'hello', timestamp='t'),
+                                                   message_record('coach', 'old reply')])
+                assert (await store.load(db, 'a', 's1'))['exists']
+
+                await _delete_elsewhere(sessions, 'a')
+                async with sessions() as other_db:
+                    await other_store.append(other_db, 'a', 's1', [message_record('user', 'hello', timestamp='t'),
+                                                                   message_record('coach', 'new reply')])
+                loaded = (await store.load(db, 'a', 's1'))['session']
+
+            assert [message['content'] for message in loaded['messages']] == ['hello', 'new reply']
+
+    asyncio.run(scenario())
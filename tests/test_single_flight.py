@@ -0,0 +1,89 @@
+import asyncio
+
+import lifecycle_manager
+
+
+def _shared_total():
+    counters = lifecycle_manager.get_lifecycle_metrics().snapshot()['counters']
+    return sum(entry['value'] for entry in counters.get('whydetector_single_flight_shared_total', []))
+
+
+def _spy_existence_checks(manager, fail_for=None):
+    """Record the session of every existence check; raise for the session fail_for."""
+    original = manager._check_existing_plugin
+    calls = []
+
+    async def check(user_id, db):
+        calls.append(db)
+        await asyncio.sleep(0.05)
+        if db is fail_for:
+            raise RuntimeError('session is closed')
+        return await original(user_id, db)
+
+    manager._check_existing_plugin = check
+    return calls
+
+
+def test_status_calls_share_only_within_a_session(database, make_manager):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as setup:
+                manager = make_manager()
+                assert (await manager.install_plugin('a', setup))['success']
+            calls = _spy_existence_checks(manager)
+            shared_before = _shared_total()
+
+            async with sessions() as first, sessions() as second:
+                results = await asyncio.gather(
+                    manager.get_plugin_status('a', first),
+                    manager.get_plugin_status('a', first),
+                    manager.get_plugin_status('a', second),
+                )
+
+            assert [result['status'] for result in results] == ['healthy'] * 3
+            assert calls == [first, second]
+            assert _shared_total() - shared_before == 1
+
+    asyncio.run(scenario())
+
+
+def test_error_on_one_session_is_not_raised_in_another(database, make_manager):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as setup:
+                manager = make_manager()
+                assert (await manager.install_plugin('a', setup))['success']
+
+            async with sessions() as broken, sessions() as healthy:
+                _spy_existence_checks(manager, fail_for=broken)
+                failed, succeeded = await asyncio.gather(
+                    manager.get_plugin_status('a', broken),
+                    manager.get_plugin_status('a', healthy),
+                )
+
+            assert failed['status'] == 'error'
+            assert succeeded['status'] == 'healthy'
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_installs_on_separate_sessions_run_in_turn(database, make_manager):
+    async def scenario():
+        async with database() as sessions:
+            manager = make_manager()
+
+            async def install():
+                async with sessions() as db:
+                    return await manager.install_plugin('a', db)
+
+            results = await asyncio.gather(*(install() for _ in range(4)))
+
+            assert sum(1 for result in results if result['success']) == 1
+            assert all(
+                result['success'] or result['error'] == 'Plugin already installed for user'
+                for result in results
+            ), results
+            assert manager._in_flight == {}
+            assert manager._user_locks == {}
+
+    asyncio.run(scenario())
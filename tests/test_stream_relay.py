@@ -0,0 +1,139 @@
+import asyncio
+import json
+
+from stream_relay import DONE_FRAME, StreamDecoder, StreamRelay, extract_text, should_relay
+
+
+def _openai(text):
+    return f'data: {json.dumps({"choices": [{"delta": {"content": text}}]}, ensure_ascii=False)}\n\n'.encode('utf-8')
+
+
+def _ollama(text, done=False):
+    return (json.dumps({'message': {'content': text}, 'done': done}) + '\n').encode('utf-8')
+
+
+async def _chunks(*chunks, delay=0.0):
+    for chunk in chunks:
+        if delay:
+            await asyncio.sleep(delay)
+        yield chunk
+
+
+async def _collect(relay):
+    return [frame async for frame in relay]
+
+
+def _texts(frames):
+    assert frames[-1] == DONE_FRAME
+    return [json.loads(frame[len(b'data: '):]) for frame in frames[:-1]]
+
+
+def test_should_relay_only_whydetector_conversations():
+    assert should_relay({'conversation_type': 'whydetector'})
+    assert not should_relay({'conversation_type': 'chat'})
+    assert not should_relay({})
+
+
+def test_extract_text_matches_the_client_formats():
+    assert extract_text({'choices': [{'message': {'content': 'full'}}]}) == 'full'
+    assert extract_text({'choices': [{'delta': {'content': 'delta'}}]}) == 'delta'
+    assert extract_text({'message': {'content': 'ollama'}}) == 'ollama'
+    assert extract_text({'response': 'generate'}) == 'generate'
+    assert extract_text({'content': ['a']}) == '["a"]'
+    assert extract_text({'choices': [{'delta': {}}]}) == ''
+    assert extract_text(None) == ''
+
+
+def test_decoder_handles_chunks_split_inside_utf8_sequences():
+    stream = _openai(' café') + _openai(' naïve') + b'data: [DONE]\n\n' + _openai('after')
+    for split in range(1, len(stream)):
+        decoder = StreamDecoder()
+        events = decoder.feed(stream[:split]) + decoder.feed(stream[split:])
+        assert events == [(' café', False), (' naïve', False), ('', True)], split
+        assert decoder.done
+
+
+def test_decoder_reads_ndjson_multiline_events_and_skips_the_rest():
+    decoder = StreamDecoder()
+    events = decoder.feed(
+        ': keep-alive\n'
+        'event: message\n'
+        'data: {"text":\n'
+        'data: "joined"}\n'
+        '\n'
+        'data: {"broken"\n'
+        '\n'
+        + _ollama('one').decode()
+    )
+    assert events == [('joined', False), ('one', False)]
+    assert decoder.feed(_ollama('', done=True)) == [('', True)]
+    assert decoder.done
+
+
+def test_decoder_close_flushes_a_final_line_without_newline():
+    decoder = StreamDecoder()
+    assert decoder.feed(b'{"response": "tail"}') == []
+    assert decoder.close() == [('tail', False)]
+
+
+def test_tokens_are_merged_into_few_frames():
+    async def scenario():
+        relay = StreamRelay(_chunks(*(_openai(f' t{number}') for number in range(50)), b'data: [DONE]\n\n'),
+                            flush_interval=60)
+        frames = await _collect(relay)
+        assert _texts(frames) == [{'text': ''.join(f' t{number}' for number in range(50))}]
+        assert relay.text == ''.join(f' t{number}' for number in range(50))
+        assert relay.stats()['events_in'] == 51
+        assert relay.stats()['frames_out'] == 2
+
+    asyncio.run(scenario())
+
+
+def test_frames_are_flushed_by_size_and_by_interval():
+    async def scenario():
+        by_size = StreamRelay(_chunks(*(_ollama('abcd') for _ in range(6))), flush_interval=60, flush_bytes=8)
+        assert _texts(await _collect(by_size)) == [{'text': 'abcdabcd'}] * 3
+
+        by_time = StreamRelay(_chunks(_ollama('a'), _ollama('b'), _ollama('c', done=True), delay=0.05),
+                              flush_interval=0.01)
+        assert _texts(await _collect(by_time)) == [{'text': 'a'}, {'text': 'b'}, {'text': 'c'}]
+
+    asyncio.run(scenario())
+
+
+def test_upstream_error_is_sent_after_the_pending_text():
+    async def failing():
+        yield _ollama('partial')
+        raise ConnectionError('provider went away')
+
+    async def scenario():
+        frames = await _collect(StreamRelay(failing(), flush_interval=60))
+        assert _texts(frames) == [{'text': 'partial'}, {'error': 'provider went away'}]
+
+    asyncio.run(scenario())
+
+
+def test_slow_reader_pauses_upstream_and_disconnect_closes_it():
+    produced = []
+
+    async def scenario():
+        upstream_closed = asyncio.Event()
+
+        async def endless():
+            try:
+                while True:
+                    produced.append(len(produced))
+                    yield _ollama('token')
+            finally:
+                upstream_closed.set()
+
+        frames = StreamRelay(endless(), flush_bytes=1, queue_size=2).frames()
+        assert await frames.__anext__() == b'data: {"text":"token"}\n\n'
+        await asyncio.sleep(0.05)
+        # Two queued events, one blocked in put() and the two the reader already took.
+        assert len(produced) <= 5
+
+        await frames.aclose()
+        await asyncio.wait_for(upstream_closed.wait(), 1)
+
+    asyncio.run(scenario())
@@ -0,0 +1,66 @@
+import asyncio
+
+from sqlalchemy import text
+
+from lifecycle_manager import _version_key
+
+
+def test_version_key_orders_numerically_and_pre_releases_first():
+    versions = ['1.0.10', '1.0.2', 'v1.1', '1.0.0-beta.10', '1.0.4', '1.0.0-beta.2', '1.0']
+    assert sorted(versions, key=_version_key) == [
+        '1.0.0-beta.2', '1.0.0-beta.10', '1.0', '1.0.2', '1.0.4', '1.0.10', 'v1.1'
+    ]
+    assert _version_key('1.0') == _version_key('1.0.0')
+
+
+async def _versions(db):
+    result = await db.execute(text("SELECT user_id, version FROM plugin ORDER BY user_id"))
+    return dict(result.fetchall())
+
+
+def test_update_upgrades_older_installs_only(database, make_manager):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as db:
+                old = make_manager('1.0.2')
+                assert (await old.install_plugin_for_users(['a', 'b'], db))['success']
+                newer = make_manager('1.0.4')
+                assert (await newer.install_plugin('z1', db))['success']
+                newer_modules = (await db.execute(text(
+                    "SELECT id, updated_at FROM module WHERE user_id = 'z1'"
+                ))).fetchall()
+
+                result = await make_manager('1.0.3').update_plugin(db)
+
+                assert result['success'], result
+                assert result['previous_versions'] == {'1.0.2': 2}
+                assert result['newer_versions'] == {'1.0.4': 1}
+                assert result['updated_plugins'] == 2
+                assert await _versions(db) == {'a': '1.0.3', 'b': '1.0.3', 'z1': '1.0.4'}
+                assert (await db.execute(text(
+                    "SELECT id, updated_at FROM module WHERE user_id = 'z1'"
+                ))).fetchall() == newer_modules
+
+    asyncio.run(scenario())
+
+
+def test_update_with_only_newer_installs_changes_nothing(database, make_manager):
+    async def scenario():
+        async with database() as sessions:
+            async with sessions() as db:
+                newer = make_manager('1.0.4')
+                assert (await newer.install_plugin('z1', db))['success']
+
+                current = make_manager('1.0.3')
+                result = await current.update_plugin(db)
+                assert result['success'], result
+                assert result['updated_plugins'] == 0
+                assert await _versions(db) == {'z1': '1.0.4'}
+
+                current.GC_GRACE_SECONDS = 0
+                collected = await current.collect_garbage(db)
+                assert collected['success'], collected
+                assert 'v1.0.4' not in collected['removed_versions']
+                assert (newer.shared_path / 'dist' / 'remoteEntry.js').exists()
+
+    asyncio.run(scenario())
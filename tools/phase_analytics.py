@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+BrainDriveWhyDetector Phase Analytics
+
+Computes per-phase statistics over exported coaching sessions to tune the
+phase thresholds in analyzeAndUpdatePhase(): user turns per phase, time spent
+in each phase, token volumes and the share of sessions that stop in a phase.
+
+Input is one or more JSONL files (optionally gzipped). Each line is one of:
+
+  - a session_store record: {"user_id", "session_id", "seq", "kind", "payload"}
+  - a ChatMessage with its session: {"session_id", "sender", "content", "timestamp", "phase"}
+  - a whole session: {"session_id", "messages": [ChatMessage, ...], "sessionData": {...}}
+
+Lines of one session must be contiguous, as session_store exports are when
+ordered by (user_id, session_id, seq). Files are streamed and sessions are
+analyzed in batches on a process pool with a bounded number of batches in
+flight, so memory stays constant however large the export is:
+
+    python tools/phase_analytics.py exports/*.jsonl.gz --workers 8 --output phase-stats.json
+"""
+
+import argparse
+import datetime
+import gzip
+import json
+import os
+import sys
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+if str(PLUGIN_DIR) not in sys.path:
+    sys.path.insert(0, str(PLUGIN_DIR))
+
+from session_store import KIND_MESSAGE, KIND_PHASE  # noqa: E402
+
+# Mirrors PHASE_ORDER in src/types.ts.
+PHASE_ORDER = ['intro', 'snapshot', 'energy_map', 'deep_stories', 'patterns', 'statement', 'action', 'completed']
+
+# Upper bounds (seconds) of the time-in-phase histogram buckets
+SECONDS_BUCKETS = (10, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 86400)
+# Turn counts above this share the last histogram bin
+MAX_TURN_BIN = 100
+
+_SENDERS = {'u': 'user', 'c': 'coach'}
+
+# (kind, sender, content, timestamp, phase) for messages, (kind, None, None, None, phase) for phase changes
+Event = Tuple[str, Optional[str], Optional[str], Optional[str], Optional[str]]
+
+
+def _open(path: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+
+def _message_event(message: Dict[str, Any]) -> Event:
+    return (KIND_MESSAGE, message.get('sender'), message.get('content') or '', message.get('timestamp'), message.get('phase'))
+
+
+def _line_events(record: Dict[str, Any]) -> List[Event]:
+    if 'kind' in record and 'payload' in record:
+        payload = record['payload']
+        if isinstance(payload, str):
+            payload = json.loads(payload)
+        if record['kind'] == KIND_MESSAGE:
+            return [(KIND_MESSAGE, _SENDERS.get(payload.get('s'), payload.get('s')), payload.get('c') or '',
+                     payload.get('t'), payload.get('p'))]
+        if record['kind'] == KIND_PHASE:
+            return [(KIND_PHASE, None, None, None, payload.get('p'))]
+        return []
+    if isinstance(record.get('messages'), list):
+        return [_message_event(message) for message in record['messages'] if isinstance(message, dict)]
+    if 'sender' in record and 'content' in record:
+        return [_message_event(record)]
+    return []
+
+
+def iter_sessions(paths: Iterable[str]) -> Iterator[List[Event]]:
+    """Yield the events of one session at a time from JSONL exports."""
+    bad_lines = 0
+    for path in paths:
+        current_key = None
+        events: List[Event] = []
+        with _open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                    line_events = _line_events(record)
+                except (ValueError, AttributeError):
+                    bad_lines += 1
+                    continue
+                if isinstance(record.get('messages'), list):
+                    # A whole session on one line
+                    key = None
+                else:
+                    key = (record.get('user_id'), record.get('session_id'))
+                if key is None or key != current_key:
+                    if events:
+                        yield events
+                    events = []
+                current_key = key
+                events.extend(line_events)
+                if key is None:
+                    yield events
+                    events = []
+        if events:
+            yield events
+    if bad_lines:
+        print(f"skipped {bad_lines} unparseable lines", file=sys.stderr)
+
+
+def _parse_time(value: Optional[str]) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.timestamp()
+
+
+def _estimate_tokens(text: str) -> int:
+    # Same estimate context_assembler uses without tiktoken
+    return (len(text) + 3) // 4
+
+
+def _new_phase_stats() -> Dict[str, Any]:
+    return {
+        'sessions_reached': 0,
+        'sessions_ended': 0,
+        'user_turns': 0,
+        'coach_turns': 0,
+        'user_tokens': 0,
+        'coach_tokens': 0,
+        'seconds_total': 0.0,
+        'seconds_count': 0,
+        'turn_histogram': {},
+        'seconds_histogram': {}
+    }
+
+
+def _new_aggregate() -> Dict[str, Any]:
+    return {'sessions': 0, 'completed': 0, 'messages': 0, 'phases': {}}
+
+
+def _bump(histogram: Dict[str, int], key: Any) -> None:
+    histogram[str(key)] = histogram.get(str(key), 0) + 1
+
+
+def analyze_session(events: List[Event], aggregate: Dict[str, Any]) -> None:
+    """Fold one session into aggregate."""
+    phase = 'intro'
+    # phase -> [user turns, entered at, left at]
+    visits: Dict[str, List[Any]] = {}
+    last_time = None
+    order: List[str] = []
+
+    def enter(new_phase: str, at: Optional[float]) -> None:
+        if new_phase not in visits:
+            visits[new_phase] = [0, at, None]
+            order.append(new_phase)
+        elif visits[new_phase][1] is None:
+            visits[new_phase][1] = at
+
+    enter(phase, None)
+    for kind, sender, content, timestamp, event_phase in events:
+        at = _parse_time(timestamp) if kind == KIND_MESSAGE else None
+        if event_phase and event_phase != phase:
+            if phase in visits and visits[phase][2] is None:
+                visits[phase][2] = at if at is not None else last_time
+            phase = event_phase
+            enter(phase, at)
+        if kind != KIND_MESSAGE:
+            continue
+        if at is not None:
+            last_time = at
+            if visits[phase][1] is None:
+                visits[phase][1] = at
+        stats = aggregate['phases'].setdefault(phase, _new_phase_stats())
+        tokens = _estimate_tokens(content)
+        aggregate['messages'] += 1
+        if sender == 'user':
+            visits[phase][0] += 1
+            stats['user_turns'] += 1
+            stats['user_tokens'] += tokens
+        else:
+            stats['coach_turns'] += 1
+            stats['coach_tokens'] += tokens
+
+    aggregate['sessions'] += 1
+    if phase == 'completed':
+        aggregate['completed'] += 1
+    for visited in order:
+        turns, entered_at, left_at = visits[visited]
+        stats = aggregate['phases'].setdefault(visited, _new_phase_stats())
+        stats['sessions_reached'] += 1
+        _bump(stats['turn_histogram'], min(turns, MAX_TURN_BIN))
+        if visited == phase and left_at is None:
+            left_at = last_time
+        if entered_at is not None and left_at is not None and left_at >= entered_at:
+            seconds = left_at - entered_at
+            stats['seconds_total'] += seconds
+            stats['seconds_count'] += 1
+            bucket = next((bound for bound in SECONDS_BUCKETS if seconds <= bound), 'inf')
+            _bump(stats['seconds_histogram'], bucket)
+    if phase != 'completed':
+        aggregate['phases'].setdefault(phase, _new_phase_stats())['sessions_ended'] += 1
+
+
+def analyze_batch(batch: List[List[Event]]) -> Dict[str, Any]:
+    """Worker entry point: aggregate a batch of sessions."""
+    aggregate = _new_aggregate()
+    for events in batch:
+        analyze_session(events, aggregate)
+    return aggregate
+
+
+def merge(into: Dict[str, Any], other: Dict[str, Any]) -> None:
+    for key in ('sessions', 'completed', 'messages'):
+        into[key] += other[key]
+    for phase, stats in other['phases'].items():
+        target = into['phases'].setdefault(phase, _new_phase_stats())
+        for key, value in stats.items():
+            if isinstance(value, dict):
+                for bucket, count in value.items():
+                    target[key][bucket] = target[key].get(bucket, 0) + count
+            else:
+                target[key] += value
+
+
+def _batches(sessions: Iterator[List[Event]], batch_size: int) -> Iterator[List[List[Event]]]:
+    batch = []
+    for events in sessions:
+        batch.append(events)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def run(paths: List[str], workers: int, batch_size: int, progress: bool = False) -> Dict[str, Any]:
+    aggregate = _new_aggregate()
+    batches = _batches(iter_sessions(paths), batch_size)
+    if workers <= 1:
+        for batch in batches:
+            merge(aggregate, analyze_batch(batch))
+        return aggregate
+
+    # Keep at most two batches per worker in flight so reading never runs far ahead.
+    max_in_flight = workers * 2
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = set()
+        for batch in batches:
+            in_flight.add(pool.submit(analyze_batch, batch))
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    merge(aggregate, future.result())
+                if progress:
+                    print(f"\r{aggregate['sessions']} sessions", end='', file=sys.stderr, flush=True)
+        for future in in_flight:
+            merge(aggregate, future.result())
+    if progress:
+        print(f"\r{aggregate['sessions']} sessions", file=sys.stderr)
+    return aggregate
+
+
+def _histogram_percentile(histogram: Dict[str, int], fraction: float) -> Optional[float]:
+    """Upper bound of the bin holding the given fraction of observations."""
+    ordered = sorted(histogram.items(), key=lambda item: float(item[0]))
+    total = sum(count for _, count in ordered)
+    if not total:
+        return None
+    seen = 0
+    for bound, count in ordered:
+        seen += count
+        if seen >= fraction * total:
+            return float(bound)
+    return float(ordered[-1][0])
+
+
+def report(aggregate: Dict[str, Any]) -> Dict[str, Any]:
+    phases = {}
+    known = [phase for phase in PHASE_ORDER if phase in aggregate['phases']]
+    others = sorted(phase for phase in aggregate['phases'] if phase not in PHASE_ORDER)
+    for phase in known + others:
+        stats = aggregate['phases'][phase]
+        reached = stats['sessions_reached']
+        phases[phase] = {
+            'sessions_reached': reached,
+            'sessions_ended': stats['sessions_ended'],
+            'drop_off_rate': round(stats['sessions_ended'] / reached, 4) if reached else None,
+            'user_turns': stats['user_turns'],
+            'coach_turns': stats['coach_turns'],
+            'user_turns_mean': round(stats['user_turns'] / reached, 2) if reached else None,
+            'user_turns_p50': _histogram_percentile(stats['turn_histogram'], 0.5),
+            'user_turns_p90': _histogram_percentile(stats['turn_histogram'], 0.9),
+            'user_tokens': stats['user_tokens'],
+            'coach_tokens': stats['coach_tokens'],
+            'seconds_mean': round(stats['seconds_total'] / stats['seconds_count'], 1) if stats['seconds_count'] else None,
+            'seconds_p50_bucket': _histogram_percentile(stats['seconds_histogram'], 0.5),
+            'seconds_p90_bucket': _histogram_percentile(stats['seconds_histogram'], 0.9),
+            'turn_histogram': dict(sorted(stats['turn_histogram'].items(), key=lambda item: int(item[0]))),
+            'seconds_histogram': dict(sorted(stats['seconds_histogram'].items(), key=lambda item: float(item[0])))
+        }
+    return {
+        'sessions': aggregate['sessions'],
+        'completed': aggregate['completed'],
+        'completion_rate': round(aggregate['completed'] / aggregate['sessions'], 4) if aggregate['sessions'] else None,
+        'messages': aggregate['messages'],
+        'phases': phases
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('paths', nargs='+', help='JSONL exports (.jsonl or .jsonl.gz)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes (1 runs inline)')
+    parser.add_argument('--batch-size', type=int, default=500, help='sessions per worker task')
+    parser.add_argument('--output', help='write the report as JSON to this path')
+    parser.add_argument('--progress', action='store_true', help='print the running session count to stderr')
+    args = parser.parse_args(argv)
+
+    results = report(run(args.paths, args.workers, args.batch_size, args.progress))
+    print(f"{results['sessions']} sessions, {results['messages']} messages, completion rate {results['completion_rate']}")
+    print(f"{'phase':<14} {'reached':>8} {'drop-off':>9} {'turns p50':>10} {'turns p90':>10} {'mean s':>8} {'user tok':>10} {'coach tok':>10}")
+    for phase, stats in results['phases'].items():
+        print(f"{phase:<14} {stats['sessions_reached']:>8} {stats['drop_off_rate'] if stats['drop_off_rate'] is not None else '-':>9} "
+              f"{stats['user_turns_p50'] if stats['user_turns_p50'] is not None else '-':>10} "
+              f"{stats['user_turns_p90'] if stats['user_turns_p90'] is not None else '-':>10} "
+              f"{stats['seconds_mean'] if stats['seconds_mean'] is not None else '-':>8} "
+              f"{stats['user_tokens']:>10} {stats['coach_tokens']:>10}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
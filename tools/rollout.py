@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+BrainDriveWhyDetector Rollout
+
+Installs the plugin for a whole deployment. Users are sharded across worker
+processes by a stable hash of their id; every worker has its own async engine
+and session pool and installs its shard in chunks with
+install_plugin_for_users(). All workers draw from one shared rate limit
+(users per second), and the concurrency limit is split between them, so the
+total number of chunks in flight never exceeds --concurrency.
+
+Every finished user is appended to a JSONL checkpoint file. Rerunning with the
+same checkpoint skips users already installed and retries failed ones:
+
+    python tools/rollout.py --database-url postgresql+asyncpg://... \\
+        --plugins-base-dir /srv/braindrive/backend/plugins \\
+        --users-query "SELECT id FROM users" \\
+        --workers 4 --concurrency 8 --rate 200 --checkpoint rollout.jsonl
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import queue as queue_module
+import sys
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+PLUGIN_DIR = Path(__file__).resolve().parent.parent
+if str(PLUGIN_DIR) not in sys.path:
+    sys.path.insert(0, str(PLUGIN_DIR))
+
+ALREADY_INSTALLED_ERROR = 'Plugin already installed for user'
+DONE_STATUSES = ('installed', 'already_installed')
+
+
+class GlobalRateLimiter:
+    """Rate limit shared by processes, as a GCRA over a shared theoretical arrival time.
+
+    reserve(n) books n units and returns how long the caller must wait before
+    using them; up to burst units may be used without waiting.
+    """
+
+    def __init__(self, rate: float, burst: float = 1.0, context=multiprocessing):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self._arrival = context.Value('d', 0.0)
+
+    def reserve(self, units: float) -> float:
+        if self.rate <= 0:
+            return 0.0
+        now = time.time()
+        with self._arrival.get_lock():
+            arrival = max(self._arrival.value, now) + units / self.rate
+            self._arrival.value = arrival
+        return max(0.0, arrival - now - self.burst / self.rate)
+
+
+def shard_of(user_id: str, shards: int) -> int:
+    return zlib.crc32(user_id.encode('utf-8')) % shards
+
+
+def load_checkpoint(path: Optional[str]) -> Dict[str, str]:
+    """Latest status per user from a checkpoint file."""
+    statuses: Dict[str, str] = {}
+    if not path or not os.path.exists(path):
+        return statuses
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A torn last line from an interrupted run
+                continue
+            if isinstance(entry, dict) and 'user_id' in entry:
+                statuses[entry['user_id']] = entry.get('status')
+    return statuses
+
+
+def _classify(result: Dict[str, Any]) -> str:
+    if result.get('success'):
+        return 'installed'
+    if result.get('error') == ALREADY_INSTALLED_ERROR:
+        return 'already_installed'
+    return 'failed'
+
+
+async def _run_shard(shard: int, user_ids: List[str], options: Dict[str, Any],
+                     limiter: GlobalRateLimiter, results) -> None:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    from lifecycle_manager import BrainDriveWhyDetectorLifecycleManager
+
+    concurrency = options['concurrency']
+    engine_options = {'pool_size': concurrency, 'max_overflow': 0}
+    if options['database_url'].startswith('sqlite'):
+        engine_options['connect_args'] = {'timeout': 60}
+    engine = create_async_engine(options['database_url'], **engine_options)
+    sessions = async_sessionmaker(engine, expire_on_commit=False)
+    manager = BrainDriveWhyDetectorLifecycleManager(options['plugins_base_dir'])
+    semaphore = asyncio.Semaphore(concurrency)
+    chunk_size = options['chunk_size']
+
+    async def install_chunk(chunk: List[str]) -> None:
+        async with semaphore:
+            delay = limiter.reserve(len(chunk))
+            if delay:
+                await asyncio.sleep(delay)
+            try:
+                async with sessions() as db:
+                    outcome = await manager.install_plugin_for_users(chunk, db)
+                per_user = outcome.get('results') or {}
+                entries = []
+                for user_id in chunk:
+                    result = per_user.get(user_id) or {'success': False, 'error': outcome.get('error', 'no result')}
+                    entry = {'user_id': user_id, 'status': _classify(result)}
+                    if entry['status'] == 'failed':
+                        entry['error'] = result.get('error')
+                    entries.append(entry)
+            except Exception as e:
+                entries = [{'user_id': user_id, 'status': 'failed', 'error': str(e)} for user_id in chunk]
+            results.put(('chunk', shard, entries))
+
+    try:
+        await asyncio.gather(*(
+            install_chunk(user_ids[start:start + chunk_size])
+            for start in range(0, len(user_ids), chunk_size)
+        ))
+    finally:
+        await engine.dispose()
+
+
+def _worker_main(shard: int, user_ids: List[str], options: Dict[str, Any],
+                 limiter: GlobalRateLimiter, results) -> None:
+    if not options['verbose']:
+        import structlog
+        structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.ERROR))
+    try:
+        asyncio.run(_run_shard(shard, user_ids, options, limiter, results))
+    except Exception as e:
+        results.put(('error', shard, str(e)))
+    finally:
+        results.put(('done', shard, None))
+
+
+async def _query_users(database_url: str, query: str) -> List[str]:
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    engine = create_async_engine(database_url)
+    try:
+        async with engine.connect() as conn:
+            result = await conn.stream(text(query))
+            return [str(row[0]) async for row in result]
+    finally:
+        await engine.dispose()
+
+
+def _read_users(path: str) -> List[str]:
+    f = sys.stdin if path == '-' else open(path, 'r')
+    try:
+        return [line.strip() for line in f if line.strip()]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+class Rollout:
+    def __init__(self, user_ids: Iterable[str], options: Dict[str, Any]):
+        self.options = options
+        self.checkpoint_path = options['checkpoint']
+        previous = load_checkpoint(self.checkpoint_path)
+        all_users = list(dict.fromkeys(user_ids))
+        self.skipped = sum(1 for user_id in all_users if previous.get(user_id) in DONE_STATUSES)
+        self.pending = [
+            user_id for user_id in all_users
+            if previous.get(user_id) not in DONE_STATUSES
+            and not (options['skip_failed'] and previous.get(user_id) == 'failed')
+        ]
+        self.counts = {'installed': 0, 'already_installed': 0, 'failed': 0}
+        self.errors: Dict[str, str] = {}
+        self.worker_errors: Dict[int, str] = {}
+
+    def _report(self, started: float, final: bool = False) -> None:
+        done = sum(self.counts.values())
+        elapsed = max(time.monotonic() - started, 1e-9)
+        rate = done / elapsed
+        remaining = len(self.pending) - done
+        eta = f"{remaining / rate:.0f}s" if rate and not final else '-'
+        print(
+            f"{done}/{len(self.pending)} users ({self.counts['installed']} installed, "
+            f"{self.counts['already_installed']} already installed, {self.counts['failed']} failed), "
+            f"{rate:.1f} users/s, eta {eta}",
+            file=sys.stderr, flush=True
+        )
+
+    def run(self) -> Dict[str, Any]:
+        options = self.options
+        workers = max(1, min(options['workers'], options['concurrency'], len(self.pending) or 1))
+        shards: List[List[str]] = [[] for _ in range(workers)]
+        for user_id in self.pending:
+            shards[shard_of(user_id, workers)].append(user_id)
+
+        context = multiprocessing.get_context('spawn')
+        limiter = GlobalRateLimiter(options['rate'], options['burst'], context=context)
+        results = context.Queue()
+        started = time.monotonic()
+
+        processes = []
+        for shard, user_ids in enumerate(shards):
+            if not user_ids:
+                continue
+            # Split the concurrency limit so the total across workers never exceeds it.
+            share = options['concurrency'] // workers + (1 if shard < options['concurrency'] % workers else 0)
+            process = context.Process(
+                target=_worker_main,
+                args=(shard, user_ids, dict(options, concurrency=max(1, share)), limiter, results),
+                name=f"rollout-shard-{shard}"
+            )
+            process.start()
+            processes.append(process)
+
+        running = len(processes)
+        last_report = time.monotonic()
+        checkpoint = open(self.checkpoint_path, 'a') if self.checkpoint_path else None
+        try:
+            while running:
+                try:
+                    kind, shard, payload = results.get(timeout=options['report_interval'])
+                except queue_module.Empty:
+                    if not any(process.is_alive() for process in processes):
+                        break
+                    payload = None
+                    kind = None
+                if kind == 'chunk':
+                    now = datetime.datetime.now().isoformat(timespec='seconds')
+                    for entry in payload:
+                        self.counts[entry['status']] += 1
+                        if entry['status'] == 'failed':
+                            self.errors[entry['user_id']] = entry.get('error')
+                        if checkpoint is not None:
+                            checkpoint.write(json.dumps(dict(entry, at=now)) + '\n')
+                    if checkpoint is not None:
+                        checkpoint.flush()
+                        os.fsync(checkpoint.fileno())
+                elif kind == 'error':
+                    self.worker_errors[shard] = payload
+                    print(f"shard {shard} failed: {payload}", file=sys.stderr, flush=True)
+                elif kind == 'done':
+                    running -= 1
+                if time.monotonic() - last_report >= options['report_interval']:
+                    self._report(started)
+                    last_report = time.monotonic()
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+            for process in processes:
+                process.join()
+
+        self._report(started, final=True)
+        elapsed = time.monotonic() - started
+        done = sum(self.counts.values())
+        return {
+            'plugins_base_dir': options['plugins_base_dir'],
+            'users_pending': len(self.pending),
+            'users_skipped': self.skipped,
+            'workers': len(processes),
+            **self.counts,
+            'unprocessed': len(self.pending) - done,
+            'elapsed_seconds': round(elapsed, 3),
+            'users_per_second': round(done / elapsed, 2) if elapsed else None,
+            'worker_errors': self.worker_errors,
+            'errors': self.errors
+        }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', required=True, help='async SQLAlchemy URL of the BrainDrive database')
+    parser.add_argument('--plugins-base-dir', help='plugins directory holding shared/ (default: the manager default)')
+    users = parser.add_mutually_exclusive_group(required=True)
+    users.add_argument('--users-file', help="file with one user id per line ('-' for stdin)")
+    users.add_argument('--users-query', help='SQL query whose first column is the user id')
+    parser.add_argument('--checkpoint', help='JSONL file recording finished users; reused to resume')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='worker processes')
+    parser.add_argument('--concurrency', type=int, default=8, help='chunks in flight across all workers')
+    parser.add_argument('--chunk-size', type=int, default=100, help='users per install_plugin_for_users call')
+    parser.add_argument('--rate', type=float, default=100.0, help='users per second across all workers (0 = unlimited)')
+    parser.add_argument('--burst', type=float, default=None, help='users that may start without waiting (default: one chunk)')
+    parser.add_argument('--skip-failed', action='store_true', help='do not retry users the checkpoint records as failed')
+    parser.add_argument('--report-interval', type=float, default=5.0, help='seconds between progress lines')
+    parser.add_argument('--output', help='write the summary as JSON to this path')
+    parser.add_argument('--verbose', action='store_true', help='keep lifecycle manager log output')
+    args = parser.parse_args(argv)
+
+    if args.users_file:
+        user_ids = _read_users(args.users_file)
+    else:
+        user_ids = asyncio.run(_query_users(args.database_url, args.users_query))
+
+    options = {
+        'database_url': args.database_url,
+        'plugins_base_dir': args.plugins_base_dir,
+        'checkpoint': args.checkpoint,
+        'workers': args.workers,
+        'concurrency': max(1, args.concurrency),
+        'chunk_size': max(1, args.chunk_size),
+        'rate': args.rate,
+        'burst': args.burst if args.burst is not None else max(1, args.chunk_size),
+        'skip_failed': args.skip_failed,
+        'report_interval': args.report_interval,
+        'verbose': args.verbose
+    }
+    rollout = Rollout(user_ids, options)
+    print(f"{len(rollout.pending)} users to install, {rollout.skipped} already done according to the checkpoint",
+          file=sys.stderr)
+    summary = rollout.run()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+    print(json.dumps({key: value for key, value in summary.items() if key != 'errors'}, indent=2))
+    return 0 if summary['failed'] == 0 and summary['unprocessed'] == 0 and not summary['worker_errors'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())